@@ -1,7 +1,11 @@
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from typing import Optional
+from app.core.auth_cache import CachedUser, auth_cache
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.security import decode_token
 from app.models import User
@@ -11,7 +15,7 @@ security = HTTPBearer(auto_error=False)
 async def get_current_user(
     request: Request,
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     # 1. Chercher le token dans le cookie httpOnly
     token = request.cookies.get("access_token")
@@ -26,6 +30,56 @@ async def get_current_user(
             detail="Token manquant"
         )
 
+    use_cache = settings.AUTH_CACHE_TTL_SECONDS > 0
+    user_id = auth_cache.get_token(token) if use_cache else None
+    if user_id is None:
+        user_id, expires_at = _decode_user_token(token)
+        if use_cache:
+            auth_cache.put_token(token, user_id, expires_at)
+
+    cached = auth_cache.get_user(user_id) if use_cache else None
+    if cached is not None:
+        user = await _attach_cached_user(db, cached)
+    else:
+        user = await db.scalar(select(User).where(User.id == user_id))
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Utilisateur non trouve"
+            )
+        if use_cache:
+            auth_cache.put_user(CachedUser(
+                id=user.id,
+                is_active=user.is_active,
+                is_private=user.is_private,
+                is_visible=user.is_visible,
+            ))
+
+    if not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Compte desactive"
+        )
+
+    return user
+
+
+async def get_current_user_profile(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """
+    Utilisateur connecte avec toutes ses colonnes (profil, avatar, email...).
+    get_current_user peut venir du cache avec les seuls champs essentiels, et
+    une session async ne charge pas les colonnes manquantes a l'acces.
+    """
+    if inspect(current_user).unloaded:
+        await db.refresh(current_user)
+    return current_user
+
+
+def _decode_user_token(token: str) -> tuple:
+    """Verifier le JWT: (user_id, expiration unix ou None)"""
     payload = decode_token(token)
 
     if payload is None:
@@ -40,18 +94,14 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token invalide"
         )
+    return int(user_id), payload.get("exp")
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Utilisateur non trouve"
-        )
-
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Compte desactive"
-        )
 
-    return user
+async def _attach_cached_user(db: AsyncSession, cached: CachedUser) -> User:
+    """
+    Rattacher l'utilisateur en cache a la session sans SELECT: les champs
+    essentiels sont renseignes, les autres via get_current_user_profile.
+    """
+    user = User(**cached._asdict())
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, select, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 from typing import Optional
@@ -13,32 +14,38 @@ from slowapi import Limiter
 from slowapi.util import get_remote_address
 from app.core.database import get_db
 from app.core.security import get_password_hash, verify_password, create_access_token
-from app.core.storage import upload_photo, delete_photo
+from app.core.storage import read_upload, upload_photo, delete_photo, FileTooLargeError
 from app.core.config import settings
+from app.core.ping_index import ping_index
+from app.core.crossing_feed import remove_user_from_feeds
+from app.core.timelines import remove_user_from_timelines
+from app.core.relationships import load_relationships, invalidate_relationships
+from app.core.auth_cache import invalidate_current_user
+from app.core.search import unindex_looks
 from app.models import User, BlockedUser, Look, Report
 from app.models.look import LookLike, LookView, SavedLook
 from app.models.location import LocationPing, Crossing
 from app.models.user import generate_referral_code
 from app.schemas import UserCreate, UserLogin, UserResponse, Token
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user_profile
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 limiter = Limiter(key_func=get_remote_address)
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 @limiter.limit("5/minute")  # 5 inscriptions max par minute par IP
-async def register(request: Request, user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(request: Request, user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Creer un nouveau compte utilisateur"""
 
     # Verifier si email existe deja
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await db.scalar(select(User).where(User.email == user_data.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cet email est deja utilise"
         )
 
     # Verifier si username existe deja
-    if db.query(User).filter(User.username == user_data.username).first():
+    if await db.scalar(select(User).where(User.username == user_data.username)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Ce nom d'utilisateur est deja pris"
@@ -47,17 +54,18 @@ async def register(request: Request, user_data: UserCreate, db: Session = Depend
     # Chercher le parrain si un code est fourni
     referrer = None
     if user_data.referral_code:
-        referrer = db.query(User).filter(
+        referrer = await db.scalar(select(User).where(
             User.referral_code == user_data.referral_code.upper()
-        ).first()
+        ))
 
     # Generer un code de parrainage unique
     new_referral_code = generate_referral_code()
-    while db.query(User).filter(User.referral_code == new_referral_code).first():
+    while await db.scalar(select(User).where(User.referral_code == new_referral_code)):
         new_referral_code = generate_referral_code()
 
     # Creer l'utilisateur
-    hashed_password = get_password_hash(user_data.password)
+    # bcrypt est volontairement lent: hors de la boucle d'evenements
+    hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
     user = User(
         email=user_data.email,
         username=user_data.username,
@@ -72,19 +80,21 @@ async def register(request: Request, user_data: UserCreate, db: Session = Depend
     if referrer:
         referrer.referral_count += 1
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return user
 
 @router.post("/login")
 @limiter.limit("10/minute")  # 10 tentatives max par minute par IP
-async def login(request: Request, credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(request: Request, credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """Connexion utilisateur"""
 
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = await db.scalar(select(User).where(User.email == credentials.email))
 
-    if not user or not user.hashed_password or not verify_password(credentials.password, user.hashed_password):
+    if not user or not user.hashed_password or not await asyncio.to_thread(
+        verify_password, credentials.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email ou mot de passe incorrect"
@@ -162,7 +172,7 @@ async def verify_apple_token(identity_token: str) -> dict:
 
 @router.post("/apple")
 @limiter.limit("10/minute")
-async def apple_sign_in(request: Request, data: AppleAuthRequest, db: Session = Depends(get_db)):
+async def apple_sign_in(request: Request, data: AppleAuthRequest, db: AsyncSession = Depends(get_db)):
     """Sign in with Apple — creates account if first time, logs in otherwise"""
 
     # Verify the Apple identity token
@@ -173,7 +183,7 @@ async def apple_sign_in(request: Request, data: AppleAuthRequest, db: Session =
         raise HTTPException(status_code=401, detail="Token Apple invalide (sub manquant)")
 
     # Check if user already exists with this Apple ID
-    user = db.query(User).filter(User.apple_id == apple_sub).first()
+    user = await db.scalar(select(User).where(User.apple_id == apple_sub))
 
     if user:
         # Existing user — log in
@@ -206,12 +216,11 @@ async def apple_sign_in(request: Request, data: AppleAuthRequest, db: Session =
         )
 
     # Check if email already exists (user has email account, link it)
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user:
         # Link Apple ID to existing account
         existing_user.apple_id = apple_sub
-        db.commit()
-        db.refresh(existing_user)
+        await db.commit()
 
         access_token = create_access_token(data={"sub": str(existing_user.id)})
         response = JSONResponse(content={
@@ -239,13 +248,13 @@ async def apple_sign_in(request: Request, data: AppleAuthRequest, db: Session =
 
     username = base_username
     counter = 1
-    while db.query(User).filter(User.username == username).first():
+    while await db.scalar(select(User).where(User.username == username)):
         username = f"{base_username}{counter}"
         counter += 1
 
     # Generate referral code
     new_referral_code = generate_referral_code()
-    while db.query(User).filter(User.referral_code == new_referral_code).first():
+    while await db.scalar(select(User).where(User.referral_code == new_referral_code)):
         new_referral_code = generate_referral_code()
 
     # Create the user (no password needed for Apple Sign In)
@@ -258,8 +267,7 @@ async def apple_sign_in(request: Request, data: AppleAuthRequest, db: Session =
         referral_code=new_referral_code,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
 
     access_token = create_access_token(data={"sub": str(user.id)})
     response = JSONResponse(content={
@@ -279,7 +287,7 @@ async def apple_sign_in(request: Request, data: AppleAuthRequest, db: Session =
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(current_user: User = Depends(get_current_user_profile)):
     """Obtenir les infos de l'utilisateur connecte"""
     return current_user
 
@@ -294,8 +302,8 @@ async def logout():
 @router.post("/avatar", response_model=UserResponse)
 async def upload_avatar(
     photo: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_profile)
 ):
     """Upload une photo de profil"""
 
@@ -308,8 +316,9 @@ async def upload_avatar(
         )
 
     # Lire le contenu (lecture limitee pour eviter memory exhaustion)
-    content = await photo.read(settings.MAX_FILE_SIZE + 1)
-    if len(content) > settings.MAX_FILE_SIZE:
+    try:
+        content = await read_upload(photo)
+    except FileTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Fichier trop volumineux (max 5MB)"
@@ -321,7 +330,7 @@ async def upload_avatar(
 
     # Upload la nouvelle photo
     try:
-        avatar_url = await upload_photo(content, photo.filename)
+        avatar_url = (await upload_photo(content, photo.filename)).url
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -330,16 +339,17 @@ async def upload_avatar(
 
     # Mettre à jour l'utilisateur
     current_user.avatar_url = avatar_url
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    invalidate_current_user(current_user.id)
+    await db.refresh(current_user)
 
     return current_user
 
 
 @router.delete("/account")
 async def delete_account(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_profile)
 ):
     """
     Supprimer definitivement son compte et toutes ses donnees (RGPD).
@@ -349,7 +359,7 @@ async def delete_account(
     logger.info(f"Suppression compte demandee par user {user_id} ({current_user.email})")
 
     # 1. Supprimer les photos des looks depuis le storage
-    user_looks = db.query(Look).filter(Look.user_id == user_id).all()
+    user_looks = (await db.scalars(select(Look).where(Look.user_id == user_id))).all()
     for look in user_looks:
         if look.photo_url:
             try:
@@ -365,45 +375,54 @@ async def delete_account(
             logger.warning(f"Echec suppression avatar user {user_id}: {e}")
 
     # 3. Supprimer les likes/vues donnes par l'utilisateur sur d'autres looks
-    db.query(LookLike).filter(LookLike.user_id == user_id).delete()
-    db.query(LookView).filter(LookView.user_id == user_id).delete()
+    await db.execute(delete(LookLike).where(LookLike.user_id == user_id))
+    await db.execute(delete(LookView).where(LookView.user_id == user_id))
 
     # 4. Supprimer les looks sauvegardes (par l'utilisateur et de l'utilisateur)
-    db.query(SavedLook).filter(SavedLook.user_id == user_id).delete()
+    await db.execute(delete(SavedLook).where(SavedLook.user_id == user_id))
     # Supprimer les sauvegardes des looks de l'utilisateur par d'autres
     for look in user_looks:
-        db.query(SavedLook).filter(SavedLook.look_id == look.id).delete()
+        await db.execute(delete(SavedLook).where(SavedLook.look_id == look.id))
+
+    # Retirer l'utilisateur des fils de croisements et des timelines (avant looks et croisements)
+    await db.run_sync(remove_user_from_feeds, user_id)
+    await db.run_sync(remove_user_from_timelines, user_id)
+    await db.run_sync(unindex_looks, [look.id for look in user_looks])
 
     # 5. Supprimer les looks (cascade supprime items, likes, views)
-    db.query(Look).filter(Look.user_id == user_id).delete()
+    await db.execute(delete(Look).where(Look.user_id == user_id))
 
     # 6. Supprimer les location pings
-    db.query(LocationPing).filter(LocationPing.user_id == user_id).delete()
+    await db.execute(delete(LocationPing).where(LocationPing.user_id == user_id))
 
     # 7. Supprimer les croisements
-    db.query(Crossing).filter(
+    await db.execute(delete(Crossing).where(
         or_(Crossing.user1_id == user_id, Crossing.user2_id == user_id)
-    ).delete()
+    ))
 
     # 8. Supprimer les blocages (dans les deux sens)
-    db.query(BlockedUser).filter(
+    related_ids = (await db.run_sync(load_relationships, user_id)).related_ids()
+    await db.execute(delete(BlockedUser).where(
         or_(BlockedUser.blocker_id == user_id, BlockedUser.blocked_id == user_id)
-    ).delete()
+    ))
 
     # 9. Supprimer les signalements (faits par ou contre l'utilisateur)
-    db.query(Report).filter(
+    await db.execute(delete(Report).where(
         or_(Report.reporter_id == user_id, Report.reported_user_id == user_id)
-    ).delete()
+    ))
 
     # 10. Mettre a jour les parrainages (ne pas casser les references)
     # Les utilisateurs parraines gardent leur compte mais perdent la reference
-    db.query(User).filter(User.referred_by_id == user_id).update(
-        {User.referred_by_id: None}
-    )
+    await db.execute(update(User).where(User.referred_by_id == user_id).values(
+        referred_by_id=None
+    ))
 
     # 11. Enfin supprimer l'utilisateur
-    db.delete(current_user)
-    db.commit()
+    await db.delete(current_user)
+    await db.commit()
+    ping_index.remove_user(user_id)
+    invalidate_relationships(user_id, *related_ids)
+    invalidate_current_user(user_id)
 
     return {"success": True, "message": "Ton compte et toutes tes donnees ont ete supprimes definitivement."}
 
@@ -416,8 +435,8 @@ class ProfileUpdate(BaseModel):
 @router.put("/profile", response_model=UserResponse)
 async def update_profile(
     data: ProfileUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_profile)
 ):
     """
     Mettre a jour le profil utilisateur.
@@ -437,7 +456,7 @@ async def update_profile(
                 )
 
         # Verifier si le nouveau username est disponible
-        existing = db.query(User).filter(User.username == data.username).first()
+        existing = await db.scalar(select(User).where(User.username == data.username))
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -465,14 +484,15 @@ async def update_profile(
             )
         current_user.bio = data.bio
 
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    invalidate_current_user(current_user.id)
+    await db.refresh(current_user)
 
     return current_user
 
 
 @router.get("/profile/can-change-username")
-async def can_change_username(current_user: User = Depends(get_current_user)):
+async def can_change_username(current_user: User = Depends(get_current_user_profile)):
     """Verifie si l'utilisateur peut changer son username"""
     if not current_user.username_changed_at:
         return {"can_change": True, "days_remaining": 0}
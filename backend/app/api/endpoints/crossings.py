@@ -1,22 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, and_
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import or_, insert, select, update
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from typing import List
-from datetime import datetime, timedelta
-from geopy.geocoders import Nominatim
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.config import settings
-from app.core.zones import get_zone_id, get_adjacent_zones
-from app.models import User, Look, LookPhoto, LocationPing, Crossing, BlockedUser, CrossingLike, SavedCrossing, Follow, LookView, LookLike, Notification
-from app.schemas import LocationPingCreate, CrossingWithDetails
+from app.core.zones import get_zone_indexes, encode_cell, cell_id_to_zone_id
+from app.core.ping_index import ping_index, IndexedPing, ensure_ping_index_loaded_async
+from app.core.geocoding import resolve_location_name
+from app.core.crossing_detection import detect_crossings
+from app.core.crossing_worker import crossing_worker
+from app.core.hydration import load_look_parts, load_users
+from app.core.read_models import CrossingCard
+from app.models import User, Look, LookPhoto, LocationPing, Crossing, CrossingFeedEntry, CrossingLike, SavedCrossing, LookView, LookLike, Notification
+from app.schemas import LocationPingCreate, LocationPingBatch, CrossingWithDetails
+from app.api.pagination import paginate, set_next_cursor
+from app.api.responses import fast_json
 from app.api.deps import get_current_user
 
-# Geocoder pour reverse geocoding
-geolocator = Nominatim(user_agent="lookup_app")
-
 def round_coordinates(lat: float, lon: float, precision: int = 3) -> tuple:
     """
     Arrondir les coordonnees pour proteger la vie privee.
@@ -27,41 +32,6 @@ def round_coordinates(lat: float, lon: float, precision: int = 3) -> tuple:
         return round(lat, precision), round(lon, precision)
     return 0, 0
 
-def are_friends(db: Session, user1_id: int, user2_id: int) -> bool:
-    """Verifier si deux utilisateurs sont amis (se suivent mutuellement)"""
-    follows = db.query(Follow).filter(
-        Follow.follower_id == user1_id,
-        Follow.followed_id == user2_id
-    ).first()
-    followed_by = db.query(Follow).filter(
-        Follow.follower_id == user2_id,
-        Follow.followed_id == user1_id
-    ).first()
-    return follows is not None and followed_by is not None
-
-
-def get_location_name(latitude: float, longitude: float) -> str:
-    """
-    Obtenir le nom du lieu a partir des coordonnees.
-    Pour la vie privee, on montre le quartier/arrondissement, PAS la rue exacte.
-    """
-    try:
-        location = geolocator.reverse(f"{latitude}, {longitude}", language="fr", timeout=5)
-        if location and location.raw.get("address"):
-            addr = location.raw["address"]
-            # Pour la vie privee: quartier > arrondissement > ville (jamais la rue exacte)
-            if addr.get("neighbourhood"):
-                return addr["neighbourhood"]
-            elif addr.get("suburb"):
-                return addr["suburb"]
-            elif addr.get("city_district"):  # Arrondissement a Paris
-                return addr["city_district"]
-            elif addr.get("city") or addr.get("town"):
-                return addr.get("city") or addr.get("town")
-        return "Zone de croisement"
-    except Exception:
-        return "Zone de croisement"
-
 def _get_look_photo_urls(look):
     """Helper: retourne la liste des photo_urls d'un look"""
     if look.photos and len(look.photos) > 0:
@@ -70,27 +40,90 @@ def _get_look_photo_urls(look):
         return [look.photo_url]
     return []
 
+def _get_look_photos(look):
+    """Helper: photos d'un look avec leur placeholder (BlurHash, couleur, dimensions)"""
+    if look.photos and len(look.photos) > 0:
+        return [
+            {
+                "photo_url": p.photo_url,
+                "width": p.width,
+                "height": p.height,
+                "blurhash": p.blurhash,
+                "dominant_color": p.dominant_color,
+            }
+            for p in look.photos
+        ]
+    elif look.photo_url:
+        return [{"photo_url": look.photo_url}]
+    return []
+
 router = APIRouter(prefix="/crossings", tags=["Crossings"])
 limiter = Limiter(key_func=get_remote_address)
 
+# Nombre max de pings par batch et anciennete max acceptee
+MAX_PINGS_PER_BATCH = 500
+MAX_BATCH_PING_AGE_HOURS = 24
+
 @router.post("/ping")
 @limiter.limit("30/minute")  # 30 pings max par minute par IP
 async def send_location_ping(
     request: Request,
     location: LocationPingCreate,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Envoyer sa position et detecter les croisements.
     Utilise un systeme de zones 50m x 50m.
+    Par defaut la detection tourne dans le worker de fond: la reponse ne
+    contient alors pas encore les nouveaux croisements.
     """
     # Valider les coordonnees
     if not (-90 <= location.latitude <= 90) or not (-180 <= location.longitude <= 180):
         raise HTTPException(status_code=400, detail="Coordonnees GPS invalides")
 
-    # Calculer la zone de l'utilisateur
-    zone_id = get_zone_id(location.latitude, location.longitude)
+    # Calculer la zone de l'utilisateur ("lat:lon" pour l'affichage, cell id pour les requetes)
+    zone_lat, zone_lon = get_zone_indexes(location.latitude, location.longitude)
+    zone_id = f"{zone_lat}:{zone_lon}"
+    cell_id = encode_cell(zone_lat, zone_lon)
+
+    now = datetime.utcnow()
+    indexed_ping = IndexedPing(
+        user_id=current_user.id,
+        cell_id=cell_id,
+        latitude=location.latitude,
+        longitude=location.longitude,
+        timestamp=now,
+    )
+
+    if settings.CROSSING_DETECTION_ASYNC:
+        # Insere en attente de detection (repris au redemarrage si la file est
+        # perdue), visible tout de suite pour les autres, traite par le worker
+        if settings.PING_INDEX_ENABLED:
+            await ensure_ping_index_loaded_async()
+        ping = LocationPing(
+            user_id=current_user.id,
+            latitude=location.latitude,
+            longitude=location.longitude,
+            zone_id=zone_id,
+            cell_id=cell_id,
+            accuracy=location.accuracy,
+            timestamp=now,
+            detection_pending=True
+        )
+        db.add(ping)
+        await db.commit()
+        if settings.PING_INDEX_ENABLED:
+            ping_index.add(indexed_ping)
+        crossing_worker.enqueue(ping.id, indexed_ping)
+        return {
+            "ping_saved": True,
+            "zone": zone_id,
+            "new_crossings": 0,
+            "crossings": [],
+            "queued": True
+        }
 
     # Sauvegarder le ping avec la zone
     ping = LocationPing(
@@ -98,122 +131,146 @@ async def send_location_ping(
         latitude=location.latitude,
         longitude=location.longitude,
         zone_id=zone_id,
-        accuracy=location.accuracy
+        cell_id=cell_id,
+        accuracy=location.accuracy,
+        timestamp=now
     )
     db.add(ping)
 
-    # Fenetre de temps pour detecter un croisement (10 min par defaut)
-    time_window = datetime.utcnow() - timedelta(minutes=settings.CROSSING_TIME_WINDOW_MINUTES)
+    # Croisements avec les utilisateurs de la MEME ZONE ou zones adjacentes
+    if settings.PING_INDEX_ENABLED:
+        await ensure_ping_index_loaded_async()
+    new_crossings, unresolved = await db.run_sync(detect_crossings, current_user.id, [indexed_ping])
 
-    # Obtenir les zones adjacentes (rayon de ~100m)
-    adjacent_zones = get_adjacent_zones(zone_id)
+    # Doublons de croisement ignores par l'INSERT ... ON CONFLICT DO NOTHING
+    await db.commit()
 
-    # Trouver les autres utilisateurs dans la MEME ZONE ou zones adjacentes
-    users_in_same_zone = db.query(LocationPing).filter(
-        LocationPing.user_id != current_user.id,
-        LocationPing.zone_id.in_(adjacent_zones),  # Zone + 8 voisins
-        LocationPing.timestamp >= time_window
-    ).all()
+    # Resoudre le nom du lieu apres la reponse, si absent du cache
+    for zone, lat, lon in unresolved:
+        background_tasks.add_task(resolve_location_name, zone, lat, lon)
 
-    new_crossings = []
-    seen_user_ids = set()  # Eviter les doublons dans la meme boucle
+    # Indexer le ping seulement une fois persiste
+    if settings.PING_INDEX_ENABLED:
+        ping_index.add(indexed_ping)
 
-    # Fenetre plus longue pour eviter les doublons (1 heure)
-    dedup_window = datetime.utcnow() - timedelta(hours=1)
+    return {
+        "ping_saved": True,
+        "zone": zone_id,
+        "new_crossings": len(new_crossings),
+        "crossings": new_crossings
+    }
 
-    for other_ping in users_in_same_zone:
-        # Dedupliquer par utilisateur dans cette boucle
-        if other_ping.user_id in seen_user_ids:
-            continue
-        seen_user_ids.add(other_ping.user_id)
 
-        # Verifier que l'autre utilisateur est visible
-        other_user = db.query(User).filter(User.id == other_ping.user_id).first()
-        if other_user and other_user.is_visible == False:
-            continue
+def _index_trajectory(trajectory: list) -> None:
+    """Indexer les pings encore dans la fenetre de detection"""
+    if settings.PING_INDEX_ENABLED:
+        index_since = datetime.utcnow() - ping_index.window
+        for indexed in trajectory:
+            if indexed.timestamp >= index_since:
+                ping_index.add(indexed)
 
-        # Verifier qu'on n'a pas deja detecte ce croisement recemment
-        existing = db.query(Crossing).filter(
-            or_(
-                and_(
-                    Crossing.user1_id == current_user.id,
-                    Crossing.user2_id == other_ping.user_id
-                ),
-                and_(
-                    Crossing.user1_id == other_ping.user_id,
-                    Crossing.user2_id == current_user.id
-                )
-            ),
-            Crossing.crossed_at >= dedup_window  # 1 heure au lieu de 10 min
-        ).first()
-
-        if not existing:
-            # Obtenir le look le plus recent (< 24h) de chaque utilisateur
-            since_24h = datetime.utcnow() - timedelta(hours=24)
-            my_look = db.query(Look).filter(
-                Look.user_id == current_user.id,
-                Look.created_at >= since_24h,
-            ).order_by(Look.created_at.desc()).first()
-
-            other_look = db.query(Look).filter(
-                Look.user_id == other_ping.user_id,
-                Look.created_at >= since_24h,
-            ).order_by(Look.created_at.desc()).first()
-
-            # Obtenir le nom du lieu
-            location_name = get_location_name(location.latitude, location.longitude)
-
-            # Creer le croisement
-            crossing = Crossing(
-                user1_id=current_user.id,
-                user2_id=other_ping.user_id,
-                zone_id=zone_id,
-                latitude=location.latitude,
-                longitude=location.longitude,
-                location_name=location_name,
-                user1_look_id=my_look.id if my_look else None,
-                user2_look_id=other_look.id if other_look else None
-            )
-            db.add(crossing)
-            new_crossings.append({
-                "user_id": other_ping.user_id,
-                "zone": zone_id
-            })
-
-    try:
-        db.commit()
-    except Exception as e:
-        # En cas de race condition (doublon), rollback et retenter sans les doublons
-        db.rollback()
-        import logging
-        logging.getLogger(__name__).warning(f"Race condition croisement, retry sans doublons: {e}")
-        # Le ping est perdu mais on le resauvegarde
-        ping_retry = LocationPing(
-            user_id=current_user.id,
-            latitude=location.latitude,
-            longitude=location.longitude,
-            zone_id=zone_id,
-            accuracy=location.accuracy
+
+@router.post("/ping/batch")
+@limiter.limit("10/minute")
+async def send_location_pings_batch(
+    request: Request,
+    batch: LocationPingBatch,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Envoyer une trajectoire de positions bufferisees (mauvaise connexion).
+    Les pings sont inseres en une fois et la detection des croisements tourne
+    une seule fois sur toute la trajectoire, avec l'horodatage de chaque ping.
+    Comme pour /ping, la detection tourne par defaut dans le worker de fond.
+    """
+    if len(batch.pings) > MAX_PINGS_PER_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {MAX_PINGS_PER_BATCH} positions par envoi"
         )
-        db.add(ping_retry)
-        try:
-            db.commit()
-        except Exception:
-            db.rollback()
-        new_crossings = []
+
+    now = datetime.utcnow()
+    oldest_allowed = now - timedelta(hours=MAX_BATCH_PING_AGE_HOURS)
+
+    pings = []
+    for item in batch.pings:
+        # Horodatages en UTC naif comme en base; pas de pings dans le futur
+        timestamp = item.timestamp
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        timestamp = min(timestamp, now)
+        if timestamp < oldest_allowed:
+            continue
+        pings.append((item, IndexedPing(
+            user_id=current_user.id,
+            cell_id=encode_cell(*get_zone_indexes(item.latitude, item.longitude)),
+            latitude=item.latitude,
+            longitude=item.longitude,
+            timestamp=timestamp,
+        )))
+
+    if not pings:
+        return {"pings_saved": 0, "new_crossings": 0, "crossings": []}
+
+    pings.sort(key=lambda pair: pair[1].timestamp)
+    trajectory = [indexed for _, indexed in pings]
+
+    if settings.PING_INDEX_ENABLED:
+        await ensure_ping_index_loaded_async()
+
+    # Un seul INSERT pour tous les pings
+    rows = [
+        {
+            "user_id": current_user.id,
+            "latitude": indexed.latitude,
+            "longitude": indexed.longitude,
+            "zone_id": cell_id_to_zone_id(indexed.cell_id),
+            "cell_id": indexed.cell_id,
+            "accuracy": item.accuracy,
+            "timestamp": indexed.timestamp,
+            "detection_pending": settings.CROSSING_DETECTION_ASYNC,
+        }
+        for item, indexed in pings
+    ]
+
+    if settings.CROSSING_DETECTION_ASYNC:
+        ping_ids = (await db.scalars(
+            insert(LocationPing).returning(LocationPing.id, sort_by_parameter_order=True), rows
+        )).all()
+        await db.commit()
+        _index_trajectory(trajectory)
+        crossing_worker.enqueue_trajectory(list(ping_ids), trajectory)
+        return {
+            "pings_saved": len(trajectory),
+            "new_crossings": 0,
+            "crossings": [],
+            "queued": True
+        }
+
+    await db.execute(insert(LocationPing), rows)
+    new_crossings, unresolved = await db.run_sync(detect_crossings, current_user.id, trajectory)
+    await db.commit()
+
+    for zone, lat, lon in unresolved:
+        background_tasks.add_task(resolve_location_name, zone, lat, lon)
+
+    _index_trajectory(trajectory)
 
     return {
-        "ping_saved": True,
-        "zone": zone_id,
+        "pings_saved": len(trajectory),
         "new_crossings": len(new_crossings),
         "crossings": new_crossings
     }
 
 @router.get("/", response_model=List[CrossingWithDetails])
 async def get_my_crossings(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -221,122 +278,78 @@ async def get_my_crossings(
     Les looks croises restent visibles pendant 24h.
     Ne montre que le croisement le plus recent par utilisateur.
     Filtre les utilisateurs bloques.
+    Lu depuis le fil materialise (crossing_feed), pagine par cle: passer le
+    header X-Next-Cursor de la reponse dans `cursor` pour la page suivante.
     """
-    # Seulement les croisements des dernieres 24h
+    limit = max(1, min(limit, 100))
     since_24h = datetime.utcnow() - timedelta(hours=24)
 
-    # Obtenir les IDs des utilisateurs bloques (dans les deux sens)
-    blocked_by_me = db.query(BlockedUser.blocked_id).filter(
-        BlockedUser.blocker_id == current_user.id
-    ).all()
-    blocked_me = db.query(BlockedUser.blocker_id).filter(
-        BlockedUser.blocked_id == current_user.id
-    ).all()
-    blocked_ids = set([b[0] for b in blocked_by_me] + [b[0] for b in blocked_me])
+    entries = (await db.execute(paginate(select(
+        CrossingFeedEntry.crossing_id, CrossingFeedEntry.other_user_id,
+        CrossingFeedEntry.look_id, CrossingFeedEntry.crossed_at
+    ).where(
+        CrossingFeedEntry.owner_id == current_user.id,
+        CrossingFeedEntry.crossed_at >= since_24h,
+        CrossingFeedEntry.look_created_at >= since_24h,
+    ), (CrossingFeedEntry.crossed_at, CrossingFeedEntry.look_id), cursor, limit, skip))).all()
+    set_next_cursor(response, entries, limit, lambda e: (e.crossed_at, e.look_id))
+    if not entries:
+        return fast_json([], response)
+
+    # Charger la page en colonnes (croisements, utilisateurs, looks + photos/items)
+    crossings = {row.id: row for row in (await db.execute(select(
+        Crossing.id, Crossing.crossed_at, Crossing.latitude, Crossing.longitude, Crossing.location_name
+    ).where(
+        Crossing.id.in_({e.crossing_id for e in entries})
+    ))).all()}
+    users = await load_users(db, {e.other_user_id for e in entries})
+    looks = await load_look_parts(db, [e.look_id for e in entries])
 
-    all_crossings = db.query(Crossing).filter(
-        or_(
-            Crossing.user1_id == current_user.id,
-            Crossing.user2_id == current_user.id
-        ),
-        Crossing.crossed_at >= since_24h  # Visible 24h
-    ).order_by(Crossing.crossed_at.desc()).all()
-
-    # Collecter les utilisateurs croises uniques (filtrer bloques + prives)
-    crossed_user_ids = set()
-    crossing_info = {}  # user_id -> premier croisement (pour location/time)
-
-    for c in all_crossings:
-        other_user_id = c.user2_id if c.user1_id == current_user.id else c.user1_id
-        # Ignorer si utilisateur bloque
-        if other_user_id in blocked_ids:
-            continue
-        # Verifier si profil prive
-        other_user = db.query(User).filter(User.id == other_user_id).first()
-        if other_user and other_user.is_private:
-            # Profil prive: verifier si amis (se suivent mutuellement)
-            if not are_friends(db, current_user.id, other_user_id):
-                continue
-        crossed_user_ids.add(other_user_id)
-        # Garder le croisement le plus recent pour cet utilisateur
-        if other_user_id not in crossing_info:
-            crossing_info[other_user_id] = c
-
-    # Pour chaque utilisateur croise, obtenir TOUS ses looks < 24h
     result = []
-    since_24h = datetime.utcnow() - timedelta(hours=24)
-
-    for other_user_id in crossed_user_ids:
-        other_user = db.query(User).filter(User.id == other_user_id).first()
-        if not other_user:
-            continue
-
-        # Obtenir TOUS les looks de cet utilisateur (< 24h)
-        other_looks = db.query(Look).options(
-            joinedload(Look.photos)
-        ).filter(
-            Look.user_id == other_user_id,
-            Look.created_at >= since_24h,
-        ).order_by(Look.created_at.desc()).all()
-
-        if not other_looks:
+    for entry in entries:
+        crossing = crossings.get(entry.crossing_id)
+        other_user = users.get(entry.other_user_id)
+        look_parts = looks.get(entry.look_id)
+        if not crossing or not other_user or not look_parts:
             continue
-
-        # Utiliser les infos du croisement
-        crossing = crossing_info[other_user_id]
+        look = look_parts.look
         rounded_lat, rounded_lon = round_coordinates(crossing.latitude, crossing.longitude)
-
-        # Creer une entree pour CHAQUE look
-        for look in other_looks:
-            look_items = [
-                {
-                    "category": item.category,
-                    "brand": item.brand,
-                    "product_name": item.product_name,
-                    "color": item.color
-                }
-                for item in look.items
-            ]
-
-            result.append(CrossingWithDetails(
-                id=crossing.id,  # ID du croisement
-                crossed_at=crossing.crossed_at,
-                latitude=rounded_lat,
-                longitude=rounded_lon,
-                location_name=crossing.location_name,
-                other_user_id=other_user.id,
-                other_username=other_user.username,
-                other_avatar_url=other_user.avatar_url,
-                other_look_id=look.id,
-                other_look_title=look.title,
-                other_look_photo_url=look.photo_url,
-                other_look_photo_urls=_get_look_photo_urls(look),
-                other_look_items=look_items,
-                views_count=look.views_count,
-                likes_count=look.likes_count
-            ))
-
-    # Trier par date de creation du look (plus recent en premier)
-    result.sort(key=lambda x: x.crossed_at, reverse=True)
-
-    # Appliquer pagination
-    return result[skip:skip + limit]
+        result.append(CrossingCard(
+            id=crossing.id,  # ID du croisement
+            crossed_at=crossing.crossed_at,
+            latitude=rounded_lat,
+            longitude=rounded_lon,
+            location_name=crossing.location_name,
+            other_user_id=other_user.id,
+            other_username=other_user.username,
+            other_avatar_url=other_user.avatar_url,
+            other_look_id=look.id,
+            other_look_title=look.title,
+            other_look_photo_url=look.photo_url,
+            other_look_photo_urls=look_parts.photo_urls,
+            other_look_photos=look_parts.photos,
+            other_look_items=look_parts.items,
+            views_count=look.views_count,
+            likes_count=look.likes_count
+        ))
+
+    return fast_json(result, response)
 
 @router.get("/{crossing_id}")
 async def get_crossing_detail(
     crossing_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir les details d'un croisement"""
 
-    crossing = db.query(Crossing).filter(
+    crossing = await db.scalar(select(Crossing).where(
         Crossing.id == crossing_id,
         or_(
             Crossing.user1_id == current_user.id,
             Crossing.user2_id == current_user.id
         )
-    ).first()
+    ))
 
     if not crossing:
         raise HTTPException(
@@ -352,7 +365,7 @@ async def get_crossing_detail(
         crossing.user2_viewed = datetime.utcnow()
         crossing.views_count += 1
 
-    db.commit()
+    await db.commit()
 
     # Retourner les details complets
     if crossing.user1_id == current_user.id:
@@ -362,40 +375,40 @@ async def get_crossing_detail(
         other_user_id = crossing.user1_id
         other_look_id = crossing.user1_look_id
 
-    other_user = db.query(User).filter(User.id == other_user_id).first()
+    other_user = await db.get(User, other_user_id)
 
     # Toujours prendre le look le plus recent (< 24h)
     since_24h = datetime.utcnow() - timedelta(hours=24)
 
-    other_look = db.query(Look).options(
-        joinedload(Look.photos)
-    ).filter(
+    other_look = (await db.scalars(select(Look).options(
+        joinedload(Look.photos),
+        joinedload(Look.items)
+    ).where(
         Look.user_id == other_user_id,
         Look.created_at >= since_24h,
-    ).order_by(Look.created_at.desc()).first()
+    ).order_by(Look.created_at.desc()).limit(1))).unique().first()
 
     # Propager la vue sur le look associe (apres resolution du look)
     if other_look and other_look.user_id != current_user.id:
-        existing_look_view = db.query(LookView).filter(
+        existing_look_view = await db.scalar(select(LookView).where(
             LookView.look_id == other_look.id,
             LookView.user_id == current_user.id
-        ).first()
+        ))
         if not existing_look_view:
             db.add(LookView(look_id=other_look.id, user_id=current_user.id))
             other_look.views_count += 1
-            db.commit()
-            db.refresh(other_look)
+            await db.commit()
 
     # Verifier si l'utilisateur a like/sauvegarde ce croisement
-    user_liked = db.query(CrossingLike).filter(
+    user_liked = await db.scalar(select(CrossingLike).where(
         CrossingLike.crossing_id == crossing_id,
         CrossingLike.user_id == current_user.id
-    ).first() is not None
+    )) is not None
 
-    user_saved = db.query(SavedCrossing).filter(
+    user_saved = await db.scalar(select(SavedCrossing).where(
         SavedCrossing.crossing_id == crossing_id,
         SavedCrossing.user_id == current_user.id
-    ).first() is not None
+    )) is not None
 
     # Arrondir les coordonnees pour la vie privee
     rounded_lat, rounded_lon = round_coordinates(crossing.latitude, crossing.longitude)
@@ -426,6 +439,7 @@ async def get_crossing_detail(
             "id": other_look.id,
             "photo_url": other_look.photo_url,
             "photo_urls": _get_look_photo_urls(other_look),
+            "photos": _get_look_photos(other_look),
             "title": other_look.title,
             "items": [
                 {
@@ -445,19 +459,19 @@ async def get_crossing_detail(
 @router.post("/{crossing_id}/like")
 async def like_crossing(
     crossing_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Liker un croisement.
     """
-    crossing = db.query(Crossing).filter(
+    crossing = await db.scalar(select(Crossing).where(
         Crossing.id == crossing_id,
         or_(
             Crossing.user1_id == current_user.id,
             Crossing.user2_id == current_user.id
         )
-    ).first()
+    ))
 
     if not crossing:
         raise HTTPException(
@@ -466,10 +480,10 @@ async def like_crossing(
         )
 
     # Verifier si deja like
-    existing_like = db.query(CrossingLike).filter(
+    existing_like = await db.scalar(select(CrossingLike).where(
         CrossingLike.crossing_id == crossing_id,
         CrossingLike.user_id == current_user.id
-    ).first()
+    ))
 
     # Determiner le look de l'autre utilisateur
     if crossing.user1_id == current_user.id:
@@ -479,48 +493,44 @@ async def like_crossing(
 
     if existing_like:
         # Unlike - Opération atomique
-        db.delete(existing_like)
-        db.query(Crossing).filter(Crossing.id == crossing_id).update(
-            {Crossing.likes_count: Crossing.likes_count - 1},
-            synchronize_session=False
-        )
+        await db.delete(existing_like)
+        await db.execute(update(Crossing).where(Crossing.id == crossing_id).values(
+            likes_count=Crossing.likes_count - 1
+        ).execution_options(synchronize_session=False))
         # Propager unlike sur le look
         if other_look_id:
-            existing_look_like = db.query(LookLike).filter(
+            existing_look_like = await db.scalar(select(LookLike).where(
                 LookLike.look_id == other_look_id,
                 LookLike.user_id == current_user.id
-            ).first()
+            ))
             if existing_look_like:
-                db.delete(existing_look_like)
-                db.query(Look).filter(Look.id == other_look_id).update(
-                    {Look.likes_count: Look.likes_count - 1},
-                    synchronize_session=False
-                )
-        db.commit()
-        db.refresh(crossing)
+                await db.delete(existing_look_like)
+                await db.execute(update(Look).where(Look.id == other_look_id).values(
+                    likes_count=Look.likes_count - 1
+                ).execution_options(synchronize_session=False))
+        await db.commit()
+        await db.refresh(crossing)
         return {"liked": False, "likes_count": max(0, crossing.likes_count)}
     else:
         # Like - Opération atomique
         new_like = CrossingLike(crossing_id=crossing_id, user_id=current_user.id)
         db.add(new_like)
-        db.query(Crossing).filter(Crossing.id == crossing_id).update(
-            {Crossing.likes_count: Crossing.likes_count + 1},
-            synchronize_session=False
-        )
+        await db.execute(update(Crossing).where(Crossing.id == crossing_id).values(
+            likes_count=Crossing.likes_count + 1
+        ).execution_options(synchronize_session=False))
         # Propager like sur le look
         if other_look_id:
-            existing_look_like = db.query(LookLike).filter(
+            existing_look_like = await db.scalar(select(LookLike).where(
                 LookLike.look_id == other_look_id,
                 LookLike.user_id == current_user.id
-            ).first()
+            ))
             if not existing_look_like:
                 db.add(LookLike(look_id=other_look_id, user_id=current_user.id))
-                db.query(Look).filter(Look.id == other_look_id).update(
-                    {Look.likes_count: Look.likes_count + 1},
-                    synchronize_session=False
-                )
+                await db.execute(update(Look).where(Look.id == other_look_id).values(
+                    likes_count=Look.likes_count + 1
+                ).execution_options(synchronize_session=False))
             # Notification like pour le proprietaire du look
-            other_look = db.query(Look).filter(Look.id == other_look_id).first()
+            other_look = await db.get(Look, other_look_id)
             if other_look and other_look.user_id != current_user.id:
                 db.add(Notification(
                     user_id=other_look.user_id,
@@ -528,27 +538,27 @@ async def like_crossing(
                     type="like",
                     look_id=other_look_id,
                 ))
-        db.commit()
-        db.refresh(crossing)
+        await db.commit()
+        await db.refresh(crossing)
         return {"liked": True, "likes_count": crossing.likes_count}
 
 
 @router.post("/{crossing_id}/save")
 async def save_crossing(
     crossing_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Sauvegarder un croisement.
     """
-    crossing = db.query(Crossing).filter(
+    crossing = await db.scalar(select(Crossing).where(
         Crossing.id == crossing_id,
         or_(
             Crossing.user1_id == current_user.id,
             Crossing.user2_id == current_user.id
         )
-    ).first()
+    ))
 
     if not crossing:
         raise HTTPException(
@@ -557,50 +567,68 @@ async def save_crossing(
         )
 
     # Verifier si deja sauvegarde
-    existing = db.query(SavedCrossing).filter(
+    existing = await db.scalar(select(SavedCrossing).where(
         SavedCrossing.crossing_id == crossing_id,
         SavedCrossing.user_id == current_user.id
-    ).first()
+    ))
 
     if existing:
         # Retirer la sauvegarde
-        db.delete(existing)
-        db.commit()
+        await db.delete(existing)
+        await db.commit()
         return {"saved": False}
     else:
         # Sauvegarder
         new_save = SavedCrossing(crossing_id=crossing_id, user_id=current_user.id)
         db.add(new_save)
-        db.commit()
+        await db.commit()
         return {"saved": True}
 
 
 @router.get("/saved/list")
 async def get_saved_crossings(
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtenir tous les croisements sauvegardes"""
-    saved = db.query(SavedCrossing).filter(
+    """Obtenir les croisements sauvegardes, plus recents d'abord (page suivante: header X-Next-Cursor dans `cursor`)"""
+    limit = max(1, min(limit, 100))
+    saved = (await db.execute(paginate(select(
+        SavedCrossing.id, SavedCrossing.crossing_id, SavedCrossing.created_at
+    ).where(
         SavedCrossing.user_id == current_user.id
-    ).order_by(SavedCrossing.created_at.desc()).all()
+    ), (SavedCrossing.created_at, SavedCrossing.id), cursor, limit))).all()
+    set_next_cursor(response, saved, limit, lambda s: (s.created_at, s.id))
+    if not saved:
+        return []
+
+    # Charger la page par requetes IN (croisements, autres utilisateurs, leurs looks)
+    crossings = {row.id: row for row in (await db.execute(select(
+        Crossing.id, Crossing.user1_id, Crossing.user2_id, Crossing.user1_look_id, Crossing.user2_look_id,
+        Crossing.crossed_at, Crossing.location_name, Crossing.likes_count, Crossing.views_count
+    ).where(
+        Crossing.id.in_({s.crossing_id for s in saved})
+    ))).all()}
+
+    # Determiner l'autre utilisateur et son look
+    others = {}
+    for crossing in crossings.values():
+        if crossing.user1_id == current_user.id:
+            others[crossing.id] = (crossing.user2_id, crossing.user2_look_id)
+        else:
+            others[crossing.id] = (crossing.user1_id, crossing.user1_look_id)
+    users = await load_users(db, {user_id for user_id, _ in others.values()})
+    looks = await load_look_parts(db, [look_id for _, look_id in others.values() if look_id])
 
     result = []
     for s in saved:
-        crossing = db.query(Crossing).filter(Crossing.id == s.crossing_id).first()
+        crossing = crossings.get(s.crossing_id)
         if not crossing:
             continue
-
-        # Determiner l'autre utilisateur
-        if crossing.user1_id == current_user.id:
-            other_user_id = crossing.user2_id
-            other_look_id = crossing.user2_look_id
-        else:
-            other_user_id = crossing.user1_id
-            other_look_id = crossing.user1_look_id
-
-        other_user = db.query(User).filter(User.id == other_user_id).first()
-        other_look = db.query(Look).options(joinedload(Look.photos)).filter(Look.id == other_look_id).first() if other_look_id else None
+        other_user_id, other_look_id = others[crossing.id]
+        look_parts = looks.get(other_look_id)
 
         result.append({
             "id": crossing.id,
@@ -609,13 +637,10 @@ async def get_saved_crossings(
             "likes_count": crossing.likes_count,
             "views_count": crossing.views_count,
             "saved_at": s.created_at.isoformat(),
-            "other_user": {
-                "id": other_user.id,
-                "username": other_user.username,
-                "avatar_url": other_user.avatar_url
-            } if other_user else None,
-            "other_look_photo_url": other_look.photo_url if other_look else None,
-            "other_look_photo_urls": _get_look_photo_urls(other_look) if other_look else []
+            "other_user": users.get(other_user_id),
+            "other_look_photo_url": look_parts.look.photo_url if look_parts else None,
+            "other_look_photo_urls": look_parts.photo_urls if look_parts else [],
+            "other_look_photos": look_parts.photos if look_parts else []
         })
 
     return result
@@ -624,19 +649,19 @@ async def get_saved_crossings(
 @router.get("/{crossing_id}/stats")
 async def get_crossing_stats(
     crossing_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Obtenir les stats d'un croisement (likes, vues, etc.)
     """
-    crossing = db.query(Crossing).filter(
+    crossing = await db.scalar(select(Crossing).where(
         Crossing.id == crossing_id,
         or_(
             Crossing.user1_id == current_user.id,
             Crossing.user2_id == current_user.id
         )
-    ).first()
+    ))
 
     if not crossing:
         raise HTTPException(
@@ -645,16 +670,16 @@ async def get_crossing_stats(
         )
 
     # Verifier si l'utilisateur a like
-    user_liked = db.query(CrossingLike).filter(
+    user_liked = await db.scalar(select(CrossingLike).where(
         CrossingLike.crossing_id == crossing_id,
         CrossingLike.user_id == current_user.id
-    ).first() is not None
+    )) is not None
 
     # Verifier si l'utilisateur a sauvegarde
-    user_saved = db.query(SavedCrossing).filter(
+    user_saved = await db.scalar(select(SavedCrossing).where(
         SavedCrossing.crossing_id == crossing_id,
         SavedCrossing.user_id == current_user.id
-    ).first() is not None
+    )) is not None
 
     return {
         "likes_count": crossing.likes_count,
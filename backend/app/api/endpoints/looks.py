@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File, Form
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 from typing import List, Optional
 from datetime import date
+import asyncio
 import os
 import uuid
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.core.storage import read_upload, upload_photos, delete_photo, delete_photos, FileTooLargeError
+from app.core.crossing_feed import refresh_feeds_showing_user, remove_look_from_feeds
+from app.core.relationships import get_relationships
+from app.core.search import index_look, unindex_looks, search_matches
+from app.core.ranking import PERIODS, period_start, popularity_ranking, ensure_rankings_fresh
+from app.core.hydration import load_look_cards
+from app.core.timelines import fan_out_look, remove_look_from_timelines, pull_authors_query, feed_page_query
 from app.core.config import settings
-from app.core.storage import upload_photo, delete_photo
-from app.models import User, Look, LookPhoto, LookItem, LookLike, LookView, SavedLook, Follow, BlockedUser, Notification
+from app.models import User, Look, LookPhoto, LookItem, LookLike, LookView, SavedLook, Notification
 from app.schemas import LookCreate, LookResponse, LookItemCreate
+from app.api.pagination import paginate, set_next_cursor
+from app.api.responses import fast_json
 from app.api.deps import get_current_user
 
 router = APIRouter(prefix="/looks", tags=["Looks"])
@@ -17,6 +28,8 @@ router = APIRouter(prefix="/looks", tags=["Looks"])
 # Limite de looks par jour
 MAX_LOOKS_PER_DAY = 5
 
+ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
+
 
 def _get_photo_urls(look):
     """Helper: retourne la liste des photo_urls d'un look"""
@@ -27,6 +40,37 @@ def _get_photo_urls(look):
     return []
 
 
+def _get_photos(look):
+    """Helper: photos d'un look avec leur placeholder (BlurHash, couleur, dimensions)"""
+    if look.photos and len(look.photos) > 0:
+        return [
+            {
+                "photo_url": p.photo_url,
+                "width": p.width,
+                "height": p.height,
+                "blurhash": p.blurhash,
+                "dominant_color": p.dominant_color,
+            }
+            for p in look.photos
+        ]
+    elif look.photo_url:
+        return [{"photo_url": look.photo_url}]
+    return []
+
+
+def _look_photo(look_id, photo, position):
+    """LookPhoto depuis un UploadedPhoto, avec le placeholder calcule a l'upload"""
+    return LookPhoto(
+        look_id=look_id,
+        photo_url=photo.url,
+        position=position,
+        width=photo.width,
+        height=photo.height,
+        blurhash=photo.blurhash,
+        dominant_color=photo.dominant_color,
+    )
+
+
 def _look_to_response(look):
     """Convertit un Look ORM en dict avec photo_urls"""
     data = {
@@ -36,6 +80,7 @@ def _look_to_response(look):
         "description": look.description,
         "photo_url": look.photo_url,
         "photo_urls": _get_photo_urls(look),
+        "photos": _get_photos(look),
         "look_date": look.look_date,
         "created_at": look.created_at,
         "items": look.items,
@@ -49,6 +94,52 @@ def _look_to_response(look):
     return data
 
 
+async def _read_look_photos(photos: List[UploadFile]) -> list:
+    """Lire les photos d'un look [(contenu, nom)]; 400 si format ou taille invalide"""
+    files = []
+    for photo in photos:
+        if photo.content_type not in ALLOWED_IMAGE_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Format accepte : JPEG, PNG ou WebP uniquement"
+            )
+        try:
+            content = await read_upload(photo)
+        except FileTooLargeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Fichier trop volumineux (max 5MB)"
+            )
+        files.append((content, photo.filename))
+    return files
+
+
+async def _read_item_photos(item_photos: Optional[List[UploadFile]]) -> tuple:
+    """
+    Lire les photos d'items valides: (index dans item_photos, [(contenu, nom)]).
+    Les fichiers vides, de mauvais format ou trop gros sont ignores.
+    """
+    indexes, files = [], []
+    for idx, ip in enumerate(item_photos or []):
+        if not ip.filename or ip.content_type not in ALLOWED_IMAGE_TYPES:
+            continue
+        try:
+            content = await read_upload(ip)
+        except FileTooLargeError:
+            continue
+        indexes.append(idx)
+        files.append((content, ip.filename))
+    return indexes, files
+
+
+async def _count_looks_on(db: AsyncSession, user_id: int, day: date) -> int:
+    """Nombre de looks d'un utilisateur pour une date"""
+    return await db.scalar(select(func.count()).select_from(Look).where(
+        Look.user_id == user_id,
+        Look.look_date == day
+    ))
+
+
 @router.post("/", response_model=LookResponse, status_code=status.HTTP_201_CREATED)
 async def create_look(
     photos: List[UploadFile] = File(...),
@@ -61,7 +152,7 @@ async def create_look(
     longitude: Optional[float] = Form(None),
     city: Optional[str] = Form(None),
     country: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Creer un nouveau look du jour avec 1 a 5 photos"""
@@ -76,10 +167,7 @@ async def create_look(
 
     # Verifier la limite de looks par jour
     today = date.today()
-    looks_today = db.query(Look).filter(
-        Look.user_id == current_user.id,
-        Look.look_date == today
-    ).count()
+    looks_today = await _count_looks_on(db, current_user.id, today)
 
     if looks_today >= MAX_LOOKS_PER_DAY:
         raise HTTPException(
@@ -87,32 +175,28 @@ async def create_look(
             detail=f"Tu as atteint la limite de {MAX_LOOKS_PER_DAY} looks par jour. Reviens demain !"
         )
 
-    ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
+    # Lire et valider toutes les photos avant le moindre upload
+    photo_files = await _read_look_photos(photos)
+    item_indexes, item_files = await _read_item_photos(item_photos)
 
-    # Upload toutes les photos
-    uploaded_urls = []
-    for photo in photos:
-        if photo.content_type not in ALLOWED_IMAGE_TYPES:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Format accepte : JPEG, PNG ou WebP uniquement"
-            )
-
-        content = await photo.read(settings.MAX_FILE_SIZE + 1)
-        if len(content) > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Fichier trop volumineux (max 5MB)"
-            )
-
-        try:
-            photo_url = await upload_photo(content, photo.filename)
-            uploaded_urls.append(photo_url)
-        except Exception:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Erreur lors de l'upload de la photo"
-            )
+    # Uploads en parallele: la latence est celle du plus lent, pas la somme
+    uploaded, item_uploads = await asyncio.gather(
+        upload_photos(photo_files),
+        upload_photos(item_files, best_effort=True),
+        return_exceptions=True
+    )
+    if isinstance(uploaded, BaseException):
+        # Les photos du look deja envoyees sont supprimees par upload_photos
+        if not isinstance(item_uploads, BaseException):
+            await delete_photos([p.url for p in item_uploads if p])
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erreur lors de l'upload de la photo"
+        )
+    # Photos d'items: un echec ne bloque pas le look (photo absente)
+    item_photo_urls = {
+        idx: p.url for idx, p in zip(item_indexes, item_uploads) if p
+    } if not isinstance(item_uploads, BaseException) else {}
 
     # Parser la date
     parsed_date = date.today()
@@ -127,7 +211,7 @@ async def create_look(
         user_id=current_user.id,
         title=title,
         description=description,
-        photo_url=uploaded_urls[0],
+        photo_url=uploaded[0].url,
         look_date=parsed_date,
         latitude=latitude,
         longitude=longitude,
@@ -135,30 +219,12 @@ async def create_look(
         country=country[:100] if country else None
     )
     db.add(look)
-    db.commit()
-    db.refresh(look)
+    await db.commit()
 
     # Creer les LookPhoto records
-    for position, url in enumerate(uploaded_urls):
-        db.add(LookPhoto(look_id=look.id, photo_url=url, position=position))
-    db.commit()
-
-    # Uploader les photos d'items si fournies
-    item_photo_urls = {}
-    if item_photos:
-        for idx, ip in enumerate(item_photos):
-            if not ip.filename:
-                continue
-            if ip.content_type not in ALLOWED_IMAGE_TYPES:
-                continue
-            ip_content = await ip.read(settings.MAX_FILE_SIZE + 1)
-            if len(ip_content) > settings.MAX_FILE_SIZE:
-                continue
-            try:
-                ip_url = await upload_photo(ip_content, ip.filename)
-                item_photo_urls[idx] = ip_url
-            except Exception:
-                pass
+    for position, photo in enumerate(uploaded):
+        db.add(_look_photo(look.id, photo, position))
+    await db.commit()
 
     # Ajouter les items si fournis
     VALID_CATEGORIES = {"top", "bottom", "shoes", "accessory", "outerwear", "other"}
@@ -192,43 +258,51 @@ async def create_look(
                     photo_url=item_photo_url
                 )
                 db.add(item)
-            db.commit()
+            await db.commit()
         except json.JSONDecodeError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Format JSON invalide pour les items"
             )
 
-    db.refresh(look)
+    # Indexer pour la recherche, ajouter le look aux fils des utilisateurs croises
+    # et aux timelines des abonnes
+    await db.run_sync(index_look, look.id)
+    await db.run_sync(refresh_feeds_showing_user, current_user.id)
+    await db.run_sync(fan_out_look, look.id)
+    await db.commit()
+
+    await db.refresh(look, ["photos", "items"])
     return _look_to_response(look)
 
 @router.get("/", response_model=List[LookResponse])
 async def get_my_looks(
+    response: Response,
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtenir mes looks"""
-    looks = db.query(Look).options(
-        joinedload(Look.photos)
-    ).filter(
+    """Obtenir mes looks (page suivante: header X-Next-Cursor dans `cursor`)"""
+    looks = (await db.scalars(paginate(select(Look).options(
+        selectinload(Look.photos),
+        selectinload(Look.items)
+    ).where(
         Look.user_id == current_user.id
-    ).order_by(Look.look_date.desc()).offset(skip).limit(limit).all()
+    ), (Look.look_date, Look.id), cursor, limit, skip))).all()
+    set_next_cursor(response, looks, limit, lambda l: (l.look_date, l.id))
     return [_look_to_response(l) for l in looks]
 
 
 @router.get("/limit")
 async def get_looks_limit(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir le nombre de looks restants pour aujourd'hui"""
     today = date.today()
-    looks_today = db.query(Look).filter(
-        Look.user_id == current_user.id,
-        Look.look_date == today
-    ).count()
+    looks_today = await _count_looks_on(db, current_user.id, today)
 
     return {
         "looks_today": looks_today,
@@ -237,226 +311,189 @@ async def get_looks_limit(
     }
 
 
+def _discover_ranked_page(period: str, cursor: Optional[str], skip: int, limit: int):
+    """
+    Page de discover depuis le classement precalcule: (ids de looks, curseur suivant).
+    Curseur "<version>_<position>": la suite de la meme version du classement.
+    """
+    limit = max(1, min(limit, 100))
+    snapshot = None
+    position = skip
+    if cursor:
+        try:
+            version, position = (int(part) for part in cursor.split("_", 1))
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur invalide")
+        snapshot = popularity_ranking.get(period, version)
+    # Position negative (curseur forge, skip): pas de lecture depuis la fin
+    position = max(0, position)
+    # Version du curseur expiree: meme position dans le classement courant
+    snapshot = snapshot or popularity_ranking.current(period)
+    page_ids = snapshot.look_ids[position:position + limit]
+    next_cursor = f"{snapshot.version}_{position + limit}" if position + limit < len(snapshot.look_ids) else None
+    return list(page_ids), next_cursor
+
+
 @router.get("/discover")
 async def discover_looks(
+    response: Response,
     q: Optional[str] = None,  # Search query
     period: str = "week",  # today, week, month, all
     skip: int = 0,
     limit: int = 20,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Découvrir des looks - recherche par titre, triés par likes"""
-    from datetime import datetime, timedelta
+    """
+    Découvrir des looks - recherche plein texte, triés par pertinence puis par likes.
+    Sans recherche: page du classement precalcule par periode.
+    Page suivante: passer le header X-Next-Cursor de la reponse dans `cursor`.
+    """
+    from datetime import datetime
 
-    # Calculer la date de début selon la période
-    now = datetime.utcnow()
-    if period == "today":
-        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    elif period == "week":
-        start_date = now - timedelta(days=7)
-    elif period == "month":
-        start_date = now - timedelta(days=30)
-    else:  # all
-        start_date = None
-
-    # Construire la requête
-    query = db.query(Look).options(
-        joinedload(Look.user),
-        joinedload(Look.items),
-        joinedload(Look.photos)
-    )
+    # Calculer la date de début selon la période (None pour all)
+    start_date = period_start(period, datetime.utcnow())
+
+    # Construire la requête (ids et cles de tri seulement, les looks sont charges apres)
+    query = select(Look.id, Look.likes_count, Look.created_at)
 
     # Filtre par période
     if start_date:
-        query = query.filter(Look.created_at >= start_date)
-
-    # Filtre par recherche (titre)
-    if q and len(q) >= 2:
-        search_term = f"%{q.lower()}%"
-        query = query.filter(Look.title.ilike(search_term))
+        query = query.where(Look.created_at >= start_date)
 
-    # Trier par likes (les plus populaires en premier)
-    query = query.order_by(Look.likes_count.desc(), Look.created_at.desc())
+    # Recherche plein texte (titre, description, marques, produits, couleurs)
+    matches = search_matches(db.get_bind().dialect.name, q) if q and len(q) >= 2 else None
+    if matches is not None:
+        query = query.join(matches, matches.c.look_id == Look.id)
 
-    # Pagination
-    looks = query.offset(skip).limit(limit).all()
+    if matches is None and settings.DISCOVER_RANKING_ENABLED:
+        await ensure_rankings_fresh()
+        look_ids, next_cursor = _discover_ranked_page(
+            period if period in PERIODS else "all", cursor, skip, limit
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    else:
+        # Trier par pertinence (recherche) puis par likes (les plus populaires en premier)
+        columns = [Look.likes_count, Look.created_at, Look.id]
+        if matches is not None:
+            query = query.add_columns(matches.c.rank)
+            columns.insert(0, matches.c.rank)
+        rows = (await db.execute(paginate(query, columns, cursor, limit, skip))).all()
+        look_ids = [row.id for row in rows]
+        set_next_cursor(response, rows, limit, lambda row: (
+            *row[3:], row.likes_count, row.created_at, row.id
+        ))
 
-    result = []
-    for look in looks:
-        user = look.user
-        if not user:
-            continue
-        result.append({
-            "id": look.id,
-            "title": look.title,
-            "photo_url": look.photo_url,
-            "photo_urls": _get_photo_urls(look),
-            "look_date": look.look_date.isoformat(),
-            "created_at": look.created_at.isoformat(),
-            "likes_count": look.likes_count,
-            "views_count": look.views_count,
-            # Pas de localisation pour la sécurité
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "avatar_url": user.avatar_url
-            },
-            "items": [
-                {
-                    "category": item.category,
-                    "brand": item.brand,
-                    "product_name": item.product_name,
-                    "color": item.color,
-                    "photo_url": item.photo_url
-                }
-                for item in look.items
-            ]
-        })
-
-    return result
+    # Looks supprimes depuis le calcul du classement ignores
+    return fast_json(await load_look_cards(db, look_ids), response)
 
 
 @router.get("/feed")
 async def get_friends_feed(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    primary_db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtenir les looks du jour des gens que je suis"""
+    """
+    Obtenir les looks du jour des gens que je suis (page suivante: header X-Next-Cursor dans `cursor`).
+    Lu depuis la timeline materialisee (look_timelines), plus les looks des
+    auteurs tres suivis, non pousses dans les timelines.
+    """
     today = date.today()
 
-    # Obtenir les IDs des gens suivis
-    following_ids = [
-        f.followed_id for f in db.query(Follow).filter(
-            Follow.follower_id == current_user.id
-        ).all()
-    ]
-
-    if not following_ids:
-        return []
-
-    # Obtenir leurs looks du jour avec user precharge
-    looks = db.query(Look).options(
-        joinedload(Look.user),
-        joinedload(Look.items),
-        joinedload(Look.photos)
-    ).filter(
-        Look.user_id.in_(following_ids),
-        Look.look_date == today
-    ).order_by(Look.created_at.desc()).offset(skip).limit(limit).all()
-
-    result = []
-    for look in looks:
-        user = look.user
-        if not user:
-            continue
-        result.append({
-            "id": look.id,
-            "title": look.title,
-            "photo_url": look.photo_url,
-            "photo_urls": _get_photo_urls(look),
-            "look_date": look.look_date.isoformat(),
-            "created_at": look.created_at.isoformat(),
-            "likes_count": look.likes_count,
-            "views_count": look.views_count,
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "avatar_url": user.avatar_url
-            } if user else None,
-            "items": [
-                {
-                    "category": item.category,
-                    "brand": item.brand,
-                    "product_name": item.product_name,
-                    "color": item.color,
-                    "photo_url": item.photo_url
-                }
-                for item in look.items
-            ]
-        })
-
-    return result
+    # Auteurs tres suivis ayant poste aujourd'hui, restreints a ceux que je suis
+    pull_author_ids = set((await db.scalars(pull_authors_query(today))).all())
+    if pull_author_ids:
+        # Relations lues sur la primaire: elles alimentent le cache partage
+        relationships = await primary_db.run_sync(get_relationships, current_user.id)
+        pull_author_ids &= relationships.following
+
+    # Page des ids de looks, puis chargement des looks
+    query, columns = feed_page_query(current_user.id, today, pull_author_ids)
+    rows = (await db.execute(paginate(query, columns, cursor, limit, skip))).all()
+    set_next_cursor(response, rows, limit, lambda row: (row.created_at, row.id))
+
+    return fast_json(await load_look_cards(db, [row.id for row in rows]), response)
 
 
 @router.get("/today", response_model=List[LookResponse])
 async def get_today_looks(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir les looks des dernieres 24h"""
     from datetime import datetime, timedelta
     yesterday = datetime.utcnow() - timedelta(hours=24)
-    looks = db.query(Look).options(
-        joinedload(Look.photos)
-    ).filter(
+    looks = (await db.scalars(select(Look).options(
+        selectinload(Look.photos),
+        selectinload(Look.items)
+    ).where(
         Look.user_id == current_user.id,
         Look.created_at >= yesterday
-    ).order_by(Look.created_at.desc()).all()
+    ).order_by(Look.created_at.desc()))).all()
     return [_look_to_response(l) for l in looks]
 
 @router.get("/{look_id}")
 async def get_look(
     look_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir un look par ID avec infos utilisateur"""
-    look = db.query(Look).options(joinedload(Look.photos)).filter(Look.id == look_id).first()
+    look = await db.scalar(select(Look).options(
+        joinedload(Look.photos),
+        joinedload(Look.items)
+    ).where(Look.id == look_id))
     if not look:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Look non trouve"
         )
 
-    user = db.query(User).filter(User.id == look.user_id).first()
+    # populate_existing: pour son propre look, l'identite est current_user,
+    # rattache depuis le cache avec les seuls champs essentiels
+    user = await db.get(User, look.user_id, populate_existing=True)
 
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Look non trouve")
 
     # Verifier l'acces: bloques et profils prives
     if user.id != current_user.id:
+        relationships = await db.run_sync(get_relationships, current_user.id)
         # Bloque ?
-        blocked = db.query(BlockedUser).filter(
-            ((BlockedUser.blocker_id == current_user.id) & (BlockedUser.blocked_id == user.id)) |
-            ((BlockedUser.blocker_id == user.id) & (BlockedUser.blocked_id == current_user.id))
-        ).first()
-        if blocked:
+        if relationships.is_blocked(user.id):
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Look non trouve")
 
         # Profil prive ?
-        if user.is_private:
-            is_friend = db.query(Follow).filter(
-                Follow.follower_id == current_user.id, Follow.followed_id == user.id
-            ).first() and db.query(Follow).filter(
-                Follow.follower_id == user.id, Follow.followed_id == current_user.id
-            ).first()
-            if not is_friend:
-                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Ce profil est prive")
+        if user.is_private and not relationships.is_friend(user.id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Ce profil est prive")
 
     # Verifier si l'utilisateur courant like/saved ce look
-    user_liked = db.query(LookLike).filter(
+    user_liked = await db.scalar(select(LookLike).where(
         LookLike.look_id == look_id,
         LookLike.user_id == current_user.id
-    ).first() is not None
+    )) is not None
 
-    user_saved = db.query(SavedLook).filter(
+    user_saved = await db.scalar(select(SavedLook).where(
         SavedLook.look_id == look_id,
         SavedLook.user_id == current_user.id
-    ).first() is not None
+    )) is not None
 
     # Enregistrer la vue
-    existing_view = db.query(LookView).filter(
+    existing_view = await db.scalar(select(LookView).where(
         LookView.look_id == look_id,
         LookView.user_id == current_user.id
-    ).first()
+    ))
     if not existing_view and look.user_id != current_user.id:
         db.add(LookView(look_id=look_id, user_id=current_user.id))
         look.views_count += 1
-        db.commit()
-        db.refresh(look)
+        await db.commit()
 
     return {
         "id": look.id,
@@ -464,6 +501,7 @@ async def get_look(
         "description": look.description,
         "photo_url": look.photo_url,
         "photo_urls": _get_photo_urls(look),
+        "photos": _get_photos(look),
         "look_date": look.look_date.isoformat(),
         "created_at": look.created_at.isoformat(),
         "likes_count": look.likes_count,
@@ -504,16 +542,16 @@ async def update_look(
     item_photos: Optional[List[UploadFile]] = File(None),
     delete_photo_ids_json: Optional[str] = Form(None),  # JSON array d'IDs de LookPhoto a supprimer
     existing_photos_json: Optional[str] = Form(None),  # JSON array d'IDs ordonnés pour réordonnancement
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Mettre a jour un look avec support multi-photos"""
     import json
 
-    look = db.query(Look).options(joinedload(Look.photos)).filter(
+    look = await db.scalar(select(Look).options(joinedload(Look.photos)).where(
         Look.id == look_id,
         Look.user_id == current_user.id
-    ).first()
+    ))
 
     if not look:
         raise HTTPException(
@@ -527,8 +565,6 @@ async def update_look(
     if description is not None:
         look.description = description
 
-    ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
-
     # 1. Supprimer les photos demandees
     if delete_photo_ids_json:
         try:
@@ -537,7 +573,7 @@ async def update_look(
                 for photo_record in list(look.photos):
                     if photo_record.id in delete_ids:
                         await delete_photo(photo_record.photo_url)
-                        db.delete(photo_record)
+                        await db.delete(photo_record)
         except json.JSONDecodeError:
             pass
 
@@ -547,46 +583,23 @@ async def update_look(
             ordered_ids = json.loads(existing_photos_json)
             if isinstance(ordered_ids, list):
                 for new_pos, photo_id in enumerate(ordered_ids):
-                    photo_record = db.query(LookPhoto).filter(
+                    photo_record = await db.scalar(select(LookPhoto).where(
                         LookPhoto.id == photo_id, LookPhoto.look_id == look_id
-                    ).first()
+                    ))
                     if photo_record:
                         photo_record.position = new_pos
         except json.JSONDecodeError:
             pass
 
     # 3. Ajouter les nouvelles photos
-    # Determiner la position de depart
-    existing_photos = db.query(LookPhoto).filter(LookPhoto.look_id == look_id).all()
+    # Session sans autoflush: rendre visibles les suppressions ci-dessus
+    await db.flush()
+    existing_photos = (await db.scalars(select(LookPhoto).where(LookPhoto.look_id == look_id))).all()
     next_position = max([p.position for p in existing_photos], default=-1) + 1
+    photo_files = await _read_look_photos([photo for photo in photos if photo.filename]) if photos else []
 
-    if photos:
-        for photo in photos:
-            if not photo.filename:
-                continue
-            if photo.content_type not in ALLOWED_IMAGE_TYPES:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Format accepte : JPEG, PNG ou WebP uniquement"
-                )
-            content = await photo.read(settings.MAX_FILE_SIZE + 1)
-            if len(content) > settings.MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Fichier trop volumineux (max 5MB)"
-                )
-            try:
-                photo_url = await upload_photo(content, photo.filename)
-                db.add(LookPhoto(look_id=look.id, photo_url=photo_url, position=next_position))
-                next_position += 1
-            except Exception:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Erreur lors de l'upload de la photo"
-                )
-
-    # Verifier qu'il reste au moins 1 photo et max 5
-    total_photos = db.query(LookPhoto).filter(LookPhoto.look_id == look_id).count()
+    # Verifier qu'il reste au moins 1 photo et max 5, avant tout upload
+    total_photos = len(existing_photos) + len(photo_files)
     if total_photos < 1:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -598,29 +611,30 @@ async def update_look(
             detail="Maximum 5 photos par look"
         )
 
+    if photo_files:
+        try:
+            new_photos = await upload_photos(photo_files)
+        except Exception:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Erreur lors de l'upload de la photo"
+            )
+        for photo in new_photos:
+            db.add(_look_photo(look.id, photo, next_position))
+            next_position += 1
+        await db.flush()
+
     # 4. Mettre a jour photo_url = premiere photo (backward compat)
-    first_photo = db.query(LookPhoto).filter(
+    first_photo = await db.scalar(select(LookPhoto).where(
         LookPhoto.look_id == look_id
-    ).order_by(LookPhoto.position).first()
+    ).order_by(LookPhoto.position).limit(1))
     if first_photo:
         look.photo_url = first_photo.photo_url
 
-    # Uploader les photos d'items si fournies
-    item_photo_urls = {}
-    if item_photos:
-        for idx, ip in enumerate(item_photos):
-            if not ip.filename:
-                continue
-            if ip.content_type not in ALLOWED_IMAGE_TYPES:
-                continue
-            ip_content = await ip.read(settings.MAX_FILE_SIZE + 1)
-            if len(ip_content) > settings.MAX_FILE_SIZE:
-                continue
-            try:
-                ip_url = await upload_photo(ip_content, ip.filename)
-                item_photo_urls[idx] = ip_url
-            except Exception:
-                pass
+    # Uploader les photos d'items si fournies (en parallele, echecs ignores)
+    item_indexes, item_files = await _read_item_photos(item_photos)
+    item_uploads = await upload_photos(item_files, best_effort=True)
+    item_photo_urls = {idx: p.url for idx, p in zip(item_indexes, item_uploads) if p}
 
     # Mettre a jour les items si fournis
     ALLOWED_CATEGORIES = {"top", "bottom", "shoes", "accessory", "outerwear", "other"}
@@ -633,11 +647,11 @@ async def update_look(
                     detail="Les items doivent etre une liste"
                 )
             # Supprimer les anciennes photos d'items
-            old_items = db.query(LookItem).filter(LookItem.look_id == look_id).all()
+            old_items = (await db.scalars(select(LookItem).where(LookItem.look_id == look_id))).all()
             for old_item in old_items:
                 if old_item.photo_url:
                     await delete_photo(old_item.photo_url)
-            db.query(LookItem).filter(LookItem.look_id == look_id).delete()
+            await db.execute(delete(LookItem).where(LookItem.look_id == look_id))
             for item_data in items:
                 if not isinstance(item_data, dict):
                     continue
@@ -669,22 +683,23 @@ async def update_look(
                 detail="Format JSON invalide pour les items"
             )
 
-    db.commit()
-    db.refresh(look)
+    await db.run_sync(index_look, look.id)
+    await db.commit()
+    await db.refresh(look, ["photos", "items"])
     return _look_to_response(look)
 
 
 @router.delete("/{look_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_look(
     look_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Supprimer un look"""
-    look = db.query(Look).filter(
+    look = await db.scalar(select(Look).options(joinedload(Look.items)).where(
         Look.id == look_id,
         Look.user_id == current_user.id
-    ).first()
+    ))
 
     if not look:
         raise HTTPException(
@@ -692,33 +707,34 @@ async def delete_look(
             detail="Look non trouve"
         )
 
-    # Supprimer toutes les photos de Supabase Storage
-    look_photos = db.query(LookPhoto).filter(LookPhoto.look_id == look_id).all()
-    for lp in look_photos:
-        await delete_photo(lp.photo_url)
+    # Supprimer toutes les photos de Supabase Storage (en parallele)
+    look_photos = (await db.scalars(select(LookPhoto).where(LookPhoto.look_id == look_id))).all()
+    photo_urls = [lp.photo_url for lp in look_photos]
     # Fallback: supprimer aussi photo_url principale si pas dans look_photos
     if look.photo_url and not look_photos:
-        await delete_photo(look.photo_url)
+        photo_urls.append(look.photo_url)
     # Supprimer les photos d'items
-    for item in look.items:
-        if item.photo_url:
-            await delete_photo(item.photo_url)
+    photo_urls.extend(item.photo_url for item in look.items if item.photo_url)
+    await delete_photos(photo_urls)
 
-    db.delete(look)
-    db.commit()
+    await db.run_sync(remove_look_from_feeds, look.id)
+    await db.run_sync(remove_look_from_timelines, look.id)
+    await db.run_sync(unindex_looks, [look.id])
+    await db.delete(look)
+    await db.commit()
 
 
 @router.post("/{look_id}/like")
 async def like_look(
     look_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Liker un look (anonyme).
     Le proprietaire du look voit juste le nombre, pas qui a like.
     """
-    look = db.query(Look).filter(Look.id == look_id).first()
+    look = await db.scalar(select(Look).where(Look.id == look_id))
     if not look:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -726,30 +742,28 @@ async def like_look(
         )
 
     # Verifier si deja like
-    existing_like = db.query(LookLike).filter(
+    existing_like = await db.scalar(select(LookLike).where(
         LookLike.look_id == look_id,
         LookLike.user_id == current_user.id
-    ).first()
+    ))
 
     if existing_like:
         # Unlike (retirer le like) - Opération atomique
-        db.delete(existing_like)
-        db.query(Look).filter(Look.id == look_id).update(
-            {Look.likes_count: Look.likes_count - 1},
-            synchronize_session=False
-        )
-        db.commit()
+        await db.delete(existing_like)
+        await db.execute(update(Look).where(Look.id == look_id).values(
+            likes_count=Look.likes_count - 1
+        ).execution_options(synchronize_session=False))
+        await db.commit()
         # Récupérer la valeur mise à jour
-        db.refresh(look)
+        await db.refresh(look)
         return {"liked": False, "likes_count": max(0, look.likes_count)}
     else:
         # Like - Opération atomique
         new_like = LookLike(look_id=look_id, user_id=current_user.id)
         db.add(new_like)
-        db.query(Look).filter(Look.id == look_id).update(
-            {Look.likes_count: Look.likes_count + 1},
-            synchronize_session=False
-        )
+        await db.execute(update(Look).where(Look.id == look_id).values(
+            likes_count=Look.likes_count + 1
+        ).execution_options(synchronize_session=False))
         # Notification like (pas si propre look)
         if look.user_id != current_user.id:
             db.add(Notification(
@@ -758,22 +772,22 @@ async def like_look(
                 type="like",
                 look_id=look_id,
             ))
-        db.commit()
-        db.refresh(look)
+        await db.commit()
+        await db.refresh(look)
         return {"liked": True, "likes_count": look.likes_count}
 
 
 @router.post("/{look_id}/view")
 async def view_look(
     look_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Enregistrer une vue sur un look (anonyme).
     Compte uniquement 1 vue par utilisateur.
     """
-    look = db.query(Look).filter(Look.id == look_id).first()
+    look = await db.scalar(select(Look).where(Look.id == look_id))
     if not look:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -785,16 +799,16 @@ async def view_look(
         return {"viewed": False, "views_count": look.views_count}
 
     # Verifier si deja vu
-    existing_view = db.query(LookView).filter(
+    existing_view = await db.scalar(select(LookView).where(
         LookView.look_id == look_id,
         LookView.user_id == current_user.id
-    ).first()
+    ))
 
     if not existing_view:
         new_view = LookView(look_id=look_id, user_id=current_user.id)
         db.add(new_view)
         look.views_count += 1
-        db.commit()
+        await db.commit()
 
     return {"viewed": True, "views_count": look.views_count}
 
@@ -802,14 +816,14 @@ async def view_look(
 @router.get("/{look_id}/stats")
 async def get_look_stats(
     look_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Obtenir les stats d'un look (likes, vues).
     Indique aussi si l'utilisateur courant a like.
     """
-    look = db.query(Look).filter(Look.id == look_id).first()
+    look = await db.scalar(select(Look).where(Look.id == look_id))
     if not look:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -817,16 +831,16 @@ async def get_look_stats(
         )
 
     # Verifier si l'utilisateur a like
-    user_liked = db.query(LookLike).filter(
+    user_liked = await db.scalar(select(LookLike).where(
         LookLike.look_id == look_id,
         LookLike.user_id == current_user.id
-    ).first() is not None
+    )) is not None
 
     # Verifier si l'utilisateur a sauvegarde
-    user_saved = db.query(SavedLook).filter(
+    user_saved = await db.scalar(select(SavedLook).where(
         SavedLook.look_id == look_id,
         SavedLook.user_id == current_user.id
-    ).first() is not None
+    )) is not None
 
     return {
         "likes_count": look.likes_count,
@@ -839,11 +853,11 @@ async def get_look_stats(
 @router.post("/{look_id}/save")
 async def save_look(
     look_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Sauvegarder un look (bookmark)"""
-    look = db.query(Look).filter(Look.id == look_id).first()
+    look = await db.scalar(select(Look).where(Look.id == look_id))
     if not look:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -851,36 +865,44 @@ async def save_look(
         )
 
     # Verifier si deja sauvegarde
-    existing = db.query(SavedLook).filter(
+    existing = await db.scalar(select(SavedLook).where(
         SavedLook.look_id == look_id,
         SavedLook.user_id == current_user.id
-    ).first()
+    ))
 
     if existing:
         # Retirer la sauvegarde
-        db.delete(existing)
-        db.commit()
+        await db.delete(existing)
+        await db.commit()
         return {"saved": False}
     else:
         # Sauvegarder
         new_save = SavedLook(look_id=look_id, user_id=current_user.id)
         db.add(new_save)
-        db.commit()
+        await db.commit()
         return {"saved": True}
 
 
 @router.get("/saved/list", response_model=List[LookResponse])
 async def get_saved_looks(
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtenir tous les looks sauvegardes"""
-    saved = db.query(SavedLook).filter(
+    """Obtenir les looks sauvegardes, plus recents d'abord (page suivante: header X-Next-Cursor dans `cursor`)"""
+    limit = max(1, min(limit, 100))
+    saved = (await db.scalars(paginate(select(SavedLook).where(
         SavedLook.user_id == current_user.id
-    ).order_by(SavedLook.created_at.desc()).all()
+    ), (SavedLook.created_at, SavedLook.id), cursor, limit))).all()
+    set_next_cursor(response, saved, limit, lambda s: (s.created_at, s.id))
 
     look_ids = [s.look_id for s in saved]
-    looks = db.query(Look).options(joinedload(Look.photos)).filter(Look.id.in_(look_ids)).all() if look_ids else []
+    looks = (await db.scalars(select(Look).options(
+        selectinload(Look.photos),
+        selectinload(Look.items)
+    ).where(Look.id.in_(look_ids)))).all() if look_ids else []
 
     # Trier par ordre de sauvegarde
     look_dict = {look.id: look for look in looks}
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session, joinedload
-from typing import List
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models import User, Notification
-from app.schemas.notification import NotificationResponse, NotificationActor
+from app.core.read_models import NotificationCard, NotificationActorRecord
+from app.schemas.notification import NotificationResponse
+from app.api.pagination import paginate, set_next_cursor
+from app.api.responses import fast_json
 from app.api.deps import get_current_user
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
@@ -12,60 +16,68 @@ router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
 @router.get("/", response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(30, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Liste paginee des notifications, plus recentes en premier"""
-    notifs = db.query(Notification).options(
-        joinedload(Notification.actor)
-    ).filter(
+    """Liste paginee des notifications, plus recentes en premier (page suivante: header X-Next-Cursor dans `cursor`)"""
+    # Une requete en colonnes; l'acteur par jointure interne (acteur supprime: ignoree)
+    rows = (await db.execute(paginate(select(
+        Notification.id, Notification.type, Notification.look_id, Notification.is_read,
+        Notification.created_at, User.id.label("actor_id"), User.username, User.avatar_url,
+        User.full_name
+    ).join(User, User.id == Notification.actor_id).where(
         Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
+    ), (Notification.created_at, Notification.id), cursor, limit, skip))).all()
+    set_next_cursor(response, rows, limit, lambda n: (n.created_at, n.id))
 
-    result = []
-    for n in notifs:
-        if not n.actor:
-            continue
-        result.append(NotificationResponse(
+    return fast_json([
+        NotificationCard(
             id=n.id,
             type=n.type,
-            actor=NotificationActor(
-                id=n.actor.id,
-                username=n.actor.username,
-                avatar_url=n.actor.avatar_url,
-                full_name=n.actor.full_name,
+            actor=NotificationActorRecord(
+                id=n.actor_id,
+                username=n.username,
+                avatar_url=n.avatar_url,
+                full_name=n.full_name,
             ),
             look_id=n.look_id,
             is_read=n.is_read,
             created_at=n.created_at,
-        ))
-    return result
+        )
+        for n in rows
+    ], response)
 
 
 @router.get("/unread-count")
 async def get_unread_count(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Nombre de notifications non lues"""
-    count = db.query(Notification).filter(
+    """
+    Nombre de notifications non lues.
+    Lu sur la base principale: juste apres /read-all, la replica peut encore
+    renvoyer l'ancien compteur du badge.
+    """
+    count = await db.scalar(select(func.count()).select_from(Notification).where(
         Notification.user_id == current_user.id,
         Notification.is_read == False
-    ).count()
+    ))
     return {"count": count}
 
 
 @router.put("/read-all")
 async def mark_all_read(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Marquer toutes les notifications comme lues"""
-    db.query(Notification).filter(
+    await db.execute(update(Notification).where(
         Notification.user_id == current_user.id,
         Notification.is_read == False
-    ).update({"is_read": True})
-    db.commit()
+    ).values(is_read=True))
+    await db.commit()
     return {"success": True}
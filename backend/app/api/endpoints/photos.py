@@ -1,20 +1,89 @@
 import re
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import Response
-from app.core.storage import download_photo, extract_filename
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import FileResponse, Response
+from app.core.images import variant_filename
+from app.core.storage import open_photo
 
 router = APIRouter(prefix="/photos", tags=["photos"])
 
 # Regex pour valider le format UUID des noms de fichiers
 UUID_FILENAME_PATTERN = re.compile(r'^[a-f0-9\-]+\.\w+$', re.IGNORECASE)
 
+# Noms UUID jamais reutilises: le contenu d'une URL ne change pas
+PHOTO_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _parse_range(range_header: str, length: int) -> Optional[tuple[int, int]]:
+    """
+    Plage "bytes=debut-fin" -> (debut, fin incluse), ou None si non satisfiable.
+    Les plages multiples ne sont pas gerees (ValueError: reponse complete).
+    """
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        raise ValueError("Range non gere")
+    start, end = match.groups()
+    if not start and not end:
+        raise ValueError("Range non gere")
+    if not start:
+        # Suffixe: les N derniers octets
+        suffix = int(end)
+        if suffix == 0:
+            return None
+        return max(length - suffix, 0), length - 1
+    start = int(start)
+    end = min(int(end), length - 1) if end else length - 1
+    if start >= length or start > end:
+        return None
+    return start, end
+
+
+def _bytes_response(request: Request, data: bytes, content_type: str, headers: dict) -> Response:
+    """
+    Contenu en memoire (petites variantes du cache memoire, ou cache disque
+    desactive), avec support des requetes Range (une seule plage)
+    """
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == headers["ETag"]):
+        try:
+            byte_range = _parse_range(range_header, len(data))
+        except ValueError:
+            byte_range = (0, len(data) - 1)
+        if byte_range is None:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "Content-Range": f"bytes */{len(data)}"}
+            )
+        start, end = byte_range
+        if (start, end) != (0, len(data) - 1):
+            return Response(
+                content=data[start:end + 1],
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=content_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(data)}"}
+            )
+    return Response(content=data, media_type=content_type, headers=headers)
+
 
 @router.get("/{filename}")
-async def get_photo(filename: str):
+async def get_photo(request: Request, filename: str, size: Literal["thumb", "medium", "full"] = "full"):
     """
     Sert une photo depuis Supabase Storage.
+    size: variante redimensionnee (thumb pour les listes, medium plein ecran mobile).
     Public car les noms de fichiers sont des UUID non devinables.
     Validation du format pour empecher le path traversal.
+    ETag fort (nom de l'objet, immuable): 304 si le client l'a deja, et
+    requetes Range. Les fichiers sur disque sont envoyes sans copie en memoire.
     """
     # Valider le format du filename pour empecher le path traversal
     if '/' in filename or '..' in filename or not UUID_FILENAME_PATTERN.match(filename):
@@ -22,15 +91,24 @@ async def get_photo(filename: str):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Nom de fichier invalide"
         )
+
+    headers = {
+        "ETag": f'"{variant_filename(filename, size)}"',
+        "Cache-Control": PHOTO_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    # Contenu immuable: pas besoin du storage pour valider le cache du client
+    if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
     try:
-        data, content_type = await download_photo(filename)
-        return Response(
-            content=data,
-            media_type=content_type,
-            headers={"Cache-Control": "public, max-age=86400"}
-        )
+        photo = await open_photo(filename, size)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Photo non trouvee"
         )
+    if photo.path:
+        # FileResponse: sendfile si le serveur le permet, sinon par morceaux; gere Range
+        return FileResponse(photo.path, media_type=photo.content_type, headers=headers)
+    return _bytes_response(request, photo.data, photo.content_type, headers)
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, and_, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import List, Optional, Literal
 from pydantic import BaseModel, Field
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.models import User, BlockedUser, Report, Look, Follow, Notification
 from app.api.deps import get_current_user
+from app.core.crossing_feed import refresh_feed_relationship, refresh_feeds_showing_user
+from app.core.timelines import refresh_timeline_pair
+from app.core.relationships import get_relationships, invalidate_relationships
+from app.core.auth_cache import invalidate_current_user
 
 
 class ReportRequest(BaseModel):
@@ -21,7 +26,7 @@ router = APIRouter(prefix="/users", tags=["Users"])
 @router.post("/{user_id}/block")
 async def block_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Bloquer un utilisateur"""
@@ -32,7 +37,7 @@ async def block_user(
         )
 
     # Verifier que l'utilisateur existe
-    target_user = db.query(User).filter(User.id == user_id).first()
+    target_user = await db.get(User, user_id)
     if not target_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,33 +45,39 @@ async def block_user(
         )
 
     # Verifier si deja bloque
-    existing = db.query(BlockedUser).filter(
+    existing = await db.scalar(select(BlockedUser).where(
         BlockedUser.blocker_id == current_user.id,
         BlockedUser.blocked_id == user_id
-    ).first()
+    ))
 
     if existing:
         # Debloquer
-        db.delete(existing)
-        db.commit()
+        await db.delete(existing)
+        await db.run_sync(refresh_feed_relationship, current_user.id, user_id)
+        await db.commit()
+        invalidate_relationships(current_user.id, user_id)
         return {"blocked": False, "message": "Utilisateur debloque"}
     else:
         # Bloquer
         block = BlockedUser(blocker_id=current_user.id, blocked_id=user_id)
         db.add(block)
-        db.commit()
+        await db.run_sync(refresh_feed_relationship, current_user.id, user_id)
+        await db.commit()
+        invalidate_relationships(current_user.id, user_id)
         return {"blocked": True, "message": "Utilisateur bloque"}
 
 
 @router.get("/blocked", response_model=List[dict])
 async def get_blocked_users(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir la liste des utilisateurs bloques"""
-    blocked = db.query(BlockedUser).filter(
+    blocked = (await db.scalars(select(BlockedUser).options(
+        joinedload(BlockedUser.blocked)
+    ).where(
         BlockedUser.blocker_id == current_user.id
-    ).all()
+    ))).all()
 
     return [
         {
@@ -82,16 +93,12 @@ async def get_blocked_users(
 @router.get("/{user_id}/is-blocked")
 async def check_if_blocked(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Verifier si un utilisateur est bloque"""
-    blocked = db.query(BlockedUser).filter(
-        BlockedUser.blocker_id == current_user.id,
-        BlockedUser.blocked_id == user_id
-    ).first()
-
-    return {"is_blocked": blocked is not None}
+    relationships = await db.run_sync(get_relationships, current_user.id)
+    return {"is_blocked": user_id in relationships.blocked}
 
 
 # ============== FOLLOW ==============
@@ -99,7 +106,7 @@ async def check_if_blocked(
 @router.post("/{user_id}/follow")
 async def follow_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Suivre/Ne plus suivre un utilisateur (toggle)"""
@@ -109,7 +116,7 @@ async def follow_user(
             detail="Tu ne peux pas te suivre toi-meme"
         )
 
-    target_user = db.query(User).filter(User.id == user_id).first()
+    target_user = await db.get(User, user_id)
     if not target_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -117,15 +124,18 @@ async def follow_user(
         )
 
     # Verifier si deja suivi ou demande en attente
-    existing = db.query(Follow).filter(
+    existing = await db.scalar(select(Follow).where(
         Follow.follower_id == current_user.id,
         Follow.followed_id == user_id
-    ).first()
+    ))
 
     if existing:
         # Unfollow ou annuler la demande
-        db.delete(existing)
-        db.commit()
+        await db.delete(existing)
+        await db.run_sync(refresh_feed_relationship, current_user.id, user_id)
+        await db.run_sync(refresh_timeline_pair, current_user.id, user_id)
+        await db.commit()
+        invalidate_relationships(current_user.id, user_id)
         if existing.status == "pending":
             return {"following": False, "status": None, "message": "Demande annulee"}
         return {"following": False, "status": None, "message": "Tu ne suis plus cet utilisateur"}
@@ -140,7 +150,9 @@ async def follow_user(
                 actor_id=current_user.id,
                 type="follow_request",
             ))
-            db.commit()
+            await db.run_sync(refresh_feed_relationship, current_user.id, user_id)
+            await db.commit()
+            invalidate_relationships(current_user.id, user_id)
             return {"following": False, "status": "pending", "message": "Demande d'abonnement envoyee"}
         else:
             # Profil public: follow direct
@@ -152,37 +164,37 @@ async def follow_user(
                 actor_id=current_user.id,
                 type="follow",
             ))
-            db.commit()
+            await db.run_sync(refresh_feed_relationship, current_user.id, user_id)
+            await db.run_sync(refresh_timeline_pair, current_user.id, user_id)
+            await db.commit()
+            invalidate_relationships(current_user.id, user_id)
             return {"following": True, "status": "accepted", "message": "Tu suis maintenant cet utilisateur"}
 
 
 @router.get("/{user_id}/is-following")
 async def check_if_following(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Verifier si on suit un utilisateur"""
-    following = db.query(Follow).filter(
-        Follow.follower_id == current_user.id,
-        Follow.followed_id == user_id
-    ).first()
-
-    if following:
-        return {"is_following": following.status == "accepted", "status": following.status}
-    return {"is_following": False, "status": None}
+    relationships = await db.run_sync(get_relationships, current_user.id)
+    follow_status = relationships.follow_status(user_id)
+    return {"is_following": follow_status == "accepted", "status": follow_status}
 
 
 @router.get("/following")
 async def get_following(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir la liste des gens que je suis (acceptes)"""
-    follows = db.query(Follow).filter(
+    follows = (await db.scalars(select(Follow).options(
+        joinedload(Follow.followed)
+    ).where(
         Follow.follower_id == current_user.id,
         Follow.status == "accepted"
-    ).all()
+    ))).all()
 
     return [
         {
@@ -197,14 +209,16 @@ async def get_following(
 
 @router.get("/followers")
 async def get_followers(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir la liste de mes followers (acceptes)"""
-    followers = db.query(Follow).filter(
+    followers = (await db.scalars(select(Follow).options(
+        joinedload(Follow.follower)
+    ).where(
         Follow.followed_id == current_user.id,
         Follow.status == "accepted"
-    ).all()
+    ))).all()
 
     return [
         {
@@ -221,14 +235,16 @@ async def get_followers(
 
 @router.get("/follow-requests")
 async def get_follow_requests(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir la liste des demandes d'abonnement en attente"""
-    requests = db.query(Follow).filter(
+    requests = (await db.scalars(select(Follow).options(
+        joinedload(Follow.follower)
+    ).where(
         Follow.followed_id == current_user.id,
         Follow.status == "pending"
-    ).all()
+    ))).all()
 
     return [
         {
@@ -244,14 +260,14 @@ async def get_follow_requests(
 
 @router.get("/follow-requests/count")
 async def get_follow_requests_count(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Obtenir le nombre de demandes d'abonnement en attente"""
-    count = db.query(Follow).filter(
+    count = await db.scalar(select(func.count()).select_from(Follow).where(
         Follow.followed_id == current_user.id,
         Follow.status == "pending"
-    ).count()
+    ))
 
     return {"count": count}
 
@@ -259,15 +275,15 @@ async def get_follow_requests_count(
 @router.post("/follow-requests/{request_id}/accept")
 async def accept_follow_request(
     request_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Accepter une demande d'abonnement"""
-    follow_request = db.query(Follow).filter(
+    follow_request = await db.scalar(select(Follow).where(
         Follow.id == request_id,
         Follow.followed_id == current_user.id,
         Follow.status == "pending"
-    ).first()
+    ))
 
     if not follow_request:
         raise HTTPException(
@@ -284,23 +300,26 @@ async def accept_follow_request(
         actor_id=current_user.id,
         type="follow_accepted",
     ))
+    await db.run_sync(refresh_feed_relationship, follow_request.follower_id, current_user.id)
+    await db.run_sync(refresh_timeline_pair, follow_request.follower_id, current_user.id)
 
-    db.commit()
+    await db.commit()
+    invalidate_relationships(follow_request.follower_id, current_user.id)
     return {"success": True, "message": "Demande acceptee"}
 
 
 @router.post("/follow-requests/{request_id}/reject")
 async def reject_follow_request(
     request_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Refuser une demande d'abonnement"""
-    follow_request = db.query(Follow).filter(
+    follow_request = await db.scalar(select(Follow).where(
         Follow.id == request_id,
         Follow.followed_id == current_user.id,
         Follow.status == "pending"
-    ).first()
+    ))
 
     if not follow_request:
         raise HTTPException(
@@ -309,36 +328,33 @@ async def reject_follow_request(
         )
 
     # Supprimer la demande
-    db.delete(follow_request)
-    db.commit()
+    await db.delete(follow_request)
+    await db.run_sync(refresh_feed_relationship, follow_request.follower_id, current_user.id)
+    await db.commit()
+    invalidate_relationships(follow_request.follower_id, current_user.id)
     return {"success": True, "message": "Demande refusee"}
 
 
 @router.get("/search")
 async def search_users(
     q: str = Query(..., min_length=2),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
+    primary_db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Rechercher un utilisateur par username"""
     # Echapper les caracteres speciaux SQL LIKE
     safe_q = q.replace("%", "").replace("_", "").replace("\\", "")
-    users = db.query(User).filter(
+    users = (await db.scalars(select(User).where(
         User.username.ilike(f"%{safe_q}%"),
         User.id != current_user.id,
         User.is_active == True,
         or_(User.is_visible == True, User.is_visible == None)
-    ).limit(20).all()
-
-    # Charger les follows en une seule requete (avec le status)
-    user_ids = [u.id for u in users]
-    follow_status = {}
-    if user_ids:
-        follows = db.query(Follow).filter(
-            Follow.follower_id == current_user.id,
-            Follow.followed_id.in_(user_ids)
-        ).all()
-        follow_status = {f.followed_id: f.status for f in follows}
+    ).limit(20))).all()
+
+    # Status des follows depuis le cache des relations (lu sur la primaire)
+    relationships = await primary_db.run_sync(get_relationships, current_user.id)
+    follow_status = {u.id: relationships.follow_status(u.id) for u in users}
 
     return [
         {
@@ -358,7 +374,7 @@ async def search_users(
 @router.post("/report")
 async def report_content(
     report_data: ReportRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Signaler un utilisateur ou un look"""
@@ -380,7 +396,7 @@ async def report_content(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Tu ne peux pas te signaler toi-meme"
             )
-        target_user = db.query(User).filter(User.id == user_id).first()
+        target_user = await db.get(User, user_id)
         if not target_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -388,7 +404,7 @@ async def report_content(
             )
 
     if look_id:
-        target_look = db.query(Look).filter(Look.id == look_id).first()
+        target_look = await db.get(Look, look_id)
         if not target_look:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -400,7 +416,6 @@ async def report_content(
 
     # Verifier si deja signale recemment (eviter le spam)
     from datetime import datetime, timedelta
-    from sqlalchemy import and_
 
     # Construire les filtres dynamiquement
     filters = [
@@ -413,7 +428,7 @@ async def report_content(
     if look_id:
         filters.append(Report.reported_look_id == look_id)
 
-    recent = db.query(Report).filter(and_(*filters)).first()
+    recent = await db.scalar(select(Report).where(and_(*filters)).limit(1))
 
     if recent:
         raise HTTPException(
@@ -430,7 +445,7 @@ async def report_content(
         details=details
     )
     db.add(report)
-    db.commit()
+    await db.commit()
 
     return {"success": True, "message": "Signalement envoye. Merci de nous aider a garder LOOKUP sur."}
 
@@ -440,12 +455,13 @@ async def report_content(
 @router.put("/me/visibility")
 async def update_visibility(
     visible: bool,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Changer la visibilite du profil"""
     current_user.is_visible = visible
-    db.commit()
+    await db.commit()
+    invalidate_current_user(current_user.id)
     return {"is_visible": current_user.is_visible}
 
 
@@ -462,12 +478,14 @@ async def get_visibility(
 @router.put("/me/privacy")
 async def update_privacy(
     is_private: bool,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Activer/desactiver le profil prive (seuls les amis voient le contenu)"""
     current_user.is_private = is_private
-    db.commit()
+    await db.run_sync(refresh_feeds_showing_user, current_user.id)
+    await db.commit()
+    invalidate_current_user(current_user.id)
     return {"is_private": current_user.is_private}
 
 
@@ -477,22 +495,3 @@ async def get_privacy(
 ):
     """Obtenir l'etat du profil prive"""
     return {"is_private": current_user.is_private if current_user.is_private is not None else False}
-
-
-def is_friend(db: Session, user_id: int, other_user_id: int) -> bool:
-    """Verifier si deux utilisateurs sont amis (se suivent mutuellement avec status accepted)"""
-    # Verifier si user_id suit other_user_id (accepte)
-    follows = db.query(Follow).filter(
-        Follow.follower_id == user_id,
-        Follow.followed_id == other_user_id,
-        Follow.status == "accepted"
-    ).first()
-
-    # Verifier si other_user_id suit user_id (accepte)
-    followed_by = db.query(Follow).filter(
-        Follow.follower_id == other_user_id,
-        Follow.followed_id == user_id,
-        Follow.status == "accepted"
-    ).first()
-
-    return follows is not None and followed_by is not None
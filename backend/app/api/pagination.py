@@ -0,0 +1,120 @@
+"""
+Pagination par curseur (keyset) des listes.
+La liste est triee par des colonnes (cle de tri puis id, decroissant); le
+curseur encode les valeurs de la derniere ligne de la page et la page suivante
+est lue avec WHERE (k, id) < (:k, :id), servi par l'index: le cout ne depend
+pas de la profondeur, et les lignes ajoutees entre deux pages ne decalent pas
+la suite. Le curseur est renvoye dans le header X-Next-Cursor (absent sur la
+derniere page) et repasse tel quel dans le parametre `cursor`.
+Colonnes nullables (created_at, likes_count...): NULL en tete de l'ordre
+decroissant, l'ordre natif de PostgreSQL, explicite pour SQLite.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Callable, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, and_, or_, tuple_
+
+CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 100
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if len(value) == 1 and isinstance(value.get("dt"), str):
+            return datetime.fromisoformat(value["dt"])
+        if len(value) == 1 and isinstance(value.get("d"), str):
+            return date.fromisoformat(value["d"])
+        raise ValueError("Valeur de curseur inconnue")
+    if value is None or (isinstance(value, (int, float, str)) and not isinstance(value, bool)):
+        return value
+    raise ValueError("Valeur de curseur invalide")
+
+
+def _python_type(column):
+    """Type Python attendu pour une colonne, None si inconnu (expression calculee)"""
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+def _check_type(value, expected) -> None:
+    if value is None or expected is None:
+        return
+    if expected is float:
+        valid = isinstance(value, (int, float))
+    elif expected is date:
+        valid = isinstance(value, date) and not isinstance(value, datetime)
+    else:
+        valid = isinstance(value, expected)
+    if not valid:
+        raise ValueError("Type de valeur de curseur invalide")
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Curseur opaque depuis les valeurs de tri de la derniere ligne"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    """Valeurs de tri d'un curseur, du type de chaque colonne; 400 s'il est invalide"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Taille de curseur invalide")
+        values = [_decode_value(v) for v in values]
+        for value, column in zip(values, columns):
+            _check_type(value, _python_type(column))
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Curseur invalide")
+
+
+def clamp_limit(limit: int) -> int:
+    """Taille de page ramenee a 1..MAX_PAGE_SIZE"""
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _after(columns: Sequence, values: Sequence):
+    """Lignes apres values dans l'ordre (colonnes decroissantes, NULL en tete)"""
+    if all(value is not None for value in values):
+        # Une colonne NULL rend la comparaison inconnue: ligne exclue, elle est avant le curseur
+        return tuple_(*columns) < tuple(values)
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal = [c.is_(None) if v is None else c == v for c, v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*equal, column.is_not(None) if value is None else column < value))
+    return or_(*clauses)
+
+
+def paginate(query: Select, columns: Sequence, cursor: Optional[str], limit: int, skip: int = 0) -> Select:
+    """
+    Trier query par columns (decroissant) et lire la page apres cursor.
+    skip: ancienne pagination par offset, seulement sans curseur.
+    limit est borne par clamp_limit, comme dans set_next_cursor.
+    """
+    if cursor:
+        query = query.where(_after(columns, decode_cursor(cursor, columns)))
+    elif skip > 0:
+        query = query.offset(skip)
+    return query.order_by(*(column.desc().nulls_first() for column in columns)).limit(clamp_limit(limit))
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int, key: Callable) -> None:
+    """Header X-Next-Cursor si la page est pleine (key: ligne -> valeurs de tri)"""
+    if rows and len(rows) >= clamp_limit(limit):
+        response.headers[CURSOR_HEADER] = encode_cursor(key(rows[-1]))
@@ -0,0 +1,33 @@
+"""
+Reponse JSON rapide des listes chaudes.
+Le contenu (read models, dicts, datetimes) est encode directement par
+orjson. Renvoyer cette reponse depuis un endpoint court-circuite
+jsonable_encoder et la validation response_model (gardee pour la doc OpenAPI).
+"""
+
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+
+# Headers de la reponse injectee a ne pas recopier (propres a son corps vide)
+_BODY_HEADERS = {"content-length", "content-type"}
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def fast_json(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """
+    Reponse encodee par orjson. response: reponse injectee de l'endpoint, dont
+    les headers (X-Next-Cursor...) sont repris: FastAPI les ignore quand
+    l'endpoint renvoie lui-meme une Response.
+    """
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k not in _BODY_HEADERS}
+    return FastJSONResponse(content, headers=headers)
@@ -0,0 +1,120 @@
+"""
+Cache de l'authentification (get_current_user).
+Deux niveaux, bornes (LRU) et a TTL court:
+- token -> user_id: evite de re-verifier la signature JWT a chaque requete
+  (jamais garde au-dela de l'expiration du token)
+- user_id -> champs essentiels (id, is_active, is_private, is_visible): evite
+  le SELECT users a chaque requete de polling. L'utilisateur est rattache a la
+  session sans requete; get_current_user_profile charge les autres colonnes.
+Invalide par les endpoints profil, confidentialite, visibilite et suppression
+de compte; le TTL borne l'obsolescence pour les autres chemins.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from app.core.config import settings
+
+
+class CachedUser(NamedTuple):
+    """Champs de l'utilisateur connecte gardes en cache"""
+    id: int
+    is_active: bool
+    is_private: bool
+    is_visible: bool
+
+
+class AuthCache:
+    """Cache LRU token -> user_id et user_id -> CachedUser avec TTL, thread-safe"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._tokens: OrderedDict = OrderedDict()
+        self._users: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.token_hits = 0
+        self.token_misses = 0
+        self.user_hits = 0
+        self.user_misses = 0
+
+    def _get(self, entries: OrderedDict, key):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry[1]
+
+    def _put(self, entries: OrderedDict, key, value, ttl: float) -> None:
+        entries[key] = (time.monotonic() + ttl, value)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def get_token(self, token: str) -> Optional[int]:
+        with self._lock:
+            user_id = self._get(self._tokens, token)
+            if user_id is None:
+                self.token_misses += 1
+            else:
+                self.token_hits += 1
+            return user_id
+
+    def put_token(self, token: str, user_id: int, expires_at: Optional[float]) -> None:
+        """expires_at: claim "exp" du token (timestamp unix)"""
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._put(self._tokens, token, user_id, ttl)
+
+    def get_user(self, user_id: int) -> Optional[CachedUser]:
+        with self._lock:
+            user = self._get(self._users, user_id)
+            if user is None:
+                self.user_misses += 1
+            else:
+                self.user_hits += 1
+            return user
+
+    def put_user(self, user: CachedUser) -> None:
+        with self._lock:
+            self._put(self._users, user.id, user, self.ttl)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tokens": len(self._tokens),
+                "token_hits": self.token_hits,
+                "token_misses": self.token_misses,
+                "users": len(self._users),
+                "user_hits": self.user_hits,
+                "user_misses": self.user_misses,
+            }
+
+
+auth_cache = AuthCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_current_user(user_id: int) -> None:
+    """A appeler apres le commit d'un changement du compte (profil, prive, visibilite, suppression)"""
+    auth_cache.invalidate_user(user_id)
@@ -10,6 +10,14 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./lookup.db"  # SQLite pour dev, PostgreSQL pour prod
+    DATABASE_REPLICA_URL: str = ""  # Replica en lecture pour les endpoints read-only (vide = primaire)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 10  # Attente max d'une connexion libre avant erreur
+    DB_POOL_RECYCLE_SECONDS: int = 1800  # Renouveler les connexions (coupures cote serveur / proxy)
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 15000  # Par requete des endpoints, PostgreSQL (0 = pas de limite)
+    DB_REPLICA_RETRY_SECONDS: int = 30  # Replica injoignable: primaire pendant ce delai
 
     # JWT - OBLIGATOIRE en production
     SECRET_KEY: str = ""
@@ -41,6 +49,19 @@ class Settings(BaseSettings):
     # Upload
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 5 * 1024 * 1024  # 5MB
+    UPLOAD_CONCURRENCY: int = 4  # Uploads simultanes vers le storage
+
+    # Traitement des photos (sans EXIF, redimensionnees, variantes thumb/medium/full)
+    IMAGE_PROCESSING_ENABLED: bool = True
+    IMAGE_OUTPUT_FORMAT: str = "webp"  # "webp" ou "jpeg"
+    IMAGE_QUALITY: int = 80
+    IMAGE_PROCESS_WORKERS: int = 2  # Processus dedies a l'encodage
+
+    # Cache des photos servies par /photos (devant Supabase Storage)
+    PHOTO_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024  # 0 = pas de cache memoire
+    PHOTO_CACHE_MEMORY_MAX_ITEM_BYTES: int = 512 * 1024  # Plus gros: disque seulement
+    PHOTO_CACHE_DIR: str = "photo_cache"
+    PHOTO_CACHE_DISK_BYTES: int = 2 * 1024 * 1024 * 1024  # 0 = pas de cache disque
 
     # Supabase Storage
     SUPABASE_URL: str = ""
@@ -50,6 +71,49 @@ class Settings(BaseSettings):
     # Geolocation
     CROSSING_RADIUS_METERS: float = 200.0  # Rayon pour detecter un croisement
     CROSSING_TIME_WINDOW_MINUTES: int = 5  # Fenetre de temps pour un croisement
+    PING_INDEX_ENABLED: bool = True  # Index memoire des pings recents (False = requete SQL)
+
+    # Detection sur les trajectoires: segments entre pings consecutifs interpoles
+    CROSSING_TRAJECTORY_ENABLED: bool = True
+    CROSSING_DISTANCE_METERS: float = 50.0  # Distance max au point le plus proche
+    CROSSING_MAX_SEGMENT_MINUTES: int = 10  # Pings plus espaces: pas d'interpolation
+    CROSSING_SEARCH_RADIUS_METERS: float = 500.0  # Marge de recherche des trajectoires voisines
+
+    # Detection des croisements en tache de fond (False = pendant la requete de ping)
+    CROSSING_DETECTION_ASYNC: bool = True
+    CROSSING_WORKER_THREADS: int = 1
+    CROSSING_WORKER_BATCH_SIZE: int = 200  # Pings max par micro-batch
+    CROSSING_WORKER_MAX_WAIT_MS: int = 50  # Attente max pour remplir un micro-batch
+
+    # Retention des location_pings
+    PING_HOT_WINDOW_HOURS: int = 24  # Pings gardes tels quels (detection, batchs bufferises)
+    PING_COMPACTION_INTERVAL_MINUTES: int = 15  # Au-dela: 1 ping par user/zone/intervalle
+    PING_RETENTION_DAYS: int = 30  # Au-dela: suppression
+    PING_RETENTION_JOB_MINUTES: int = 60  # Frequence du job (0 = desactive)
+
+    # Cache des relations (follows, blocages) par utilisateur
+    RELATIONSHIP_CACHE_TTL_SECONDS: int = 300  # 0 = pas de cache
+    RELATIONSHIP_CACHE_MAX_USERS: int = 10_000
+
+    # Cache de get_current_user (tokens decodes, champs essentiels du compte)
+    AUTH_CACHE_TTL_SECONDS: int = 60  # 0 = pas de cache
+    AUTH_CACHE_MAX_ENTRIES: int = 10_000
+
+    # Classement precalcule de /looks/discover
+    DISCOVER_RANKING_ENABLED: bool = True  # False = tri SQL a chaque requete
+    DISCOVER_RANKING_REFRESH_SECONDS: int = 60
+    DISCOVER_RANKING_MAX_LOOKS: int = 10_000  # Par periode
+    DISCOVER_RANKING_SCORE: str = "likes"  # "likes" ou "hot" (likes amortis par l'age)
+    DISCOVER_HOT_GRAVITY: float = 1.5
+
+    # Fil des abonnements: timelines remplies a la creation des looks
+    FEED_FANOUT_MAX_FOLLOWERS: int = 5_000  # Au-dela: looks de l'auteur lus a la lecture du fil
+
+    # Reverse geocoding des croisements
+    GEOCODING_BACKEND: str = "nominatim"  # "nominatim" ou "static" (tests, dev hors ligne)
+    GEOCODING_CACHE_TTL_DAYS: int = 30  # Duree de validite du cache par zone
+    GEOCODING_RETRY_MINUTES: int = 15  # Job de re-resolution des croisements sans nom (0 = desactive)
+    GEOCODING_RETRY_MAX_ZONES: int = 50  # Zones re-resolues par passe (Nominatim: 1 requete/seconde)
 
     # CORS - Frontend URLs autorisees
     CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000,https://lookup-gamma.vercel.app,capacitor://localhost,http://localhost"
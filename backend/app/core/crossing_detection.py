@@ -0,0 +1,298 @@
+"""
+Detection des croisements a partir des pings (zones 50m x 50m, en cell ids entiers).
+Partagee par les endpoints de ping et le worker de fond.
+"""
+
+import calendar
+import math
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.zones import (
+    METERS_PER_DEGREE_LAT, get_adjacent_cells, get_cell_ranges, get_cells_in_box, cell_id_to_zone_id
+)
+from app.core.ping_index import ping_index, IndexedPing, ensure_ping_index_loaded
+from app.core.geocoding import get_cached_location_names
+from app.core.trajectory import find_trajectory_matches
+from app.core.crossing_feed import refresh_feed_pairs
+from app.models import User, Look, LocationPing, Crossing
+
+# Un croisement par paire d'utilisateurs et par heure (index unique)
+CROSSING_DEDUP_SECONDS = 3600
+
+
+def crossing_time_bucket(crossed_at: datetime) -> int:
+    """Intervalle de dedup d'un croisement (une paire au plus par intervalle)"""
+    return int(calendar.timegm(crossed_at.utctimetuple()) // CROSSING_DEDUP_SECONDS)
+
+
+def insert_crossings(db: Session, rows: list) -> set:
+    """
+    INSERT ... ON CONFLICT DO NOTHING sur (user1_id, user2_id, time_bucket).
+    Retourne les paires (user1_id, user2_id) effectivement inserees.
+    """
+    if not rows:
+        return set()
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(Crossing).on_conflict_do_nothing(
+        index_elements=["user1_id", "user2_id", "time_bucket"]
+    ).returning(Crossing.user1_id, Crossing.user2_id)
+    return {tuple(row) for row in db.execute(stmt, rows)}
+
+
+def normalize_crossing_pairs(conn) -> int:
+    """
+    Migration: ordonner les paires existantes (user1_id < user2_id), remplir
+    time_bucket et supprimer les doublons (le premier croisement est garde)
+    avant de creer l'index unique. Retourne le nombre de doublons supprimes.
+    """
+    from app.core.retention import time_bucket_expression
+
+    conn.execute(text("""
+        UPDATE crossings SET
+            user1_id = user2_id, user2_id = user1_id,
+            user1_look_id = user2_look_id, user2_look_id = user1_look_id,
+            user1_viewed = user2_viewed, user2_viewed = user1_viewed
+        WHERE user1_id > user2_id
+    """))
+    bucket = time_bucket_expression(conn.dialect.name, "crossings.crossed_at", CROSSING_DEDUP_SECONDS)
+    conn.execute(text(f"UPDATE crossings SET time_bucket = {bucket} WHERE time_bucket IS NULL"))
+
+    duplicates = """
+        SELECT id FROM crossings WHERE id NOT IN (
+            SELECT MIN(id) FROM crossings GROUP BY user1_id, user2_id, time_bucket
+        )
+    """
+    conn.execute(text(f"DELETE FROM crossing_likes WHERE crossing_id IN ({duplicates})"))
+    conn.execute(text(f"DELETE FROM saved_crossings WHERE crossing_id IN ({duplicates})"))
+    result = conn.execute(text(f"DELETE FROM crossings WHERE id IN ({duplicates})"))
+    return result.rowcount
+
+
+def _load_crossing_candidates(db: Session, user_id: int, candidate_ids: list, now: datetime) -> tuple:
+    """
+    Charger en requetes groupees ce qu'il faut pour creer les croisements:
+    utilisateurs visibles et looks < 24h (la dedup est faite par l'index unique).
+    Le nombre de requetes ne depend pas du nombre d'utilisateurs a proximite.
+    Retourne (ids des utilisateurs a croiser, {user_id: id du look le plus recent}).
+    """
+    if not candidate_ids:
+        return [], {}
+
+    # 1. Garder uniquement les utilisateurs existants et visibles
+    visible_ids = {
+        row[0] for row in db.query(User.id).filter(
+            User.id.in_(candidate_ids),
+            or_(User.is_visible == True, User.is_visible == None)
+        ).all()
+    }
+    crossing_user_ids = [uid for uid in candidate_ids if uid in visible_ids]
+    if not crossing_user_ids:
+        return [], {}
+
+    # 2. Look le plus recent (< 24h) de chaque utilisateur, en une requete
+    since_24h = now - timedelta(hours=24)
+    latest_looks = {}
+    looks = db.query(Look.id, Look.user_id).filter(
+        Look.user_id.in_([user_id] + crossing_user_ids),
+        Look.created_at >= since_24h,
+    ).order_by(Look.created_at.desc()).all()
+    for look_id, look_user_id in looks:
+        latest_looks.setdefault(look_user_id, look_id)
+
+    return crossing_user_ids, latest_looks
+
+
+def _find_nearby_pings(db: Session, user_id: int, pings: list) -> list:
+    """
+    Pings des autres utilisateurs dans les zones adjacentes a `pings` (tries par
+    timestamp), sur la periode couverte +/- CROSSING_TIME_WINDOW_MINUTES.
+    Index memoire si la periode y est encore, sinon une seule requete SQL
+    par plages de cell_id (voisins souvent consecutifs en Z-order).
+    """
+    window = timedelta(minutes=settings.CROSSING_TIME_WINDOW_MINUTES)
+    cells = set()
+    for p in pings:
+        cells.update(get_adjacent_cells(p.cell_id))  # Cell + 8 voisins
+    since = pings[0].timestamp - window
+    until = pings[-1].timestamp + window
+
+    if settings.PING_INDEX_ENABLED and since >= datetime.utcnow() - ping_index.window:
+        # Index memoire: pas de scan de location_pings
+        ensure_ping_index_loaded(db)
+        return ping_index.query(cells, since, exclude_user_id=user_id)
+
+    rows = db.query(
+        LocationPing.user_id,
+        LocationPing.cell_id,
+        LocationPing.latitude,
+        LocationPing.longitude,
+        LocationPing.timestamp,
+    ).filter(
+        LocationPing.user_id != user_id,
+        or_(*[
+            LocationPing.cell_id == low if low == high else LocationPing.cell_id.between(low, high)
+            for low, high in get_cell_ranges(cells)
+        ]),
+        LocationPing.timestamp >= since,
+        LocationPing.timestamp <= until
+    ).all()
+    return [IndexedPing(*row) for row in rows]
+
+
+def _find_nearby_trajectories(db: Session, user_id: int, pings: list) -> dict:
+    """
+    Trajectoires recentes ({user_id: pings tries}, la notre comprise) des
+    utilisateurs ayant un ping a moins de CROSSING_SEARCH_RADIUS_METERS de
+    `pings`, assez tot pour couvrir les segments qui chevauchent les notres.
+    """
+    max_gap = timedelta(minutes=settings.CROSSING_MAX_SEGMENT_MINUTES)
+    window = timedelta(minutes=settings.CROSSING_TIME_WINDOW_MINUTES)
+    candidates_since = pings[0].timestamp - max(max_gap, window)
+    trajectories_since = pings[0].timestamp - 2 * max(max_gap, window)
+    until = pings[-1].timestamp + max(max_gap, window)
+
+    # Rectangle de recherche autour de nos pings
+    margin = settings.CROSSING_SEARCH_RADIUS_METERS
+    lat_min = min(p.latitude for p in pings) - margin / METERS_PER_DEGREE_LAT
+    lat_max = max(p.latitude for p in pings) + margin / METERS_PER_DEGREE_LAT
+    lon_margin = margin / (METERS_PER_DEGREE_LAT * max(math.cos(math.radians(max(abs(lat_min), abs(lat_max)))), 0.01))
+    lon_min = min(p.longitude for p in pings) - lon_margin
+    lon_max = max(p.longitude for p in pings) + lon_margin
+
+    if settings.PING_INDEX_ENABLED and trajectories_since >= datetime.utcnow() - ping_index.window:
+        ensure_ping_index_loaded(db)
+        cells = get_cells_in_box(lat_min, lat_max, lon_min, lon_max)
+        user_ids = {p.user_id for p in ping_index.query(cells, candidates_since)}
+        user_ids.add(user_id)
+        return ping_index.query_users(user_ids, trajectories_since)
+
+    # Requete par rectangle GPS + periode (index sur timestamp), puis trajectoires
+    user_ids = {
+        row[0] for row in db.query(LocationPing.user_id).filter(
+            LocationPing.latitude.between(lat_min, lat_max),
+            LocationPing.longitude.between(lon_min, lon_max),
+            LocationPing.timestamp >= candidates_since,
+            LocationPing.timestamp <= until
+        ).distinct().all()
+    }
+    user_ids.add(user_id)
+    rows = db.query(
+        LocationPing.user_id,
+        LocationPing.cell_id,
+        LocationPing.latitude,
+        LocationPing.longitude,
+        LocationPing.timestamp,
+    ).filter(
+        LocationPing.user_id.in_(user_ids),
+        LocationPing.timestamp >= trajectories_since,
+        LocationPing.timestamp <= until
+    ).order_by(LocationPing.timestamp).all()
+    trajectories = {}
+    for row in rows:
+        trajectories.setdefault(row[0], []).append(IndexedPing(*row))
+    return trajectories
+
+
+def detect_crossings(db: Session, user_id: int, pings: list) -> tuple:
+    """
+    Detecter et ajouter (sans commit) les croisements d'une trajectoire de pings
+    tries par timestamp: un autre utilisateur est croise si un de ses pings est
+    dans une zone adjacente a un de nos pings, a moins de la fenetre de temps,
+    ou (CROSSING_TRAJECTORY_ENABLED) si nos trajectoires interpolees passent
+    a moins de CROSSING_DISTANCE_METERS au meme instant.
+    Retourne (croisements crees, [(zone_id, lat, lon)] dont le nom est a resoudre).
+    """
+    window = timedelta(minutes=settings.CROSSING_TIME_WINDOW_MINUTES)
+    trajectories = None
+    if settings.CROSSING_TRAJECTORY_ENABLED:
+        # Les pings des trajectoires voisines couvrent aussi la detection par zones
+        trajectories = _find_nearby_trajectories(db, user_id, pings)
+        own_pings = trajectories.pop(user_id, [])
+        nearby = [p for trajectory in trajectories.values() for p in trajectory]
+    else:
+        nearby = _find_nearby_pings(db, user_id, pings)
+
+    nearby_by_cell = {}
+    for other in nearby:
+        nearby_by_cell.setdefault(other.cell_id, []).append(other)
+
+    # Premier de nos pings ou chaque autre utilisateur est croise
+    matches = {}
+    for ping in pings:
+        for cell_id in get_adjacent_cells(ping.cell_id):
+            for other in nearby_by_cell.get(cell_id, ()):
+                if other.user_id not in matches and abs(other.timestamp - ping.timestamp) <= window:
+                    matches[other.user_id] = ping
+
+    if trajectories:
+        # Notre trajectoire: pings deja connus + nouveaux (dedupliques)
+        own = {(p.timestamp, p.cell_id): p for p in own_pings}
+        own.update({(p.timestamp, p.cell_id): p for p in pings})
+        trajectory_matches = find_trajectory_matches(
+            sorted(own.values(), key=lambda p: p.timestamp),
+            trajectories,
+            pings[0].timestamp,
+            settings.CROSSING_DISTANCE_METERS,
+            timedelta(minutes=settings.CROSSING_MAX_SEGMENT_MINUTES),
+        )
+        for other_user_id, point in trajectory_matches.items():
+            matches.setdefault(other_user_id, point)
+
+    crossing_user_ids, latest_looks = _load_crossing_candidates(db, user_id, list(matches), pings[0].timestamp)
+    if not crossing_user_ids:
+        return [], []
+
+    # Zone "lat:lon" (affichage, cle du cache de geocoding) derivee du cell id
+    zone_ids = {uid: cell_id_to_zone_id(matches[uid].cell_id) for uid in crossing_user_ids}
+
+    # Nom du lieu depuis le cache uniquement (jamais d'appel reseau ici)
+    location_names = get_cached_location_names(db, set(zone_ids.values()))
+
+    # Creer les croisements en un seul INSERT multi-lignes, paire canonique
+    # (plus petit id en user1): les doublons de la meme heure sont ignores
+    rows = []
+    for other_user_id in crossing_user_ids:
+        user1_id, user2_id = min(user_id, other_user_id), max(user_id, other_user_id)
+        match = matches[other_user_id]
+        rows.append({
+            "user1_id": user1_id,
+            "user2_id": user2_id,
+            "zone_id": zone_ids[other_user_id],
+            "cell_id": match.cell_id,
+            "latitude": match.latitude,
+            "longitude": match.longitude,
+            "location_name": location_names.get(zone_ids[other_user_id]),
+            "user1_look_id": latest_looks.get(user1_id),
+            "user2_look_id": latest_looks.get(user2_id),
+            "crossed_at": match.timestamp,
+            "time_bucket": crossing_time_bucket(match.timestamp),
+        })
+    inserted = insert_crossings(db, rows)
+    crossing_user_ids = [
+        uid for uid in crossing_user_ids
+        if (min(user_id, uid), max(user_id, uid)) in inserted
+    ]
+    if not crossing_user_ids:
+        return [], []
+
+    # Fils des deux utilisateurs de chaque nouveau croisement
+    refresh_feed_pairs(db, [(user_id, uid) for uid in crossing_user_ids] + [(uid, user_id) for uid in crossing_user_ids])
+
+    new_crossings = [
+        {"user_id": other_user_id, "zone": zone_ids[other_user_id]}
+        for other_user_id in crossing_user_ids
+    ]
+    unresolved = {}
+    for other_user_id in crossing_user_ids:
+        ping = matches[other_user_id]
+        zone_id = zone_ids[other_user_id]
+        if zone_id not in location_names:
+            unresolved.setdefault(zone_id, (zone_id, ping.latitude, ping.longitude))
+    return new_crossings, list(unresolved.values())
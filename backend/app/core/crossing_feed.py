@@ -0,0 +1,160 @@
+"""
+Fil materialise des croisements (GET /crossings/).
+Une ligne par (proprietaire, look croise): chaque look < 24h d'un utilisateur
+croise dans les dernieres 24h, rattache au croisement le plus recent de la paire.
+Maintenu a l'ecriture (croisements, looks, blocages, abonnements, profil prive)
+pour que la lecture soit une requete paginee par cle, en O(limit).
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import or_, tuple_, insert
+from sqlalchemy.orm import Session
+
+from app.core.relationships import get_relationships, load_relationships
+from app.models import User, Look, Crossing, CrossingFeedEntry
+
+# Duree de visibilite des croisements et des looks croises
+FEED_TTL = timedelta(hours=24)
+
+
+def _visible_pairs(db: Session, pairs: set, fresh_relationships: bool = False) -> set:
+    """
+    Paires (proprietaire, autre) ou le proprietaire peut voir les looks de
+    l'autre: pas de blocage dans un sens ou l'autre, et profil public ou amis.
+    Les relations d'un seul cote de chaque paire suffisent: on prend
+    l'utilisateur le plus frequent (souvent un seul chargement).
+    """
+    users = dict(db.query(User.id, User.is_private).filter(
+        User.id.in_({other for _, other in pairs})
+    ).all())
+
+    counts = Counter(uid for pair in pairs for uid in pair)
+    loaded = {}
+    visible = set()
+    for owner, other in pairs:
+        if other not in users:
+            continue
+        hub, peer = (owner, other) if counts[owner] >= counts[other] else (other, owner)
+        if hub not in loaded:
+            loaded[hub] = load_relationships(db, hub) if fresh_relationships else get_relationships(db, hub)
+        relationships = loaded[hub]
+        if relationships.is_blocked(peer):
+            continue
+        if users[other] and not relationships.is_friend(peer):
+            continue
+        visible.add((owner, other))
+    return visible
+
+
+def refresh_feed_pairs(db: Session, pairs: Iterable[tuple], fresh_relationships: bool = False) -> None:
+    """
+    Recalculer (sans commit) les lignes du fil pour des paires (proprietaire,
+    autre utilisateur). Appele apres tout changement qui touche la paire.
+    fresh_relationships: relire follows/blocages en base (changement en cours,
+    pas encore commite) au lieu du cache.
+    """
+    pairs = {(owner, other) for owner, other in pairs if owner != other}
+    if not pairs:
+        return
+    since = datetime.utcnow() - FEED_TTL
+
+    # Session sans autoflush: rendre visibles les changements en cours (blocage, follow...)
+    db.flush()
+
+    db.query(CrossingFeedEntry).filter(
+        tuple_(CrossingFeedEntry.owner_id, CrossingFeedEntry.other_user_id).in_(pairs)
+    ).delete(synchronize_session=False)
+
+    # Croisement le plus recent de chaque paire (paires canoniques user1 < user2)
+    latest = {}
+    crossings = db.query(Crossing.id, Crossing.user1_id, Crossing.user2_id, Crossing.crossed_at).filter(
+        tuple_(Crossing.user1_id, Crossing.user2_id).in_({(min(p), max(p)) for p in pairs}),
+        Crossing.crossed_at >= since
+    ).order_by(Crossing.crossed_at.desc()).all()
+    for crossing_id, user1_id, user2_id, crossed_at in crossings:
+        latest.setdefault((user1_id, user2_id), (crossing_id, crossed_at))
+
+    pairs = _visible_pairs(db, {p for p in pairs if (min(p), max(p)) in latest}, fresh_relationships)
+    if not pairs:
+        return
+
+    looks_by_user = {}
+    looks = db.query(Look.id, Look.user_id, Look.created_at).filter(
+        Look.user_id.in_({other for _, other in pairs}),
+        Look.created_at >= since
+    ).all()
+    for look_id, user_id, created_at in looks:
+        looks_by_user.setdefault(user_id, []).append((look_id, created_at))
+
+    rows = []
+    for owner, other in pairs:
+        crossing_id, crossed_at = latest[(min(owner, other), max(owner, other))]
+        for look_id, created_at in looks_by_user.get(other, ()):
+            rows.append({
+                "owner_id": owner,
+                "other_user_id": other,
+                "crossing_id": crossing_id,
+                "look_id": look_id,
+                "crossed_at": crossed_at,
+                "look_created_at": created_at,
+            })
+    if rows:
+        db.execute(insert(CrossingFeedEntry), rows)
+
+
+def refresh_feeds_showing_user(db: Session, user_id: int) -> None:
+    """
+    Recalculer les fils ou apparait un utilisateur (nouveau look, profil prive):
+    ceux des utilisateurs qui l'ont croise dans les dernieres 24h.
+    """
+    since = datetime.utcnow() - FEED_TTL
+    crossings = db.query(Crossing.user1_id, Crossing.user2_id).filter(
+        or_(Crossing.user1_id == user_id, Crossing.user2_id == user_id),
+        Crossing.crossed_at >= since
+    ).distinct().all()
+    owners = {u2 if u1 == user_id else u1 for u1, u2 in crossings}
+    refresh_feed_pairs(db, [(owner, user_id) for owner in owners])
+
+
+def refresh_feed_relationship(db: Session, user1_id: int, user2_id: int) -> None:
+    """Recalculer les deux sens d'une paire (blocage, abonnement en cours)"""
+    refresh_feed_pairs(db, [(user1_id, user2_id), (user2_id, user1_id)], fresh_relationships=True)
+
+
+def rebuild_all_feeds(db: Session) -> None:
+    """Migration: construire les fils a partir des croisements des dernieres 24h"""
+    since = datetime.utcnow() - FEED_TTL
+    crossings = db.query(Crossing.user1_id, Crossing.user2_id).filter(
+        Crossing.crossed_at >= since
+    ).distinct().all()
+    pairs = set()
+    for user1_id, user2_id in crossings:
+        pairs.update({(user1_id, user2_id), (user2_id, user1_id)})
+    refresh_feed_pairs(db, pairs)
+
+
+def remove_look_from_feeds(db: Session, look_id: int) -> None:
+    db.query(CrossingFeedEntry).filter(
+        CrossingFeedEntry.look_id == look_id
+    ).delete(synchronize_session=False)
+
+
+def remove_user_from_feeds(db: Session, user_id: int) -> None:
+    """Suppression de compte: son fil et ses apparitions dans les autres fils"""
+    db.query(CrossingFeedEntry).filter(
+        or_(CrossingFeedEntry.owner_id == user_id, CrossingFeedEntry.other_user_id == user_id)
+    ).delete(synchronize_session=False)
+
+
+def purge_expired_feed_entries(conn, now: datetime) -> int:
+    """Supprimer les lignes dont le croisement ou le look a plus de 24h"""
+    cutoff = now - FEED_TTL
+    result = conn.execute(
+        CrossingFeedEntry.__table__.delete().where(
+            or_(CrossingFeedEntry.crossed_at < cutoff, CrossingFeedEntry.look_created_at < cutoff)
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,220 @@
+"""
+Worker de fond pour la detection des croisements.
+Les endpoints de ping inserent les pings (detection_pending) et les ajoutent a
+la file; le worker detecte les croisements par micro-batchs, hors du chemin de
+la requete, et marque les pings traites dans la meme transaction.
+File en memoire: au demarrage, catch_up() remet en file les pings restes en
+attente (process arrete avant leur traitement, detection en echec).
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.ping_index import IndexedPing
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedPing(NamedTuple):
+    ping_id: int
+    ping: IndexedPing
+
+
+class QueuedTrajectory(NamedTuple):
+    """Pings bufferises d'un utilisateur (POST /ping/batch), detectes ensemble"""
+    ping_ids: list
+    pings: list  # [IndexedPing] tries par timestamp
+
+
+class CrossingWorker:
+    """Pool de threads qui consomme la file de pings par micro-batchs"""
+
+    def __init__(self, threads: int, batch_size: int, max_wait_ms: int):
+        self.threads = threads
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._workers: list = []
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        # Geocoding (lent, limite a 1 req/s) sur son propre thread
+        self._geocoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geocoding")
+        # Compteurs mis a jour par tous les threads du pool
+        self._stats_lock = threading.Lock()
+        self.processed = 0
+        self.batches = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._workers)
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self.running:
+                return
+            self._stopping.clear()
+            self._workers = [
+                threading.Thread(target=self._run, name=f"crossing-worker-{i}", daemon=True)
+                for i in range(self.threads)
+            ]
+            for t in self._workers:
+                t.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Arreter les threads apres avoir vide la file"""
+        self._stopping.set()
+        for t in self._workers:
+            t.join(timeout)
+        self._workers = []
+
+    def enqueue(self, ping_id: int, ping: IndexedPing) -> None:
+        if not self.running:
+            self.start()
+        self._queue.put(QueuedPing(ping_id, ping))
+
+    def enqueue_trajectory(self, ping_ids: list, pings: list) -> None:
+        if not self.running:
+            self.start()
+        self._queue.put(QueuedTrajectory(ping_ids, pings))
+
+    def catch_up(self, now: Optional[datetime] = None) -> int:
+        """
+        Demarrage: remettre en file les pings restes en attente de detection,
+        par trajectoire de chaque utilisateur. Au-dela de la fenetre chaude, ils
+        ne sont plus detectes. Retourne le nombre de pings remis en file.
+        """
+        from app.core.database import SessionLocal
+        from app.models import LocationPing
+
+        now = now or datetime.utcnow()
+        hot_start = now - timedelta(hours=settings.PING_HOT_WINDOW_HOURS)
+        db = SessionLocal()
+        try:
+            db.execute(update(LocationPing).where(
+                LocationPing.detection_pending.is_(True),
+                LocationPing.timestamp < hot_start
+            ).values(detection_pending=False))
+            rows = db.execute(select(
+                LocationPing.id, LocationPing.user_id, LocationPing.cell_id,
+                LocationPing.latitude, LocationPing.longitude, LocationPing.timestamp
+            ).where(
+                LocationPing.detection_pending.is_(True),
+                LocationPing.timestamp >= hot_start
+            ).order_by(LocationPing.timestamp)).all()
+            db.commit()
+        finally:
+            db.close()
+
+        trajectories = {}
+        for row in rows:
+            ping_ids, pings = trajectories.setdefault(row.user_id, ([], []))
+            ping_ids.append(row.id)
+            pings.append(IndexedPing(row.user_id, row.cell_id, row.latitude, row.longitude, row.timestamp))
+        for ping_ids, pings in trajectories.values():
+            self.enqueue_trajectory(ping_ids, pings)
+        return len(rows)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "queued": self._queue.qsize(),
+                "processed": self.processed,
+                "batches": self.batches,
+                "errors": self.errors,
+            }
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _next_batch(self) -> list:
+        """Attendre un premier ping puis regrouper ce qui arrive pendant max_wait"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _process(self, batch: list) -> None:
+        from app.core.database import SessionLocal
+        from app.core.crossing_detection import detect_crossings
+        from app.core.geocoding import resolve_location_name
+        from app.models import LocationPing
+
+        # Pings isoles: coalescer par (utilisateur, cell), le dernier suffit a
+        # la detection. Trajectoires bufferisees: tous leurs pings, pour
+        # horodater chaque croisement avec le ping concerne.
+        # La detection reste une passe par utilisateur: les voisins sont lus dans
+        # l'index memoire (pas de requete), et les candidats (visibilite, looks)
+        # sont charges en requetes groupees quel que soit le nombre de voisins.
+        ping_ids = []
+        latest = {}
+        trajectories = {}
+        for item in batch:
+            if isinstance(item, QueuedTrajectory):
+                ping_ids.extend(item.ping_ids)
+                if item.pings:
+                    trajectories.setdefault(item.pings[0].user_id, []).extend(item.pings)
+            else:
+                ping_ids.append(item.ping_id)
+                latest[(item.ping.user_id, item.ping.cell_id)] = item.ping
+        for (user_id, _), ping in latest.items():
+            trajectories.setdefault(user_id, []).append(ping)
+
+        db = SessionLocal()
+        unresolved = {}
+        try:
+            for user_id, pings in trajectories.items():
+                pings.sort(key=lambda p: p.timestamp)
+                _, zones = detect_crossings(db, user_id, pings)
+                for zone_id, lat, lon in zones:
+                    unresolved.setdefault(zone_id, (zone_id, lat, lon))
+            db.execute(update(LocationPing).where(
+                LocationPing.id.in_(ping_ids)
+            ).values(detection_pending=False))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            with self._stats_lock:
+                self.errors += 1
+            # Pings deja en base, gardes en attente: repris par catch_up()
+            logger.warning(f"Detection des croisements echouee ({len(ping_ids)} pings en attente): {e}")
+            unresolved = {}
+        finally:
+            db.close()
+
+        for args in unresolved.values():
+            self._geocoder.submit(resolve_location_name, *args)
+
+        with self._stats_lock:
+            self.processed += len(ping_ids)
+            self.batches += 1
+
+
+crossing_worker = CrossingWorker(
+    threads=settings.CROSSING_WORKER_THREADS,
+    batch_size=settings.CROSSING_WORKER_BATCH_SIZE,
+    max_wait_ms=settings.CROSSING_WORKER_MAX_WAIT_MS,
+)
@@ -1,22 +1,152 @@
+import logging
+import time
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+logger = logging.getLogger(__name__)
+
+
+def get_async_database_url(url: str) -> URL:
+    """Meme base avec un driver asyncio: asyncpg (PostgreSQL) ou aiosqlite (dev)"""
+    url = make_url(url)
+    if url.drivername in ("postgres", "postgresql", "postgresql+psycopg2"):
+        # asyncpg n'accepte pas sslmode (libpq) mais ssl, avec les memes valeurs
+        query = dict(url.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return url.set(drivername="postgresql+asyncpg", query=query)
+    if url.drivername == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+
+def get_engine_options(url: URL, statement_timeout_ms: int = 0) -> dict:
+    """
+    Options de create_engine depuis Settings: taille du pool, pre-ping, recyclage
+    et, pour PostgreSQL, statement_timeout applique a chaque connexion.
+    """
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    connect_args = {}
+
+    if url.get_backend_name() == "sqlite":
+        if url.drivername == "sqlite":
+            connect_args["check_same_thread"] = False
+        # Base en memoire: pool a connexion unique, pas de dimensionnement
+        if url.database in (None, "", ":memory:"):
+            return {**options, "connect_args": connect_args}
+    elif statement_timeout_ms > 0:
+        if url.get_driver_name() == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+
+    return {
+        **options,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "connect_args": connect_args,
+    }
+
+
+# Moteur synchrone: workers (croisements, geocoding, retention), migrations, scripts.
+# Pas de statement_timeout: la compaction et les migrations peuvent etre longues.
+_sync_url = make_url(settings.DATABASE_URL)
+engine = create_engine(_sync_url, **get_engine_options(_sync_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Moteur asyncio: endpoints (ne bloque pas la boucle d'evenements pendant les requetes)
+_async_url = get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    _async_url, **get_engine_options(_async_url, settings.DB_STATEMENT_TIMEOUT_MS)
+)
+# expire_on_commit=False: pas de rechargement implicite (impossible hors await) apres commit
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# Replica en lecture (optionnel) pour les endpoints read-only
+replica_engine = None
+ReplicaSessionLocal = None
+if settings.DATABASE_REPLICA_URL:
+    _replica_url = get_async_database_url(settings.DATABASE_REPLICA_URL)
+    replica_engine = create_async_engine(
+        _replica_url, **get_engine_options(_replica_url, settings.DB_STATEMENT_TIMEOUT_MS)
+    )
+    ReplicaSessionLocal = async_sessionmaker(
+        replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
+# Replica injoignable: lectures sur la primaire jusqu'a down_until
+_replica_health = {"down_until": 0.0, "fallbacks": 0}
+
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def _open_replica_session() -> Optional[AsyncSession]:
+    """Session sur la replica, ou None si absente ou injoignable"""
+    if ReplicaSessionLocal is None or time.monotonic() < _replica_health["down_until"]:
+        return None
+    db = ReplicaSessionLocal()
     try:
-        yield db
-    except Exception:
-        db.rollback()
-        raise
-    finally:
-        db.close()
+        await db.connection()
+    except (SQLAlchemyError, OSError) as e:
+        await db.close()
+        _replica_health["down_until"] = time.monotonic() + settings.DB_REPLICA_RETRY_SECONDS
+        _replica_health["fallbacks"] += 1
+        logger.warning(f"Replica injoignable, lectures sur la primaire: {e}")
+        return None
+    return db
+
+
+async def get_read_db():
+    """
+    Session pour les endpoints en lecture seule: replica si configuree et
+    joignable, sinon base principale. Peut avoir un leger retard de replication.
+    """
+    db = await _open_replica_session() or AsyncSessionLocal()
+    async with db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+
+
+def _pool_status(pool) -> dict:
+    status = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    return status
+
+
+def get_pool_stats() -> dict:
+    """Etat des pools de connexions (primaire sync/async, replica)"""
+    stats = {
+        "sync": _pool_status(engine.pool),
+        "primary": _pool_status(async_engine.pool),
+    }
+    if replica_engine is not None:
+        stats["replica"] = {
+            **_pool_status(replica_engine.pool),
+            "fallbacks": _replica_health["fallbacks"],
+            "available": time.monotonic() >= _replica_health["down_until"],
+        }
+    return stats
@@ -0,0 +1,226 @@
+"""
+Reverse geocoding des croisements (nom du quartier) sans bloquer les requetes.
+- Cache persistant par zone (table geocode_cache) avec TTL
+- Lecture du cache uniquement pendant la requete
+- Resolution en tache de fond qui remplit Crossing.location_name apres le commit
+- Backend interchangeable (Nominatim en prod, stub local pour les tests)
+- Job periodique qui re-resout les croisements restes sans nom (backend en
+  echec), avec un delai par zone double a chaque nouvel echec
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Nom generique quand le lieu n'a pas d'adresse exploitable
+DEFAULT_LOCATION_NAME = "Zone de croisement"
+
+
+class GeocodingBackend:
+    """Interface d'un backend de reverse geocoding"""
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        """
+        Retourne le nom du lieu, DEFAULT_LOCATION_NAME si le lieu est inconnu,
+        ou None en cas d'erreur (le resultat ne sera pas mis en cache).
+        """
+        raise NotImplementedError
+
+
+class NominatimBackend(GeocodingBackend):
+    """Backend OpenStreetMap Nominatim (max 1 requete/seconde selon leurs conditions)"""
+
+    MIN_INTERVAL_SECONDS = 1.0
+
+    def __init__(self, user_agent: str = "lookup_app", timeout: int = 5):
+        from geopy.geocoders import Nominatim
+        self.geolocator = Nominatim(user_agent=user_agent)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._last_call = 0.0
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        with self._lock:
+            wait = self.MIN_INTERVAL_SECONDS - (time.monotonic() - self._last_call)
+            if wait > 0:
+                time.sleep(wait)
+            self._last_call = time.monotonic()
+        try:
+            location = self.geolocator.reverse(f"{latitude}, {longitude}", language="fr", timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Reverse geocoding echoue ({latitude}, {longitude}): {e}")
+            return None
+        if location and location.raw.get("address"):
+            addr = location.raw["address"]
+            # Pour la vie privee: quartier > arrondissement > ville (jamais la rue exacte)
+            if addr.get("neighbourhood"):
+                return addr["neighbourhood"]
+            elif addr.get("suburb"):
+                return addr["suburb"]
+            elif addr.get("city_district"):  # Arrondissement a Paris
+                return addr["city_district"]
+            elif addr.get("city") or addr.get("town"):
+                return addr.get("city") or addr.get("town")
+        return DEFAULT_LOCATION_NAME
+
+
+class StaticGeocodingBackend(GeocodingBackend):
+    """Backend local qui retourne toujours le meme nom (tests, dev hors ligne)"""
+
+    def __init__(self, name: str = DEFAULT_LOCATION_NAME):
+        self.name = name
+        self.calls = 0
+
+    def reverse(self, latitude: float, longitude: float) -> Optional[str]:
+        self.calls += 1
+        return self.name
+
+
+_backend: Optional[GeocodingBackend] = None
+_in_flight: set = set()
+_in_flight_lock = threading.Lock()
+# Zones en echec: {zone_id: (echecs consecutifs, prochaine tentative)}
+_retry_backoff: dict = {}
+
+
+def get_geocoding_backend() -> GeocodingBackend:
+    """Get or create le backend configure (GEOCODING_BACKEND)"""
+    global _backend
+    if _backend is None:
+        if settings.GEOCODING_BACKEND == "static":
+            _backend = StaticGeocodingBackend()
+        else:
+            _backend = NominatimBackend()
+    return _backend
+
+
+def set_geocoding_backend(backend: Optional[GeocodingBackend]) -> None:
+    """Remplacer le backend (None = revenir au backend configure)"""
+    global _backend
+    _backend = backend
+
+
+def get_cached_location_names(db, zone_ids) -> dict:
+    """
+    Noms des lieux depuis le cache, sans jamais appeler le backend.
+    Retourne {zone_id: nom} pour les zones presentes et non expirees.
+    """
+    from app.models import GeocodeCache
+
+    zone_ids = list(zone_ids)
+    if not zone_ids:
+        return {}
+    expires_before = datetime.utcnow() - timedelta(days=settings.GEOCODING_CACHE_TTL_DAYS)
+    entries = db.query(GeocodeCache.zone_id, GeocodeCache.location_name).filter(
+        GeocodeCache.zone_id.in_(zone_ids),
+        GeocodeCache.resolved_at >= expires_before
+    ).all()
+    return {zone_id: name for zone_id, name in entries}
+
+
+def resolve_location_name(zone_id: str, latitude: float, longitude: float) -> Optional[str]:
+    """
+    Tache de fond: resoudre le nom du lieu d'une zone, le mettre en cache et
+    remplir location_name des croisements de cette zone qui n'en ont pas encore.
+    Sync: executee dans le threadpool par BackgroundTasks, avec sa propre session.
+    Retourne le nom, ou None si la zone n'a pas pu etre resolue.
+    """
+    from app.core.database import SessionLocal
+    from app.models import GeocodeCache, Crossing
+    from app.core.zones import zone_id_to_cell_id
+
+    # Une seule resolution a la fois par zone
+    with _in_flight_lock:
+        if zone_id in _in_flight:
+            return None
+        _in_flight.add(zone_id)
+
+    db = SessionLocal()
+    try:
+        name = get_cached_location_names(db, [zone_id]).get(zone_id)
+        if name is None:
+            name = get_geocoding_backend().reverse(latitude, longitude)
+            if name is None:
+                return None
+            entry = db.query(GeocodeCache).filter(GeocodeCache.zone_id == zone_id).first()
+            if entry:
+                entry.location_name = name
+                entry.resolved_at = datetime.utcnow()
+            else:
+                db.add(GeocodeCache(zone_id=zone_id, location_name=name))
+
+        db.query(Crossing).filter(
+            Crossing.cell_id == zone_id_to_cell_id(zone_id),
+            Crossing.location_name == None
+        ).update({Crossing.location_name: name}, synchronize_session=False)
+        db.commit()
+        return name
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Resolution du lieu echouee pour la zone {zone_id}: {e}")
+        return None
+    finally:
+        db.close()
+        with _in_flight_lock:
+            _in_flight.discard(zone_id)
+
+
+def retry_unnamed_crossings(now: Optional[datetime] = None) -> dict:
+    """
+    Une passe du job: re-resoudre les zones des croisements sans nom plus
+    vieux que GEOCODING_RETRY_MINUTES (la tache lancee a leur creation a
+    echoue). Une zone en echec attend 2x plus longtemps a chaque echec.
+    """
+    from sqlalchemy import func
+    from app.core.database import SessionLocal
+    from app.models import Crossing
+
+    now = now or datetime.utcnow()
+    retry_delay = timedelta(minutes=settings.GEOCODING_RETRY_MINUTES)
+
+    db = SessionLocal()
+    try:
+        zones = db.query(
+            Crossing.zone_id, func.min(Crossing.latitude), func.min(Crossing.longitude)
+        ).filter(
+            Crossing.location_name == None,
+            Crossing.crossed_at < now - retry_delay,
+            Crossing.latitude != None,
+            Crossing.longitude != None
+        ).group_by(Crossing.zone_id).order_by(func.max(Crossing.crossed_at).desc()).all()
+    finally:
+        db.close()
+
+    resolved = failed = 0
+    for zone_id, latitude, longitude in zones:
+        if resolved + failed >= settings.GEOCODING_RETRY_MAX_ZONES:
+            break
+        failures, retry_at = _retry_backoff.get(zone_id, (0, now))
+        if retry_at > now:
+            continue
+        if resolve_location_name(zone_id, latitude, longitude) is None:
+            failed += 1
+            _retry_backoff[zone_id] = (failures + 1, now + retry_delay * 2 ** min(failures, 6))
+        else:
+            resolved += 1
+            _retry_backoff.pop(zone_id, None)
+    return {"resolved": resolved, "failed": failed}
+
+
+async def geocoding_retry_loop() -> None:
+    """Tache de fond: re-resoudre les croisements sans nom toutes les GEOCODING_RETRY_MINUTES"""
+    while True:
+        await asyncio.sleep(settings.GEOCODING_RETRY_MINUTES * 60)
+        try:
+            stats = await asyncio.to_thread(retry_unnamed_crossings)
+            if stats["resolved"] or stats["failed"]:
+                logger.info(f"Re-resolution des lieux: {stats}")
+        except Exception as e:
+            logger.warning(f"Re-resolution des lieux echouee: {e}")
@@ -0,0 +1,104 @@
+"""
+Chargement des looks des listes (discover, fil des abonnements, croisements).
+La page est d'abord determinee sur les seuls ids de looks, puis looks,
+auteurs, photos et items sont lus par requetes IN separees, en colonnes
+simples (pas d'objets ORM ni d'identity map): pas de produit cartesien
+photos x items comme avec plusieurs joinedload, et LIMIT porte bien sur les looks.
+Les resultats sont des read models (app.core.read_models).
+"""
+
+from collections import defaultdict
+from typing import NamedTuple, Sequence
+
+from sqlalchemy import Row, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.read_models import UserSummary, PhotoRecord, ItemRecord, LookCard
+from app.models import User, Look, LookPhoto, LookItem
+
+
+class LookParts(NamedTuple):
+    """Colonnes d'un look avec ses photos et items"""
+    look: Row
+    photo_urls: list
+    photos: list  # [PhotoRecord]
+    items: list  # [ItemRecord]
+
+
+async def load_look_parts(db: AsyncSession, look_ids: Sequence[int]) -> dict:
+    """{look_id: LookParts} en 3 requetes. Les looks supprimes sont absents."""
+    look_ids = list(set(look_ids))
+    if not look_ids:
+        return {}
+
+    looks = (await db.execute(select(
+        Look.id, Look.user_id, Look.title, Look.photo_url, Look.look_date,
+        Look.created_at, Look.likes_count, Look.views_count
+    ).where(Look.id.in_(look_ids)))).all()
+    if not looks:
+        return {}
+
+    photos = defaultdict(list)
+    for row in (await db.execute(select(
+        LookPhoto.look_id, LookPhoto.photo_url, LookPhoto.width, LookPhoto.height,
+        LookPhoto.blurhash, LookPhoto.dominant_color
+    ).where(LookPhoto.look_id.in_(look_ids)).order_by(LookPhoto.look_id, LookPhoto.position))).all():
+        photos[row.look_id].append(PhotoRecord(*row[1:]))
+
+    items = defaultdict(list)
+    for row in (await db.execute(select(
+        LookItem.look_id, LookItem.category, LookItem.brand, LookItem.product_name,
+        LookItem.color, LookItem.photo_url
+    ).where(LookItem.look_id.in_(look_ids)).order_by(LookItem.id))).all():
+        items[row.look_id].append(ItemRecord(*row[1:]))
+
+    parts = {}
+    for look in looks:
+        # Anciens looks sans LookPhoto: seulement photo_url
+        look_photos = photos.get(look.id) or ([PhotoRecord(look.photo_url)] if look.photo_url else [])
+        parts[look.id] = LookParts(
+            look, [photo.photo_url for photo in look_photos], look_photos, items.get(look.id, [])
+        )
+    return parts
+
+
+async def load_users(db: AsyncSession, user_ids) -> dict:
+    """{user_id: UserSummary} en une requete"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    rows = (await db.execute(select(
+        User.id, User.username, User.avatar_url
+    ).where(User.id.in_(user_ids)))).all()
+    return {row.id: UserSummary(*row) for row in rows}
+
+
+async def load_look_cards(db: AsyncSession, look_ids: Sequence[int]) -> list:
+    """
+    Cartes des looks dans l'ordre de look_ids (4 requetes quelle que soit la
+    taille de la page). Les looks supprimes ou sans auteur sont ignores.
+    """
+    parts = await load_look_parts(db, look_ids)
+    users = await load_users(db, {p.look.user_id for p in parts.values()})
+
+    cards = []
+    for look_id in dict.fromkeys(look_ids):
+        look_parts = parts.get(look_id)
+        user = users.get(look_parts.look.user_id) if look_parts else None
+        if user is None:
+            continue
+        look = look_parts.look
+        cards.append(LookCard(
+            id=look.id,
+            title=look.title,
+            photo_url=look.photo_url,
+            photo_urls=look_parts.photo_urls,
+            photos=look_parts.photos,
+            look_date=look.look_date,
+            created_at=look.created_at,
+            likes_count=look.likes_count,
+            views_count=look.views_count,
+            user=user,
+            items=look_parts.items,
+        ))
+    return cards
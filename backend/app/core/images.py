@@ -0,0 +1,189 @@
+"""
+Traitement des photos uploadees: orientation EXIF appliquee puis metadonnees
+supprimees (position GPS, appareil), dimensions plafonnees et re-encodage,
+en plusieurs variantes de taille servies par /photos/{filename}?size=...
+Calcule aussi les donnees de placeholder (BlurHash, couleur dominante,
+dimensions) affichees par les clients avant le chargement de la photo.
+Fonctions pures (bytes -> bytes) executees dans un pool de processus.
+"""
+
+import asyncio
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageOps
+
+# Plus grand cote de chaque variante, en pixels
+VARIANT_MAX_SIDES = {
+    "thumb": 320,  # Vignettes des listes
+    "medium": 1080,  # Plein ecran mobile
+    "full": 2048,  # Original plafonne
+}
+DEFAULT_VARIANT = "full"
+
+# Format de sortie -> (format Pillow, extension, options d'encodage)
+OUTPUT_FORMATS = {
+    "webp": ("WEBP", "webp", {"method": 4}),
+    "jpeg": ("JPEG", "jpg", {"optimize": True, "progressive": True}),
+}
+
+# BlurHash: 4x3 composantes, calculees sur une miniature (le resultat est flou de toute facon)
+BLURHASH_COMPONENTS = (4, 3)
+BLURHASH_SAMPLE_SIDE = 32
+BASE83_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class ProcessedImage(NamedTuple):
+    """Resultat du traitement: variantes encodees et placeholder de la variante full"""
+    variants: dict  # {variante: bytes}
+    width: int
+    height: int
+    blurhash: str
+    dominant_color: str  # "#rrggbb"
+
+
+def variant_filename(filename: str, variant: str) -> str:
+    """"abc.webp" -> "abc-thumb.webp" (la variante full garde le nom stocke en base)"""
+    if variant == DEFAULT_VARIANT:
+        return filename
+    stem, dot, ext = filename.rpartition(".")
+    if not dot:
+        return f"{filename}-{variant}"
+    return f"{stem}-{variant}.{ext}"
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BASE83_CHARS[value // 83 ** (length - i - 1) % 83] for i in range(length))
+
+
+def _linear_to_srgb(value: float) -> int:
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+# sRGB 8 bits -> lineaire, precalcule
+_SRGB_TO_LINEAR = [
+    v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+    for v in (i / 255 for i in range(256))
+]
+
+
+def blurhash_encode(image: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    """Encodage BlurHash (https://blurha.sh) d'une image RGB, de preference petite"""
+    width, height = image.size
+    pixels = [(_SRGB_TO_LINEAR[r], _SRGB_TO_LINEAR[g], _SRGB_TO_LINEAR[b]) for r, g, b in image.getdata()]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                basis_y = normalisation * cos_y[j][y]
+                for x in range(width):
+                    basis = basis_y * cos_x[i][x]
+                    pr, pg, pb = pixels[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = 1 / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = max(0, min(82, int(max(abs(c) for f in ac for c in f) * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1
+    result += _base83(quantised_max, 1)
+    result += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+
+    def quantise(value: float) -> int:
+        return max(0, min(18, int(math.copysign(abs(value / max_value) ** 0.5, value) * 9 + 9.5)))
+
+    for r, g, b in ac:
+        result += _base83(quantise(r) * 19 * 19 + quantise(g) * 19 + quantise(b), 2)
+    return result
+
+
+def dominant_color(image: Image.Image) -> str:
+    """Couleur la plus representee apres reduction a 5 couleurs, en "#rrggbb" """
+    quantized = image.quantize(colors=5)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def process_image(content: bytes, output_format: str, quality: int) -> Optional[ProcessedImage]:
+    """
+    Decoder une image, produire ses variantes sans EXIF et son placeholder.
+    Retourne None si Pillow ne sait pas la decoder (l'original est alors garde).
+    """
+    pil_format, _, options = OUTPUT_FORMATS[output_format]
+    try:
+        with Image.open(BytesIO(content)) as image:
+            # Appliquer la rotation EXIF avant de supprimer les metadonnees
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+            if pil_format == "JPEG" or not has_alpha:
+                image = image.convert("RGB")
+            else:
+                image = image.convert("RGBA")
+
+            variants = {}
+            for variant, max_side in VARIANT_MAX_SIDES.items():
+                resized = image.copy()
+                resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+                buffer = BytesIO()
+                # Pas d'exif= ni d'icc_profile=: metadonnees supprimees
+                resized.save(buffer, pil_format, quality=quality, **options)
+                variants[variant] = buffer.getvalue()
+                if variant == DEFAULT_VARIANT:
+                    width, height = resized.size
+
+            sample = image.convert("RGB")
+            sample.thumbnail((BLURHASH_SAMPLE_SIDE, BLURHASH_SAMPLE_SIDE), Image.Resampling.BILINEAR)
+            return ProcessedImage(
+                variants=variants,
+                width=width,
+                height=height,
+                blurhash=blurhash_encode(sample, *BLURHASH_COMPONENTS),
+                dominant_color=dominant_color(sample),
+            )
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: pas de fork d'un processus qui a deja des threads (workers, pools DB)
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def process_image_async(
+    content: bytes, output_format: str, quality: int, workers: int
+) -> Optional[ProcessedImage]:
+    """process_image dans le pool de processus, sans bloquer la boucle d'evenements"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(workers), process_image, content, output_format, quality)
+
+
+def shutdown_image_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
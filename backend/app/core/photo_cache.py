@@ -0,0 +1,230 @@
+"""
+Cache des photos servies par /photos/{filename} (proxy Supabase Storage).
+Deux niveaux, bornes en octets et evinces en LRU:
+- memoire: petites variantes chaudes (thumb, medium) des looks populaires
+- disque: tout objet telecharge, survit aux redemarrages
+Les photos sont immuables (noms UUID): pas d'expiration, seulement
+l'invalidation a la suppression. Les telechargements simultanes d'un meme
+objet absent du cache sont regroupes en un seul appel au storage.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PhotoCache:
+    """Cache LRU memoire + disque des objets du storage, avec regroupement des misses"""
+
+    def __init__(self, memory_bytes: int, memory_max_item_bytes: int, disk_dir: str, disk_bytes: int):
+        self.memory_bytes = memory_bytes
+        self.memory_max_item_bytes = memory_max_item_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self._memory: OrderedDict = OrderedDict()  # nom -> bytes
+        self._memory_size = 0
+        self._disk: OrderedDict = OrderedDict()  # nom -> taille du fichier
+        self._disk_size = 0
+        self._disk_loaded = False
+        self._lock = threading.Lock()
+        self._inflight: dict = {}  # nom -> Task du telechargement en cours
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+    # --- Memoire ---
+
+    def _get_memory(self, name: str):
+        with self._lock:
+            data = self._memory.get(name)
+            if data is not None:
+                self._memory.move_to_end(name)
+            return data
+
+    def _put_memory(self, name: str, data: bytes) -> None:
+        if len(data) > self.memory_max_item_bytes or len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(name, None)
+            if previous is not None:
+                self._memory_size -= len(previous)
+            self._memory[name] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+                self.evictions += 1
+
+    # --- Disque (appele hors de la boucle d'evenements) ---
+
+    def _load_disk_index(self) -> None:
+        """Au premier acces: reprendre les fichiers deja en cache, les plus anciens en tete"""
+        if self._disk_loaded:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            for _, name, size in sorted(entries):
+                self._disk[name] = size
+                self._disk_size += size
+            self._disk_loaded = True
+        self._evict_disk()
+
+    def _find_disk(self, name: str) -> Optional[str]:
+        """Chemin du fichier en cache disque, ou None"""
+        if self.disk_bytes <= 0:
+            return None
+        self._load_disk_index()
+        with self._lock:
+            size = self._disk.get(name)
+            if size is None:
+                return None
+            self._disk.move_to_end(name)
+            self.disk_hits += 1
+            self.bytes_saved += size
+        return os.path.join(self.disk_dir, name)
+
+    def _write_disk(self, name: str, data: bytes) -> Optional[str]:
+        """Ecrire l'objet en cache disque: son chemin, ou None s'il n'y est pas"""
+        if len(data) > self.disk_bytes:
+            return None
+        self._load_disk_index()
+        path = os.path.join(self.disk_dir, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Cache disque des photos: ecriture impossible ({e})")
+            return None
+        with self._lock:
+            self._disk_size -= self._disk.pop(name, 0)
+            self._disk[name] = len(data)
+            self._disk_size += len(data)
+        # Objet le plus recent, plus petit que le budget: jamais evince ici
+        self._evict_disk()
+        return path
+
+    def _evict_disk(self) -> None:
+        while True:
+            with self._lock:
+                if self._disk_size <= self.disk_bytes or not self._disk:
+                    return
+                name, size = self._disk.popitem(last=False)
+                self._disk_size -= size
+                self.evictions += 1
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except OSError:
+                pass
+
+    def _forget_disk(self, name: str) -> None:
+        with self._lock:
+            self._disk_size -= self._disk.pop(name, 0)
+
+    def _invalidate_sync(self, names) -> None:
+        for name in names:
+            with self._lock:
+                data = self._memory.pop(name, None)
+                if data is not None:
+                    self._memory_size -= len(data)
+                on_disk = name in self._disk
+            if on_disk:
+                self._forget_disk(name)
+                try:
+                    os.remove(os.path.join(self.disk_dir, name))
+                except OSError:
+                    pass
+
+    # --- API ---
+
+    async def locate(self, name: str, fetch: Callable[[], Awaitable[bytes]]) -> tuple[Optional[str], Optional[bytes]]:
+        """
+        Objet name: (chemin en cache disque, None) pour un envoi sans copie, ou
+        (None, contenu) s'il est en memoire. Un objet absent est telecharge par
+        fetch() (un seul appel pour toutes les requetes simultanees sur le meme
+        objet) puis servi depuis le disque; (None, contenu) seulement si le
+        cache disque est desactive ou l'ecriture impossible.
+        """
+        data = self._get_memory(name)
+        if data is not None:
+            with self._lock:
+                self.memory_hits += 1
+                self.bytes_saved += len(data)
+            return None, data
+
+        path = await asyncio.to_thread(self._find_disk, name)
+        if path is not None:
+            return path, None
+
+        task = self._inflight.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._load(name, fetch))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(name, None))
+            path, data, _ = await asyncio.shield(task)
+            return path, data
+
+        # Telechargement deja en cours pour une autre requete: l'attendre
+        path, data, size = await asyncio.shield(task)
+        with self._lock:
+            self.coalesced += 1
+            self.bytes_saved += size
+        return path, data
+
+    async def _load(self, name: str, fetch: Callable[[], Awaitable[bytes]]) -> tuple[Optional[str], Optional[bytes], int]:
+        data = await fetch()
+        with self._lock:
+            self.misses += 1
+        self._put_memory(name, data)
+        if self.disk_bytes > 0:
+            path = await asyncio.to_thread(self._write_disk, name, data)
+            if path is not None:
+                # Contenu libere des la fin du telechargement: FileResponse lit le fichier par morceaux
+                return path, None, len(data)
+        return None, data, len(data)
+
+    async def invalidate(self, names) -> None:
+        """Photo supprimee: retirer ses objets des deux niveaux"""
+        await asyncio.to_thread(self._invalidate_sync, list(names))
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits + self.coalesced
+            requests = hits + self.misses
+            return {
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_items": len(self._disk),
+                "disk_bytes": self._disk_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "hit_ratio": round(hits / requests, 3) if requests else None,
+                "bytes_saved": self.bytes_saved,
+                "evictions": self.evictions,
+            }
+
+
+photo_cache = PhotoCache(
+    memory_bytes=settings.PHOTO_CACHE_MEMORY_BYTES,
+    memory_max_item_bytes=settings.PHOTO_CACHE_MEMORY_MAX_ITEM_BYTES,
+    disk_dir=settings.PHOTO_CACHE_DIR,
+    disk_bytes=settings.PHOTO_CACHE_DISK_BYTES,
+)
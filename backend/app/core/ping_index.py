@@ -0,0 +1,208 @@
+"""
+Index spatial en memoire des pings recents pour la detection des croisements.
+Garde uniquement les pings de la fenetre de detection, ranges par cell (zone
+50m x 50m en id entier) et par utilisateur (trajectoires), pour eviter de
+scanner la table location_pings a chaque ping.
+"""
+
+import asyncio
+import bisect
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Iterable, NamedTuple, Optional
+
+from app.core.config import settings
+
+
+class IndexedPing(NamedTuple):
+    """Ping garde en memoire (pas d'objet ORM, juste les champs utiles)"""
+    user_id: int
+    cell_id: int
+    latitude: float
+    longitude: float
+    timestamp: datetime
+
+
+class PingIndex:
+    """
+    Index cell_id -> pings recents (et user_id -> pings), avec eviction basee
+    sur le temps. Une recherche de voisins coute O(pings dans les zones demandees).
+    Thread-safe: les handlers sync tournent dans le threadpool de FastAPI.
+    """
+
+    def __init__(self, window_minutes: int):
+        self.window = timedelta(minutes=window_minutes)
+        self._zones: dict = {}
+        self._users: dict = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._last_sweep = datetime.utcnow()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def add(self, ping: IndexedPing) -> None:
+        """Ajouter un ping dans sa zone (les pings bufferises peuvent arriver dans le desordre)"""
+        cutoff = datetime.utcnow() - self.window
+        if ping.timestamp < cutoff:
+            return
+        with self._lock:
+            bucket = self._zones.get(ping.cell_id)
+            if bucket is None:
+                bucket = self._zones[ping.cell_id] = deque()
+            self._insert_sorted(bucket, ping)
+            self._evict_bucket(self._zones, ping.cell_id, bucket, cutoff)
+            trajectory = self._users.get(ping.user_id)
+            if trajectory is None:
+                trajectory = self._users[ping.user_id] = deque()
+            self._insert_sorted(trajectory, ping)
+            self._evict_bucket(self._users, ping.user_id, trajectory, cutoff)
+        self._maybe_sweep()
+
+    def query(self, cell_ids: Iterable[int], since: datetime, exclude_user_id: Optional[int] = None) -> list:
+        """Pings des zones demandees avec timestamp >= since (du plus ancien au plus recent)"""
+        result = []
+        with self._lock:
+            for cell_id in cell_ids:
+                bucket = self._zones.get(cell_id)
+                if not bucket:
+                    continue
+                for ping in bucket:
+                    if ping.timestamp >= since and ping.user_id != exclude_user_id:
+                        result.append(ping)
+        return result
+
+    def query_users(self, user_ids: Iterable[int], since: datetime) -> dict:
+        """Trajectoires des utilisateurs demandes: {user_id: pings tries par timestamp}"""
+        result = {}
+        with self._lock:
+            for user_id in user_ids:
+                pings = [p for p in self._users.get(user_id, ()) if p.timestamp >= since]
+                if pings:
+                    result[user_id] = sorted(pings, key=lambda p: p.timestamp)
+        return result
+
+    def remove_user(self, user_id: int) -> None:
+        """Retirer tous les pings d'un utilisateur (suppression de compte, passage invisible)"""
+        with self._lock:
+            self._users.pop(user_id, None)
+            for zone_id in list(self._zones):
+                bucket = deque(p for p in self._zones[zone_id] if p.user_id != user_id)
+                if bucket:
+                    self._zones[zone_id] = bucket
+                else:
+                    del self._zones[zone_id]
+
+    def evict(self, now: Optional[datetime] = None) -> None:
+        """Supprimer les pings sortis de la fenetre dans toutes les zones"""
+        cutoff = (now or datetime.utcnow()) - self.window
+        with self._lock:
+            for index in (self._zones, self._users):
+                for key in list(index):
+                    self._evict_bucket(index, key, index[key], cutoff)
+            self._last_sweep = datetime.utcnow()
+
+    def load(self, pings: Iterable[IndexedPing]) -> None:
+        """Remplir l'index au demarrage (pings deja tries par timestamp)"""
+        with self._lock:
+            self._zones.clear()
+            self._users.clear()
+            for ping in pings:
+                self._zones.setdefault(ping.cell_id, deque()).append(ping)
+                self._users.setdefault(ping.user_id, deque()).append(ping)
+            self._loaded = True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._zones.clear()
+            self._users.clear()
+            self._loaded = False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(bucket) for bucket in self._zones.values())
+
+    @staticmethod
+    def _insert_sorted(bucket: deque, ping: IndexedPing) -> None:
+        # Cas courant: ping le plus recent, ajoute a droite
+        if not bucket or bucket[-1].timestamp <= ping.timestamp:
+            bucket.append(ping)
+        else:
+            bisect.insort_right(bucket, ping, key=lambda p: p.timestamp)
+
+    def _evict_bucket(self, index: dict, key: int, bucket: deque, cutoff: datetime) -> None:
+        # Buckets tries par timestamp: les plus anciens sont a gauche
+        while bucket and bucket[0].timestamp < cutoff:
+            bucket.popleft()
+        if not bucket:
+            index.pop(key, None)
+
+    def _maybe_sweep(self) -> None:
+        # Balayage global une fois par fenetre pour liberer les zones abandonnees
+        if datetime.utcnow() - self._last_sweep >= self.window:
+            self.evict()
+
+
+def _index_window_minutes() -> int:
+    """Fenetre gardee en memoire: 2 segments de trajectoire en plus si active"""
+    window = settings.CROSSING_TIME_WINDOW_MINUTES
+    if settings.CROSSING_TRAJECTORY_ENABLED:
+        window += 2 * settings.CROSSING_MAX_SEGMENT_MINUTES
+    return window
+
+
+ping_index = PingIndex(_index_window_minutes())
+_load_lock = threading.Lock()
+
+
+def ensure_ping_index_loaded(db) -> None:
+    """
+    Charger les pings de la fenetre courante depuis la base au premier appel,
+    pour ne pas perdre les croisements apres un redemarrage du serveur.
+    """
+    if ping_index.loaded:
+        return
+    from app.models import LocationPing
+    from app.core.zones import zone_id_to_cell_id
+
+    with _load_lock:
+        if ping_index.loaded:
+            return
+        since = datetime.utcnow() - ping_index.window
+        rows = db.query(
+            LocationPing.user_id,
+            LocationPing.cell_id,
+            LocationPing.zone_id,
+            LocationPing.latitude,
+            LocationPing.longitude,
+            LocationPing.timestamp,
+        ).filter(
+            LocationPing.timestamp >= since
+        ).order_by(LocationPing.timestamp).all()
+        # cell_id peut etre NULL pour des lignes pas encore migrees
+        ping_index.load(
+            IndexedPing(user_id, cell_id if cell_id is not None else zone_id_to_cell_id(zone_id), lat, lon, ts)
+            for user_id, cell_id, zone_id, lat, lon, ts in rows
+        )
+
+
+async def ensure_ping_index_loaded_async() -> None:
+    """
+    Variante pour les endpoints async: le chargement (une fois) se fait dans un
+    thread avec une session synchrone, pour ne jamais attendre _load_lock
+    depuis la boucle d'evenements.
+    """
+    if ping_index.loaded:
+        return
+
+    def load():
+        from app.core.database import SessionLocal
+        db = SessionLocal()
+        try:
+            ensure_ping_index_loaded(db)
+        finally:
+            db.close()
+
+    await asyncio.to_thread(load)
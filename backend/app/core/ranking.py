@@ -0,0 +1,184 @@
+"""
+Classement precalcule des looks pour /looks/discover (sans recherche).
+Pour chaque periode (today, week, month, all), la liste ordonnee des ids de
+looks est reconstruite periodiquement en memoire. Discover pagine dans cette
+liste par curseur puis charge seulement les looks de la page, au lieu de
+trier la table et de sauter OFFSET lignes a chaque requete.
+Score: likes (likes_count puis date, comme avant) ou "hot" (likes amortis
+par l'age du look).
+Les deux derniers instantanes de chaque periode sont gardes: un client qui
+pagine pendant une reconstruction continue sur le meme ordre.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Look
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("today", "week", "month", "all")
+
+# Instantanes gardes par periode (courant + precedent)
+SNAPSHOTS_PER_PERIOD = 2
+
+
+class RankingSnapshot(NamedTuple):
+    """Liste classee des looks d'une periode a un instant donne"""
+    version: int
+    built_at: float  # time.monotonic()
+    look_ids: tuple
+
+
+def period_start(period: str, now: datetime) -> Optional[datetime]:
+    """Debut de la periode de discover (None pour all)"""
+    if period == "today":
+        return now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "week":
+        return now - timedelta(days=7)
+    if period == "month":
+        return now - timedelta(days=30)
+    return None
+
+
+def hot_score(likes: int, created_at: datetime, now: datetime) -> float:
+    """Likes amortis par l'age: (likes + 1) / (heures + 2) ^ gravite"""
+    age_hours = max((now - created_at).total_seconds() / 3600, 0) if created_at else 0
+    return (likes + 1) / (age_hours + 2) ** settings.DISCOVER_HOT_GRAVITY
+
+
+def compute_rankings(db: Session, now: Optional[datetime] = None) -> dict:
+    """
+    Classements {periode: [look_id]} (au plus DISCOVER_RANKING_MAX_LOOKS).
+    Une requete pour le dernier mois (couvre today/week/month) et une pour les
+    looks les plus likes de tous les temps.
+    """
+    now = now or datetime.utcnow()
+    max_looks = settings.DISCOVER_RANKING_MAX_LOOKS
+    columns = (Look.id, Look.likes_count, Look.created_at)
+
+    recent = db.execute(
+        select(*columns).where(Look.created_at >= period_start("month", now))
+    ).all()
+    top = db.execute(
+        select(*columns).order_by(Look.likes_count.desc(), Look.created_at.desc()).limit(max_looks)
+    ).all()
+
+    if settings.DISCOVER_RANKING_SCORE == "hot":
+        def sort_key(row):
+            return (hot_score(row.likes_count or 0, row.created_at, now), row.id)
+    else:
+        def sort_key(row):
+            return (row.likes_count or 0, row.created_at or datetime.min, row.id)
+
+    rankings = {}
+    for period in PERIODS:
+        start = period_start(period, now)
+        if start is None:
+            rows = {row.id: row for row in (*top, *recent)}.values()
+        else:
+            rows = [row for row in recent if row.created_at and row.created_at >= start]
+        rankings[period] = [row.id for row in sorted(rows, key=sort_key, reverse=True)[:max_looks]]
+    return rankings
+
+
+class PopularityRanking:
+    """Instantanes des classements par periode, thread-safe"""
+
+    def __init__(self):
+        self._snapshots = {period: OrderedDict() for period in PERIODS}  # version -> snapshot
+        self._lock = threading.Lock()
+        self._version = 0
+        self.builds = 0
+        self.last_build_ms = 0.0
+
+    def current(self, period: str) -> Optional[RankingSnapshot]:
+        with self._lock:
+            snapshots = self._snapshots[period]
+            return next(reversed(snapshots.values())) if snapshots else None
+
+    def get(self, period: str, version: int) -> Optional[RankingSnapshot]:
+        """Instantane d'une version (curseur), s'il est encore garde"""
+        with self._lock:
+            return self._snapshots[period].get(version)
+
+    def rebuild(self, db: Session) -> None:
+        """Recalculer tous les classements (appele dans un thread)"""
+        started = time.monotonic()
+        rankings = compute_rankings(db)
+        built_at = time.monotonic()
+        with self._lock:
+            self._version += 1
+            for period, look_ids in rankings.items():
+                snapshots = self._snapshots[period]
+                snapshots[self._version] = RankingSnapshot(self._version, built_at, tuple(look_ids))
+                while len(snapshots) > SNAPSHOTS_PER_PERIOD:
+                    snapshots.popitem(last=False)
+            self.builds += 1
+            self.last_build_ms = round((built_at - started) * 1000, 1)
+
+    def is_stale(self, max_age_seconds: float) -> bool:
+        snapshot = self.current("all")
+        return snapshot is None or time.monotonic() - snapshot.built_at > max_age_seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "builds": self.builds,
+                "last_build_ms": self.last_build_ms,
+                "looks": {
+                    period: len(next(reversed(s.values())).look_ids) if s else 0
+                    for period, s in self._snapshots.items()
+                },
+            }
+
+
+popularity_ranking = PopularityRanking()
+
+# Reconstruction a la demande: une seule a la fois (cree dans la boucle d'evenements)
+_build_lock: Optional[asyncio.Lock] = None
+
+
+def _rebuild_sync() -> None:
+    from app.core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        popularity_ranking.rebuild(db)
+    finally:
+        db.close()
+
+
+async def ensure_rankings_fresh() -> None:
+    """
+    Pour discover: reconstruire si aucun classement ou si la tache de fond
+    est en retard (plus de 2 intervalles). Une seule reconstruction a la fois.
+    """
+    global _build_lock
+    max_age = 2 * settings.DISCOVER_RANKING_REFRESH_SECONDS
+    if not popularity_ranking.is_stale(max_age):
+        return
+    if _build_lock is None:
+        _build_lock = asyncio.Lock()
+    async with _build_lock:
+        if popularity_ranking.is_stale(max_age):
+            await asyncio.to_thread(_rebuild_sync)
+
+
+async def ranking_loop() -> None:
+    """Tache de fond: reconstruire les classements toutes les DISCOVER_RANKING_REFRESH_SECONDS"""
+    while True:
+        try:
+            await asyncio.to_thread(_rebuild_sync)
+        except Exception as e:
+            logger.warning(f"Classement discover echoue: {e}")
+        await asyncio.sleep(settings.DISCOVER_RANKING_REFRESH_SECONDS)
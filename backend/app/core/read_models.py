@@ -0,0 +1,95 @@
+"""
+Read models des listes chaudes (discover, fil, croisements, notifications).
+Dataclasses simples, remplies depuis des lignes de colonnes (pas d'objets
+ORM) et encodees telles quelles par orjson (app.api.responses): ni
+construction de modeles Pydantic ni re-validation par response_model.
+Pas de slots: orjson encode les dataclasses a __dict__ par son chemin rapide,
+plusieurs fois plus vite que celles a slots.
+L'ordre des champs est celui du JSON renvoye.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Optional
+
+
+@dataclass
+class UserSummary:
+    id: int
+    username: str
+    avatar_url: Optional[str] = None
+
+
+@dataclass
+class PhotoRecord:
+    """Photo d'un look avec son placeholder (BlurHash, couleur, dimensions)"""
+    photo_url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    blurhash: Optional[str] = None
+    dominant_color: Optional[str] = None
+
+
+@dataclass
+class ItemRecord:
+    category: Optional[str]
+    brand: Optional[str]
+    product_name: Optional[str]
+    color: Optional[str]
+    photo_url: Optional[str] = None
+
+
+@dataclass
+class LookCard:
+    """Look de discover et du fil des abonnements (pas de localisation)"""
+    id: int
+    title: Optional[str]
+    photo_url: Optional[str]
+    photo_urls: list
+    photos: list
+    look_date: date
+    created_at: datetime
+    likes_count: int
+    views_count: int
+    user: UserSummary
+    items: list = field(default_factory=list)
+
+
+@dataclass
+class CrossingCard:
+    """Croisement de la liste, champs de CrossingWithDetails"""
+    id: int
+    crossed_at: datetime
+    latitude: float
+    longitude: float
+    location_name: Optional[str]
+    other_user_id: int
+    other_username: str
+    other_avatar_url: Optional[str]
+    other_look_id: Optional[int]
+    other_look_title: Optional[str]
+    other_look_photo_url: Optional[str]
+    other_look_photo_urls: list
+    other_look_photos: list
+    other_look_items: list
+    views_count: int = 0
+    likes_count: int = 0
+
+
+@dataclass
+class NotificationActorRecord:
+    id: int
+    username: str
+    avatar_url: Optional[str] = None
+    full_name: Optional[str] = None
+
+
+@dataclass
+class NotificationCard:
+    """Notification de la liste, champs de NotificationResponse"""
+    id: int
+    type: str
+    actor: NotificationActorRecord
+    look_id: Optional[int]
+    is_read: bool
+    created_at: datetime
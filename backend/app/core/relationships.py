@@ -0,0 +1,160 @@
+"""
+Graphe des relations d'un utilisateur (abonnements et blocages) en cache.
+Charge une fois les abonnements et blocages entrants/sortants d'un utilisateur
+en ensembles d'ids (2 requetes), puis repond aux questions is_blocked /
+is_friend / follows pour un ou plusieurs utilisateurs sans requete.
+Invalide par les endpoints qui modifient follows / blocked_users; le TTL borne
+l'obsolescence si une modification passe par un autre chemin.
+Amis = abonnements mutuels avec status "accepted".
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+
+class Relationships(NamedTuple):
+    """Relations d'un utilisateur, en ensembles d'ids"""
+    user_id: int
+    following: frozenset  # Je suis (accepte)
+    followers: frozenset  # Me suivent (accepte)
+    pending_out: frozenset  # Mes demandes en attente
+    pending_in: frozenset  # Demandes recues en attente
+    blocked: frozenset  # Bloques par moi
+    blocked_by: frozenset  # M'ont bloque
+
+    def is_blocked(self, other_id: int) -> bool:
+        """Blocage dans un sens ou dans l'autre"""
+        return other_id in self.blocked or other_id in self.blocked_by
+
+    def is_friend(self, other_id: int) -> bool:
+        return other_id in self.following and other_id in self.followers
+
+    def follows(self, other_id: int) -> bool:
+        return other_id in self.following
+
+    def follow_status(self, other_id: int):
+        """"accepted", "pending" ou None (mon abonnement a other_id)"""
+        if other_id in self.following:
+            return "accepted"
+        if other_id in self.pending_out:
+            return "pending"
+        return None
+
+    def blocked_among(self, other_ids: Iterable[int]) -> set:
+        return {uid for uid in other_ids if self.is_blocked(uid)}
+
+    def friends_among(self, other_ids: Iterable[int]) -> set:
+        return {uid for uid in other_ids if self.is_friend(uid)}
+
+    def following_among(self, other_ids: Iterable[int]) -> set:
+        return {uid for uid in other_ids if uid in self.following}
+
+    def related_ids(self) -> set:
+        """Tous les utilisateurs lies (a invalider quand ce compte disparait)"""
+        return set().union(
+            self.following, self.followers, self.pending_out, self.pending_in,
+            self.blocked, self.blocked_by
+        )
+
+
+def load_relationships(db: Session, user_id: int) -> Relationships:
+    """Charger les relations d'un utilisateur depuis la base (2 requetes)"""
+    from app.models import Follow, BlockedUser
+
+    following, followers, pending_out, pending_in = set(), set(), set(), set()
+    follows = db.query(Follow.follower_id, Follow.followed_id, Follow.status).filter(
+        or_(Follow.follower_id == user_id, Follow.followed_id == user_id)
+    ).all()
+    for follower_id, followed_id, follow_status in follows:
+        accepted = follow_status == "accepted"
+        if follower_id == user_id:
+            (following if accepted else pending_out).add(followed_id)
+        else:
+            (followers if accepted else pending_in).add(follower_id)
+
+    blocked, blocked_by = set(), set()
+    blocks = db.query(BlockedUser.blocker_id, BlockedUser.blocked_id).filter(
+        or_(BlockedUser.blocker_id == user_id, BlockedUser.blocked_id == user_id)
+    ).all()
+    for blocker_id, blocked_id in blocks:
+        if blocker_id == user_id:
+            blocked.add(blocked_id)
+        else:
+            blocked_by.add(blocker_id)
+
+    return Relationships(
+        user_id=user_id,
+        following=frozenset(following),
+        followers=frozenset(followers),
+        pending_out=frozenset(pending_out),
+        pending_in=frozenset(pending_in),
+        blocked=frozenset(blocked),
+        blocked_by=frozenset(blocked_by),
+    )
+
+
+class RelationshipCache:
+    """Cache LRU user_id -> Relationships avec TTL, thread-safe"""
+
+    def __init__(self, max_users: int, ttl_seconds: int):
+        self.max_users = max_users
+        self.ttl = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session, user_id: int) -> Relationships:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        relationships = load_relationships(db, user_id)
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, relationships)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return relationships
+
+    def invalidate(self, *user_ids: int) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"users": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+relationship_cache = RelationshipCache(
+    max_users=settings.RELATIONSHIP_CACHE_MAX_USERS,
+    ttl_seconds=settings.RELATIONSHIP_CACHE_TTL_SECONDS,
+)
+
+
+def get_relationships(db: Session, user_id: int) -> Relationships:
+    if settings.RELATIONSHIP_CACHE_TTL_SECONDS <= 0:
+        return load_relationships(db, user_id)
+    return relationship_cache.get(db, user_id)
+
+
+def invalidate_relationships(*user_ids: int) -> None:
+    """A appeler apres le commit d'un changement de follows / blocked_users"""
+    relationship_cache.invalidate(*user_ids)
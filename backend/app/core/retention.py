@@ -0,0 +1,123 @@
+"""
+Retention des location_pings.
+- Fenetre chaude (PING_HOT_WINDOW_HOURS): pings gardes tels quels, seuls utilises
+  par la detection des croisements (y compris les batchs bufferises < 24h)
+- Au-dela: compaction a 1 ping par utilisateur, par cell et par intervalle.
+  Seule la tranche sortie de la fenetre chaude depuis la passe precedente est
+  compactee; sa fin est gardee en base (job_watermarks) pour les redemarrages
+- Au-dela de PING_RETENTION_DAYS: suppression
+Le meme job supprime les lignes expirees (> 24h) du fil des croisements.
+Le job tourne periodiquement depuis le lifespan de l'app (ou via /purge-pings).
+"""
+
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, text, update
+
+from app.core.config import settings
+from app.models import JobWatermark
+
+logger = logging.getLogger(__name__)
+
+# Taille des lots de suppression (evite de verrouiller la table longtemps)
+DELETE_CHUNK_SIZE = 10_000
+
+# Ligne de job_watermarks: fin de la derniere plage compactee
+COMPACTION_JOB = "ping_compaction"
+
+
+def time_bucket_expression(dialect: str, column: str, interval_seconds: int) -> str:
+    """Expression SQL du numero d'intervalle de temps d'une colonne DateTime"""
+    if dialect == "postgresql":
+        return f"FLOOR(EXTRACT(EPOCH FROM {column}) / {interval_seconds})"
+    return f"CAST(strftime('%s', {column}) AS INTEGER) / {interval_seconds}"
+
+
+def purge_old_pings(conn, cutoff: datetime) -> int:
+    """Supprimer par lots les pings plus anciens que cutoff"""
+    total = 0
+    while True:
+        result = conn.execute(text("""
+            DELETE FROM location_pings WHERE id IN (
+                SELECT id FROM location_pings WHERE timestamp < :cutoff LIMIT :chunk
+            )
+        """), {"cutoff": cutoff, "chunk": DELETE_CHUNK_SIZE})
+        total += result.rowcount
+        if result.rowcount < DELETE_CHUNK_SIZE:
+            return total
+
+
+def get_compacted_until(conn) -> Optional[datetime]:
+    return conn.execute(select(JobWatermark.until).where(JobWatermark.job == COMPACTION_JOB)).scalar()
+
+
+def set_compacted_until(conn, until: datetime) -> None:
+    result = conn.execute(update(JobWatermark).where(JobWatermark.job == COMPACTION_JOB).values(until=until))
+    if not result.rowcount:
+        conn.execute(JobWatermark.__table__.insert().values(job=COMPACTION_JOB, until=until))
+
+
+def compact_pings(conn, start: Optional[datetime], end: datetime, interval_seconds: int) -> int:
+    """
+    Garder un seul ping (le premier) par utilisateur, cell et intervalle
+    pour les pings de [start, end[. Groupes par cell_id, la cle spatiale de la
+    detection: les pings gardes restent trouves par _find_nearby_pings.
+    """
+    bucket = time_bucket_expression(conn.dialect.name, "location_pings.timestamp", interval_seconds)
+    range_filter = "timestamp < :end" + (" AND timestamp >= :start" if start else "")
+    result = conn.execute(text(f"""
+        DELETE FROM location_pings
+        WHERE {range_filter}
+        AND id NOT IN (
+            SELECT MIN(id) FROM location_pings
+            WHERE {range_filter}
+            GROUP BY user_id, cell_id, {bucket}
+        )
+    """), {"start": start, "end": end})
+    return result.rowcount
+
+
+def run_ping_retention(now: Optional[datetime] = None) -> dict:
+    """Une passe de compaction + purge. Retourne le nombre de lignes supprimees."""
+    from app.core.database import engine
+    from app.core.crossing_feed import purge_expired_feed_entries
+    from app.core.timelines import purge_expired_timeline_entries
+
+    now = now or datetime.utcnow()
+    hot_start = now - timedelta(hours=settings.PING_HOT_WINDOW_HOURS)
+    retention_cutoff = now - timedelta(days=settings.PING_RETENTION_DAYS)
+
+    with engine.begin() as conn:
+        purged = purge_old_pings(conn, retention_cutoff)
+    with engine.begin() as conn:
+        # Premiere passe (pas de watermark): toute la plage hors fenetre chaude
+        compacted_until = get_compacted_until(conn)
+        start = max(compacted_until, retention_cutoff) if compacted_until else None
+        compacted = compact_pings(conn, start, hot_start, settings.PING_COMPACTION_INTERVAL_MINUTES * 60)
+        set_compacted_until(conn, hot_start)
+    with engine.begin() as conn:
+        feed_purged = purge_expired_feed_entries(conn, now)
+    with engine.begin() as conn:
+        timeline_purged = purge_expired_timeline_entries(conn, date.today())
+
+    return {
+        "purged": purged,
+        "compacted": compacted,
+        "feed_purged": feed_purged,
+        "timeline_purged": timeline_purged,
+        "hot_window_start": hot_start.isoformat(),
+    }
+
+
+async def ping_retention_loop() -> None:
+    """Tache de fond: lancer la retention toutes les PING_RETENTION_JOB_MINUTES"""
+    while True:
+        try:
+            stats = await asyncio.to_thread(run_ping_retention)
+            logger.info(f"Retention location_pings: {stats}")
+        except Exception as e:
+            logger.warning(f"Retention location_pings echouee: {e}")
+        await asyncio.sleep(settings.PING_RETENTION_JOB_MINUTES * 60)
@@ -0,0 +1,161 @@
+"""
+Index de recherche plein texte des looks (GET /looks/discover?q=).
+Un document par look: titre, description et, pour chaque item, marque,
+nom du produit et couleur. Table look_search maintenue a l'ecriture
+(creation, modification, suppression de looks et d'items):
+- PostgreSQL: table + index GIN sur to_tsvector('simple', document)
+- SQLite (dev): table virtuelle FTS5, rowid = id du look
+Chaque mot de la requete doit apparaitre (en prefixe, pour la saisie au fil
+de l'eau); resultats classes par pertinence (ts_rank / bm25).
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import column, delete, func, insert, select, table, text
+from sqlalchemy.orm import Session
+
+from app.models import Look, LookItem
+
+# Configuration tsvector: pas de stemming (marques, textes FR/EN melanges)
+PG_TS_CONFIG = "simple"
+
+# Mots de la requete pris en compte
+MAX_QUERY_TERMS = 8
+
+# Colonnes de look_search selon la base (FTS5 n'a que rowid + document)
+_pg_table = table("look_search", column("look_id"), column("document"))
+_fts_table = table("look_search", column("rowid"), column("document"))
+
+
+def _dialect(db_or_conn) -> str:
+    bind = db_or_conn.get_bind() if isinstance(db_or_conn, Session) else db_or_conn
+    return bind.dialect.name
+
+
+def _id_column(dialect: str):
+    return _pg_table.c.look_id if dialect == "postgresql" else _fts_table.c.rowid
+
+
+def ensure_search_index(conn) -> bool:
+    """Creer la table de recherche si absente. Retourne True si elle vient d'etre creee."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        exists = conn.execute(text("SELECT to_regclass('look_search') IS NOT NULL")).scalar()
+        if exists:
+            return False
+        conn.execute(text(
+            "CREATE TABLE look_search ("
+            "look_id INTEGER PRIMARY KEY REFERENCES looks(id) ON DELETE CASCADE, "
+            "document TEXT NOT NULL)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX ix_look_search_document ON look_search "
+            f"USING GIN (to_tsvector('{PG_TS_CONFIG}', document))"
+        ))
+        return True
+
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'look_search'"
+    )).first()
+    if exists:
+        return False
+    # remove_diacritics: "ete" trouve "ete" accentue
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE look_search USING fts5(document, tokenize='unicode61 remove_diacritics 2')"
+    ))
+    return True
+
+
+def _documents(db_or_conn, look_ids) -> dict:
+    """Texte indexe de chaque look {look_id: document}"""
+    parts = {}
+    looks = db_or_conn.execute(
+        select(Look.id, Look.title, Look.description).where(Look.id.in_(look_ids))
+    ).all()
+    for look_id, title, description in looks:
+        parts[look_id] = [title, description]
+    items = db_or_conn.execute(
+        select(LookItem.look_id, LookItem.brand, LookItem.product_name, LookItem.color)
+        .where(LookItem.look_id.in_(look_ids))
+    ).all()
+    for look_id, brand, product_name, color in items:
+        if look_id in parts:
+            parts[look_id].extend((brand, product_name, color))
+    return {look_id: " ".join(p for p in values if p) for look_id, values in parts.items()}
+
+
+def _write_documents(db_or_conn, look_ids) -> None:
+    dialect = _dialect(db_or_conn)
+    target = _pg_table if dialect == "postgresql" else _fts_table
+    id_column = _id_column(dialect)
+    db_or_conn.execute(delete(target).where(id_column.in_(look_ids)))
+    rows = [
+        {id_column.name: look_id, "document": document}
+        for look_id, document in _documents(db_or_conn, look_ids).items()
+    ]
+    if rows:
+        db_or_conn.execute(insert(target), rows)
+
+
+def index_look(db: Session, look_id: int) -> None:
+    """Recalculer (sans commit) le document d'un look apres creation ou modification"""
+    # Session sans autoflush: rendre visibles les items ajoutes
+    db.flush()
+    _write_documents(db, [look_id])
+
+
+def unindex_looks(db: Session, look_ids) -> None:
+    """Retirer (sans commit) des looks supprimes de l'index"""
+    look_ids = list(look_ids)
+    if not look_ids:
+        return
+    dialect = _dialect(db)
+    target = _pg_table if dialect == "postgresql" else _fts_table
+    db.execute(delete(target).where(_id_column(dialect).in_(look_ids)))
+
+
+def rebuild_search_index(conn, batch_size: int = 1000) -> int:
+    """Migration: indexer tous les looks existants. Retourne le nombre de looks."""
+    ensure_search_index(conn)
+    total = 0
+    last_id = 0
+    while True:
+        look_ids = conn.execute(
+            select(Look.id).where(Look.id > last_id).order_by(Look.id).limit(batch_size)
+        ).scalars().all()
+        if not look_ids:
+            return total
+        _write_documents(conn, look_ids)
+        total += len(look_ids)
+        last_id = look_ids[-1]
+
+
+def search_terms(q: str) -> list:
+    """Mots de la requete (lettres/chiffres seulement: pas d'operateurs injectes)"""
+    return re.findall(r"\w+", q.lower())[:MAX_QUERY_TERMS]
+
+
+def search_matches(dialect: str, q: str) -> Optional[object]:
+    """
+    Sous-requete (look_id, rank) des looks correspondant a q, rank croissant
+    avec la pertinence. None si la requete ne contient aucun mot.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return None
+
+    if dialect == "postgresql":
+        document = func.to_tsvector(PG_TS_CONFIG, _pg_table.c.document)
+        query = func.to_tsquery(PG_TS_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        return select(
+            _pg_table.c.look_id.label("look_id"),
+            func.ts_rank(document, query).label("rank"),
+        ).where(document.op("@@")(query)).subquery("search_matches")
+
+    # FTS5: bm25 negatif, plus petit = plus pertinent
+    match = " ".join(f'"{term}"*' for term in terms)
+    return select(
+        _fts_table.c.rowid.label("look_id"),
+        (-func.bm25(text("look_search"))).label("rank"),
+    ).where(text("look_search MATCH :match").bindparams(match=match)).subquery("search_matches")
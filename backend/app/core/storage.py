@@ -1,7 +1,25 @@
 from supabase import create_client, Client
+from fastapi import UploadFile
 from app.core.config import settings
+from app.core.images import (
+    DEFAULT_VARIANT, OUTPUT_FORMATS, VARIANT_MAX_SIDES, process_image_async, variant_filename
+)
+from app.core.photo_cache import photo_cache
+from typing import NamedTuple, Optional
+import asyncio
+import os
 import uuid
 
+# Lecture des uploads par morceaux de 64 Ko
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Uploads simultanes vers le storage, pour tout le processus
+_upload_semaphore = asyncio.Semaphore(settings.UPLOAD_CONCURRENCY)
+
+
+class FileTooLargeError(Exception):
+    """Fichier uploade au-dela de la taille max"""
+
 _supabase_client: Client = None
 
 def get_supabase_client() -> Client:
@@ -23,81 +41,198 @@ def extract_filename(photo_url: str) -> str:
     return filename
 
 
-async def download_photo(photo_url: str) -> tuple[bytes, str]:
+def _content_type(filename: str) -> str:
+    """Content-Type d'apres l'extension"""
+    ext = filename.split(".")[-1].lower() if "." in filename else "jpg"
+    return "image/jpeg" if ext in ("jpg", "jpeg") else f"image/{ext}"
+
+
+class PhotoSource(NamedTuple):
+    """Photo a servir: fichier sur disque (envoye sans copie) ou contenu en memoire"""
+    name: str
+    content_type: str
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+
+
+async def open_photo(photo_url: str, size: str = DEFAULT_VARIANT) -> PhotoSource:
     """
-    Download a photo from Supabase Storage ou depuis le dossier local uploads/.
-    Returns (file_content, content_type)
+    Localiser une photo: dossier local uploads/ (dev) ou Supabase Storage via
+    le cache memoire/disque.
+    size: variante (thumb, medium, full); les photos d'avant le traitement
+    d'images n'ont que l'original, servi a la place.
     """
-    import os
-
     filename = extract_filename(photo_url)
     if not filename:
         raise Exception("Invalid photo URL")
-
-    # Determine content type from extension
-    ext = filename.split(".")[-1].lower() if "." in filename else "jpg"
-    content_type = f"image/{ext}"
-    if ext == "jpg":
-        content_type = "image/jpeg"
-
-    # Essayer Supabase d'abord
+    name = variant_filename(filename, size)
+    content_type = _content_type(name)
+
+    if get_supabase_client() is None:
+        for candidate in dict.fromkeys((name, filename)):
+            local_path = os.path.join(settings.UPLOAD_DIR, candidate)
+            if os.path.isfile(local_path):
+                return PhotoSource(name, content_type, path=local_path)
+        raise Exception(f"Photo not found: {filename}")
+
+    async def fetch() -> bytes:
+        # Client Supabase synchrone: hors de la boucle d'evenements
+        if name != filename:
+            try:
+                return await asyncio.to_thread(_download_object_sync, name)
+            except Exception:
+                pass
+        return await asyncio.to_thread(_download_object_sync, filename)
+
+    path, data = await photo_cache.locate(name, fetch)
+    return PhotoSource(name, content_type, path=path, data=data)
+
+
+def _download_object_sync(filename: str) -> bytes:
     client = get_supabase_client()
-    if client:
-        data = client.storage.from_(settings.SUPABASE_BUCKET).download(filename)
-        return data, content_type
+    return client.storage.from_(settings.SUPABASE_BUCKET).download(filename)
 
-    # Fallback: servir depuis le dossier local uploads/
-    local_path = os.path.join(settings.UPLOAD_DIR, filename)
-    if os.path.exists(local_path):
-        with open(local_path, "rb") as f:
-            return f.read(), content_type
 
-    raise Exception(f"Photo not found: {filename}")
-
-
-async def upload_photo(file_content: bytes, filename: str) -> str:
+async def read_upload(upload: UploadFile, max_size: int = None) -> bytes:
+    """
+    Lire un UploadFile par morceaux, en s'arretant des que max_size est depasse.
+    Leve FileTooLargeError sans lire le reste du fichier.
+    """
+    max_size = settings.MAX_FILE_SIZE if max_size is None else max_size
+    chunks = []
+    size = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            raise FileTooLargeError(upload.filename)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+class UploadedPhoto(NamedTuple):
+    """Photo uploadee: nom servi par /photos et placeholder (None si l'image n'a pas pu etre traitee)"""
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    blurhash: Optional[str] = None
+    dominant_color: Optional[str] = None
+
+
+async def upload_photo(file_content: bytes, filename: str) -> UploadedPhoto:
     """
     Upload a photo to Supabase Storage ou dans le dossier local uploads/.
-    Returns the filename (to be served via /api/photos/ endpoint).
+    L'image est d'abord traitee (sans EXIF, plafonnee, re-encodee) en variantes
+    thumb/medium/full avec son placeholder; si elle n'est pas decodable,
+    l'original est garde tel quel.
+    Returns the filename of the full variant (to be served via /api/photos/ endpoint).
     """
-    import os
+    processed = None
+    if settings.IMAGE_PROCESSING_ENABLED:
+        processed = await process_image_async(
+            file_content, settings.IMAGE_OUTPUT_FORMAT, settings.IMAGE_QUALITY, settings.IMAGE_PROCESS_WORKERS
+        )
+
+    if processed is None:
+        file_ext = filename.split(".")[-1] if "." in filename else "jpg"
+        unique_filename = f"{uuid.uuid4()}.{file_ext}"
+        objects = {unique_filename: file_content}
+    else:
+        unique_filename = f"{uuid.uuid4()}.{OUTPUT_FORMATS[settings.IMAGE_OUTPUT_FORMAT][1]}"
+        objects = {variant_filename(unique_filename, variant): data for variant, data in processed.variants.items()}
+
+    async with _upload_semaphore:
+        results = await asyncio.gather(
+            *(asyncio.to_thread(_put_object_sync, name, data) for name, data in objects.items()),
+            return_exceptions=True
+        )
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if failures:
+        await delete_photo(unique_filename)
+        raise failures[0]
 
-    # Generate unique filename
-    file_ext = filename.split(".")[-1] if "." in filename else "jpg"
-    unique_filename = f"{uuid.uuid4()}.{file_ext}"
+    if processed is None:
+        return UploadedPhoto(unique_filename)
+    return UploadedPhoto(
+        unique_filename, processed.width, processed.height, processed.blurhash, processed.dominant_color
+    )
 
+
+def _put_object_sync(filename: str, content: bytes) -> None:
     # Essayer Supabase d'abord
     client = get_supabase_client()
     if client:
         client.storage.from_(settings.SUPABASE_BUCKET).upload(
-            path=unique_filename,
-            file=file_content,
-            file_options={"content-type": f"image/{file_ext}"}
+            path=filename,
+            file=content,
+            file_options={"content-type": _content_type(filename)}
         )
-        return unique_filename
+        return
 
     # Fallback: sauvegarder localement
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    local_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
-    with open(local_path, "wb") as f:
-        f.write(file_content)
+    with open(os.path.join(settings.UPLOAD_DIR, filename), "wb") as f:
+        f.write(content)
+
 
-    return unique_filename
+async def upload_photos(files: list, best_effort: bool = False) -> list:
+    """
+    Uploader plusieurs photos [(contenu, nom)] en parallele (au plus
+    UPLOAD_CONCURRENCY a la fois pour tout le processus). Retourne les
+    UploadedPhoto dans l'ordre des fichiers.
+    Tout ou rien: si un upload echoue, ceux deja faits sont supprimes et
+    l'exception est propagee. best_effort=True: un echec donne None a sa place.
+    """
+    results = await asyncio.gather(
+        *(upload_photo(content, filename) for content, filename in files),
+        return_exceptions=True
+    )
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if not failures:
+        return results
+    if best_effort:
+        return [None if isinstance(r, BaseException) else r for r in results]
+
+    await delete_photos([r.url for r in results if not isinstance(r, BaseException)])
+    raise failures[0]
 
 
 async def delete_photo(photo_url: str) -> bool:
     """
-    Delete a photo from Supabase Storage.
+    Delete a photo from Supabase Storage (ou du dossier local uploads/).
     """
-    client = get_supabase_client()
-
-    if not client or not photo_url:
+    if not photo_url:
         return False
+    filename = extract_filename(photo_url)
+    if filename:
+        await photo_cache.invalidate(variant_filename(filename, variant) for variant in VARIANT_MAX_SIDES)
+    return await asyncio.to_thread(_delete_photo_sync, photo_url)
+
 
+def _delete_photo_sync(photo_url: str) -> bool:
+    filename = extract_filename(photo_url)
+    if not filename:
+        return False
+    # La photo et ses variantes (absentes pour les anciens uploads)
+    filenames = [variant_filename(filename, variant) for variant in VARIANT_MAX_SIDES]
+    client = get_supabase_client()
     try:
-        # Extract filename from URL
-        filename = photo_url.split("/")[-1]
-        client.storage.from_(settings.SUPABASE_BUCKET).remove([filename])
-        return True
+        if client:
+            client.storage.from_(settings.SUPABASE_BUCKET).remove(filenames)
+            return True
+        deleted = False
+        for name in filenames:
+            local_path = os.path.join(settings.UPLOAD_DIR, name)
+            if os.path.exists(local_path):
+                os.remove(local_path)
+                deleted = True
+        return deleted
     except Exception:
         return False
+
+
+async def delete_photos(photo_urls: list) -> None:
+    """Supprimer plusieurs photos en parallele (rollback d'uploads, suppression de look)"""
+    await asyncio.gather(*(delete_photo(url) for url in photo_urls if url))
@@ -0,0 +1,164 @@
+"""
+Fil des abonnements (GET /looks/feed) en timelines materialisees.
+Fan-out a l'ecriture: a la creation d'un look du jour, une ligne par abonne
+accepte de l'auteur dans look_timelines. La lecture est un parcours de l'index
+(owner_id, look_date, look_created_at, look_id) pagine par cle, sans IN sur
+la liste des abonnements.
+Auteurs tres suivis (plus de FEED_FANOUT_MAX_FOLLOWERS abonnes a la creation
+du look): rien n'est pousse, le look est marque fanout_on_read et lu a la
+lecture du fil parmi les quelques looks du jour ainsi marques.
+Seuls les looks du jour sont servis: la retention purge les lignes plus anciennes.
+"""
+
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, insert, or_, select, union_all, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Look, Follow, TimelineEntry
+
+
+def _accepted_followers(db: Session, user_id: int) -> list:
+    # Lu en base et non dans le cache des relations: un abonnement accepte
+    # dans un autre worker doit recevoir les looks suivants
+    return db.execute(select(Follow.follower_id).where(
+        Follow.followed_id == user_id,
+        Follow.status == "accepted"
+    )).scalars().all()
+
+
+def fan_out_look(db: Session, look_id: int) -> int:
+    """
+    Pousser (sans commit) un look dans les timelines des abonnes de son auteur.
+    Retourne le nombre de timelines ecrites (0 pour un auteur tres suivi).
+    """
+    look = db.execute(select(
+        Look.id, Look.user_id, Look.look_date, Look.created_at
+    ).where(Look.id == look_id)).first()
+    if look is None or look.look_date < date.today():
+        return 0
+
+    followers = _accepted_followers(db, look.user_id)
+    if len(followers) > settings.FEED_FANOUT_MAX_FOLLOWERS:
+        db.execute(update(Look).where(Look.id == look_id).values(fanout_on_read=True))
+        return 0
+
+    db.execute(delete(TimelineEntry).where(TimelineEntry.look_id == look_id))
+    if followers:
+        db.execute(insert(TimelineEntry), [
+            {
+                "owner_id": owner_id,
+                "author_id": look.user_id,
+                "look_id": look.id,
+                "look_date": look.look_date,
+                "look_created_at": look.created_at,
+            }
+            for owner_id in followers
+        ])
+    return len(followers)
+
+
+def refresh_timeline_pair(db: Session, follower_id: int, author_id: int) -> None:
+    """
+    Recalculer (sans commit) les looks d'un auteur dans la timeline d'un
+    utilisateur apres un changement d'abonnement (follow, unfollow, acceptation).
+    """
+    # Session sans autoflush: rendre visible l'abonnement en cours
+    db.flush()
+    db.execute(delete(TimelineEntry).where(
+        TimelineEntry.owner_id == follower_id,
+        TimelineEntry.author_id == author_id
+    ))
+
+    accepted = db.execute(select(Follow.id).where(
+        Follow.follower_id == follower_id,
+        Follow.followed_id == author_id,
+        Follow.status == "accepted"
+    )).first()
+    if not accepted:
+        return
+
+    looks = db.execute(select(Look.id, Look.look_date, Look.created_at).where(
+        Look.user_id == author_id,
+        Look.look_date >= date.today(),
+        Look.fanout_on_read.is_(False)
+    )).all()
+    if looks:
+        db.execute(insert(TimelineEntry), [
+            {
+                "owner_id": follower_id,
+                "author_id": author_id,
+                "look_id": look.id,
+                "look_date": look.look_date,
+                "look_created_at": look.created_at,
+            }
+            for look in looks
+        ])
+
+
+def remove_look_from_timelines(db: Session, look_id: int) -> None:
+    db.execute(delete(TimelineEntry).where(TimelineEntry.look_id == look_id))
+
+
+def remove_user_from_timelines(db: Session, user_id: int) -> None:
+    """Suppression de compte: sa timeline et ses looks dans les autres"""
+    db.execute(delete(TimelineEntry).where(
+        or_(TimelineEntry.owner_id == user_id, TimelineEntry.author_id == user_id)
+    ))
+
+
+def rebuild_timelines(db: Session) -> int:
+    """Migration: reconstruire les timelines a partir des looks du jour. Retourne le nombre de looks."""
+    db.execute(delete(TimelineEntry))
+    # Le choix push / pull est refait avec le nombre d'abonnes actuel
+    db.execute(update(Look).where(
+        Look.look_date >= date.today(),
+        Look.fanout_on_read.is_(True)
+    ).values(fanout_on_read=False))
+    look_ids = db.execute(select(Look.id).where(Look.look_date >= date.today())).scalars().all()
+    for look_id in look_ids:
+        fan_out_look(db, look_id)
+    return len(look_ids)
+
+
+def purge_expired_timeline_entries(conn, today: date) -> int:
+    """Supprimer les lignes des looks des jours precedents"""
+    result = conn.execute(
+        TimelineEntry.__table__.delete().where(TimelineEntry.look_date < today)
+    )
+    return result.rowcount
+
+
+def pull_authors_query(today: date):
+    """Auteurs des looks du jour lus a la lecture (peu nombreux)"""
+    return select(Look.user_id).where(
+        Look.fanout_on_read.is_(True),
+        Look.look_date == today
+    ).distinct()
+
+
+def feed_page_query(owner_id: int, today: date, pull_author_ids: Optional[Iterable[int]] = None):
+    """
+    (requete, colonnes de tri) du fil d'un utilisateur, a paginer par cle:
+    lignes (id, created_at) de sa timeline, plus les looks du jour des
+    auteurs tres suivis qu'il suit (pull_author_ids).
+    """
+    pushed = select(
+        TimelineEntry.look_id.label("id"), TimelineEntry.look_created_at.label("created_at")
+    ).where(
+        TimelineEntry.owner_id == owner_id,
+        TimelineEntry.look_date == today
+    )
+    pull_author_ids = set(pull_author_ids or ())
+    if not pull_author_ids:
+        return pushed, (TimelineEntry.look_created_at, TimelineEntry.look_id)
+
+    pulled = select(Look.id.label("id"), Look.created_at.label("created_at")).where(
+        Look.fanout_on_read.is_(True),
+        Look.look_date == today,
+        Look.user_id.in_(pull_author_ids)
+    )
+    feed = union_all(pushed, pulled).subquery("feed")
+    return select(feed.c.id, feed.c.created_at), (feed.c.created_at, feed.c.id)
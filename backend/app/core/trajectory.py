@@ -0,0 +1,111 @@
+"""
+Detection des croisements sur les trajectoires.
+Chaque utilisateur est vu comme une polyligne: entre deux pings consecutifs
+(espaces de moins de CROSSING_MAX_SEGMENT_MINUTES) sa position est interpolee
+lineairement. Deux utilisateurs se croisent si, a un meme instant, leurs
+positions interpolees passent a moins de CROSSING_DISTANCE_METERS.
+Permet aux clients de pinger moins souvent sans rater les croisements.
+"""
+
+import math
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.core.ping_index import IndexedPing
+from app.core.zones import METERS_PER_DEGREE_LAT, get_cell_id
+
+
+def get_segments(pings: list, max_gap: timedelta) -> list:
+    """Paires de pings consecutifs (tries par timestamp) assez proches dans le temps"""
+    return [
+        (a, b) for a, b in zip(pings, pings[1:])
+        if timedelta(0) < b.timestamp - a.timestamp <= max_gap
+    ]
+
+
+def _position_at(a: IndexedPing, b: IndexedPing, t: datetime) -> tuple:
+    """Position (lat, lon) interpolee sur le segment a -> b a l'instant t"""
+    duration = (b.timestamp - a.timestamp).total_seconds()
+    ratio = (t - a.timestamp).total_seconds() / duration if duration else 0.0
+    return (
+        a.latitude + (b.latitude - a.latitude) * ratio,
+        a.longitude + (b.longitude - a.longitude) * ratio,
+    )
+
+
+def closest_approach(a0: IndexedPing, a1: IndexedPing, b0: IndexedPing, b1: IndexedPing) -> Optional[tuple]:
+    """
+    Point de rapprochement maximal de deux segments sur leur periode commune.
+    Retourne (distance en metres, instant, lat, lon du milieu) ou None si les
+    segments ne se chevauchent pas dans le temps.
+    """
+    start = max(a0.timestamp, b0.timestamp)
+    end = min(a1.timestamp, b1.timestamp)
+    if start > end:
+        return None
+
+    # Projection locale en metres (equirectangulaire, suffisant a cette echelle)
+    a_lat, a_lon = _position_at(a0, a1, start)
+    b_lat, b_lon = _position_at(b0, b1, start)
+    a_end = _position_at(a0, a1, end)
+    b_end = _position_at(b0, b1, end)
+    meters_per_degree_lon = METERS_PER_DEGREE_LAT * math.cos(math.radians(a_lat))
+
+    # Ecart relatif au debut et sa variation sur la periode
+    dx = (b_lon - a_lon) * meters_per_degree_lon
+    dy = (b_lat - a_lat) * METERS_PER_DEGREE_LAT
+    vx = ((b_end[1] - a_end[1]) * meters_per_degree_lon) - dx
+    vy = ((b_end[0] - a_end[0]) * METERS_PER_DEGREE_LAT) - dy
+
+    # Minimum de |d + v*r| pour r dans [0, 1]
+    speed_sq = vx * vx + vy * vy
+    ratio = 0.0 if speed_sq == 0 else min(1.0, max(0.0, -(dx * vx + dy * vy) / speed_sq))
+    distance = math.hypot(dx + vx * ratio, dy + vy * ratio)
+
+    t = start + (end - start) * ratio
+    a_pos = _position_at(a0, a1, t)
+    b_pos = _position_at(b0, b1, t)
+    return distance, t, (a_pos[0] + b_pos[0]) / 2, (a_pos[1] + b_pos[1]) / 2
+
+
+def find_trajectory_matches(
+    own_pings: list,
+    trajectories: dict,
+    since: datetime,
+    max_distance: float,
+    max_gap: timedelta,
+) -> dict:
+    """
+    Croisements entre notre trajectoire et celles des autres utilisateurs.
+    Seuls nos segments qui se terminent apres `since` (les nouveaux pings) sont
+    testes: les plus anciens l'ont deja ete a la reception de leurs pings.
+    Retourne {user_id: IndexedPing au point de croisement} (premier croisement).
+    """
+    own_segments = [(a, b) for a, b in get_segments(own_pings, max_gap) if b.timestamp >= since]
+    if not own_segments:
+        return {}
+
+    matches = {}
+    for other_user_id, pings in trajectories.items():
+        segments = get_segments(pings, max_gap)
+        segment_ends = [b1.timestamp for _, b1 in segments]
+        best = None
+        for a0, a1 in own_segments:
+            # Segments tries et disjoints: seuls ceux qui chevauchent [a0, a1]
+            i = bisect_left(segment_ends, a0.timestamp)
+            while i < len(segments) and segments[i][0].timestamp <= a1.timestamp:
+                approach = closest_approach(a0, a1, *segments[i])
+                if approach and approach[0] <= max_distance and (best is None or approach[1] < best[1]):
+                    best = approach
+                i += 1
+        if best:
+            _, t, lat, lon = best
+            matches[other_user_id] = IndexedPing(
+                user_id=other_user_id,
+                cell_id=get_cell_id(lat, lon),
+                latitude=lat,
+                longitude=lon,
+                timestamp=t,
+            )
+    return matches
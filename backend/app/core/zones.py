@@ -11,11 +11,15 @@ ZONE_SIZE_METERS = 50
 # 1 degré de latitude = ~111km
 METERS_PER_DEGREE_LAT = 111_000
 
-def get_zone_id(latitude: float, longitude: float) -> str:
-    """
-    Convertit des coordonnées GPS en identifiant de zone.
-    Retourne un ID unique pour chaque carré de 50m x 50m.
-    """
+# Cell id entier: index lat/lon decales en positif puis entrelaces bit a bit
+# (code de Morton / Z-order). 31 bits par axe -> 62 bits, tient dans un BIGINT.
+CELL_AXIS_OFFSET = 1 << 30
+CELL_X_MASK = 0x1555555555555555  # Bits pairs: longitude
+CELL_Y_MASK = 0x2AAAAAAAAAAAAAAA  # Bits impairs: latitude
+
+
+def get_zone_indexes(latitude: float, longitude: float) -> tuple:
+    """Index (lat, lon) du carré de 50m x 50m contenant les coordonnées"""
     # Calculer l'index de la zone en latitude
     zone_lat = int(latitude * METERS_PER_DEGREE_LAT / ZONE_SIZE_METERS)
 
@@ -24,10 +28,101 @@ def get_zone_id(latitude: float, longitude: float) -> str:
     meters_per_degree_lon = METERS_PER_DEGREE_LAT * math.cos(math.radians(latitude))
     zone_lon = int(longitude * meters_per_degree_lon / ZONE_SIZE_METERS)
 
+    return zone_lat, zone_lon
+
+
+def get_zone_id(latitude: float, longitude: float) -> str:
+    """
+    Convertit des coordonnées GPS en identifiant de zone.
+    Retourne un ID unique pour chaque carré de 50m x 50m.
+    """
+    zone_lat, zone_lon = get_zone_indexes(latitude, longitude)
+
     # Créer un ID unique pour cette zone
     return f"{zone_lat}:{zone_lon}"
 
 
+def _spread_bits(value: int) -> int:
+    """Intercale un 0 entre chaque bit (32 bits -> 64 bits)"""
+    value &= 0xFFFFFFFF
+    value = (value | (value << 16)) & 0x0000FFFF0000FFFF
+    value = (value | (value << 8)) & 0x00FF00FF00FF00FF
+    value = (value | (value << 4)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value << 2)) & 0x3333333333333333
+    value = (value | (value << 1)) & 0x5555555555555555
+    return value
+
+
+def _compact_bits(value: int) -> int:
+    """Inverse de _spread_bits: garde un bit sur deux"""
+    value &= 0x5555555555555555
+    value = (value | (value >> 1)) & 0x3333333333333333
+    value = (value | (value >> 2)) & 0x0F0F0F0F0F0F0F0F
+    value = (value | (value >> 4)) & 0x00FF00FF00FF00FF
+    value = (value | (value >> 8)) & 0x0000FFFF0000FFFF
+    value = (value | (value >> 16)) & 0x00000000FFFFFFFF
+    return value
+
+
+def encode_cell(zone_lat: int, zone_lon: int) -> int:
+    """Index de zone -> cell id entier 64 bits (Morton)"""
+    return _spread_bits(zone_lon + CELL_AXIS_OFFSET) | (_spread_bits(zone_lat + CELL_AXIS_OFFSET) << 1)
+
+
+def decode_cell(cell_id: int) -> tuple:
+    """Cell id -> index de zone (lat, lon)"""
+    return _compact_bits(cell_id >> 1) - CELL_AXIS_OFFSET, _compact_bits(cell_id) - CELL_AXIS_OFFSET
+
+
+def get_cell_id(latitude: float, longitude: float) -> int:
+    """Convertit des coordonnées GPS en cell id entier (même carré que get_zone_id)"""
+    return encode_cell(*get_zone_indexes(latitude, longitude))
+
+
+def zone_id_to_cell_id(zone_id: str) -> int:
+    zone_lat, zone_lon = map(int, zone_id.split(':'))
+    return encode_cell(zone_lat, zone_lon)
+
+
+def cell_id_to_zone_id(cell_id: int) -> str:
+    zone_lat, zone_lon = decode_cell(cell_id)
+    return f"{zone_lat}:{zone_lon}"
+
+
+def get_adjacent_cells(cell_id: int) -> list:
+    """
+    Retourne les 9 cells (la cell + 8 voisins), calcules directement sur le code
+    de Morton par addition "diluee" (sans decoder/reencoder les index).
+    """
+    x_bits = cell_id & CELL_X_MASK
+    y_bits = cell_id & CELL_Y_MASK
+    xs = (
+        (x_bits - 1) & CELL_X_MASK,
+        x_bits,
+        ((cell_id | CELL_Y_MASK) + 1) & CELL_X_MASK,
+    )
+    ys = (
+        (y_bits - 2) & CELL_Y_MASK,
+        y_bits,
+        ((cell_id | CELL_X_MASK) + 2) & CELL_Y_MASK,
+    )
+    return [x | y for y in ys for x in xs]
+
+
+def get_cell_ranges(cell_ids) -> list:
+    """
+    Regroupe des cell ids en plages contigues [debut, fin] pour des requetes
+    BETWEEN sur l'index (voisins en Z-order souvent consecutifs).
+    """
+    ranges = []
+    for cell_id in sorted(set(cell_ids)):
+        if ranges and cell_id == ranges[-1][1] + 1:
+            ranges[-1][1] = cell_id
+        else:
+            ranges.append([cell_id, cell_id])
+    return [tuple(r) for r in ranges]
+
+
 def get_adjacent_zones(zone_id: str) -> list:
     """
     Retourne la liste des zones adjacentes (8 voisins + la zone elle-meme).
@@ -52,3 +147,38 @@ def get_zone_center(zone_id: str) -> tuple:
     lon = (zone_lon * ZONE_SIZE_METERS) / (METERS_PER_DEGREE_LAT * math.cos(math.radians(lat)))
 
     return (lat, lon)
+
+
+def get_cells_in_box(lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> list:
+    """
+    Cell ids couvrant un rectangle GPS (+1 cell de marge sur chaque bord).
+    L'index de longitude depend de la latitude: bornes recalculees par ligne.
+    """
+    lat_lo, _ = get_zone_indexes(lat_min, lon_min)
+    lat_hi, _ = get_zone_indexes(lat_max, lon_min)
+    cells = []
+    for zone_lat in range(lat_lo - 1, lat_hi + 2):
+        row_lat = (zone_lat * ZONE_SIZE_METERS) / METERS_PER_DEGREE_LAT
+        lon_a = get_zone_indexes(row_lat, lon_min)[1]
+        lon_b = get_zone_indexes(row_lat, lon_max)[1]
+        for zone_lon in range(min(lon_a, lon_b) - 1, max(lon_a, lon_b) + 2):
+            cells.append(encode_cell(zone_lat, zone_lon))
+    return cells
+
+
+def backfill_cell_ids(conn, table: str, batch_size: int = 5000) -> int:
+    """Migration: remplir cell_id a partir de zone_id pour les lignes existantes"""
+    from sqlalchemy import text
+
+    total = 0
+    while True:
+        rows = conn.execute(text(
+            f"SELECT id, zone_id FROM {table} WHERE cell_id IS NULL AND zone_id IS NOT NULL LIMIT :limit"
+        ), {"limit": batch_size}).fetchall()
+        if not rows:
+            return total
+        conn.execute(
+            text(f"UPDATE {table} SET cell_id = :cell_id WHERE id = :id"),
+            [{"id": row[0], "cell_id": zone_id_to_cell_id(row[1])} for row in rows]
+        )
+        total += len(rows)
@@ -5,10 +5,17 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, async_engine, Base, SessionLocal
+from app.core.crossing_worker import crossing_worker
+from app.core.images import shutdown_image_pool
+from app.core.retention import ping_retention_loop, run_ping_retention
+from app.core.geocoding import geocoding_retry_loop
+from app.core.ranking import ranking_loop
 from app.api.endpoints import auth, looks, crossings, users, photos, notifications
 
 
@@ -38,6 +45,16 @@ except Exception as e:
     import logging
     logging.getLogger(__name__).warning(f"create_all warning (tables may already exist): {e}")
 
+# Index de recherche des looks (table virtuelle FTS5 en dev): creer et remplir si absent
+try:
+    from app.core.search import ensure_search_index, rebuild_search_index
+    with engine.begin() as _conn:
+        if ensure_search_index(_conn):
+            rebuild_search_index(_conn)
+except Exception as e:
+    import logging
+    logging.getLogger(__name__).warning(f"search index warning: {e}")
+
 # Migration: ajouter photo_url aux look_items si manquante
 try:
     from sqlalchemy import text, inspect
@@ -50,11 +67,47 @@ try:
 except Exception:
     pass
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Worker de detection des croisements (vide sa file a l'arret)
+    crossing_worker.start()
+    # Reprendre les pings inseres mais pas encore detectes avant l'arret
+    if settings.CROSSING_DETECTION_ASYNC:
+        try:
+            await asyncio.to_thread(crossing_worker.catch_up)
+        except Exception as e:
+            import logging
+            logging.getLogger(__name__).warning(f"Reprise des pings en attente echouee: {e}")
+    # Compaction / purge periodique des location_pings
+    retention_task = None
+    if settings.PING_RETENTION_JOB_MINUTES > 0:
+        retention_task = asyncio.create_task(ping_retention_loop())
+    # Classements de /looks/discover recalcules en tache de fond
+    ranking_task = None
+    if settings.DISCOVER_RANKING_ENABLED:
+        ranking_task = asyncio.create_task(ranking_loop())
+    # Croisements restes sans nom de lieu (backend de geocoding en echec)
+    geocoding_task = None
+    if settings.GEOCODING_RETRY_MINUTES > 0:
+        geocoding_task = asyncio.create_task(geocoding_retry_loop())
+    yield
+    if retention_task:
+        retention_task.cancel()
+    if ranking_task:
+        ranking_task.cancel()
+    if geocoding_task:
+        geocoding_task.cancel()
+    crossing_worker.stop()
+    shutdown_image_pool()
+    await async_engine.dispose()
+
+
 # Creer l'app
 app = FastAPI(
     title=settings.APP_NAME,
     description="API pour LOOKUP - Decouvrez les looks des personnes que vous croisez",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Rate limiting
@@ -75,6 +128,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Servir les fichiers uploades
@@ -169,10 +223,22 @@ async def run_migration(request: Request, _: bool = Depends(verify_admin_key)):
         ("likes_count", "ALTER TABLE looks ADD COLUMN likes_count INTEGER DEFAULT 0"),
         ("views_count", "ALTER TABLE looks ADD COLUMN views_count INTEGER DEFAULT 0"),
         ("look_date", "ALTER TABLE looks ADD COLUMN look_date DATE DEFAULT CURRENT_DATE"),
+        ("fanout_on_read", "ALTER TABLE looks ADD COLUMN fanout_on_read BOOLEAN NOT NULL DEFAULT FALSE"),
     ]:
         if col not in look_cols:
             run_sql(f"looks.{col}", sql)
 
+    # Placeholders des photos (BlurHash, couleur dominante, dimensions)
+    look_photo_cols = [c["name"] for c in inspector.get_columns("look_photos")] if "look_photos" in existing_tables else []
+    for col, sql in [
+        ("width", "ALTER TABLE look_photos ADD COLUMN width INTEGER"),
+        ("height", "ALTER TABLE look_photos ADD COLUMN height INTEGER"),
+        ("blurhash", "ALTER TABLE look_photos ADD COLUMN blurhash VARCHAR(64)"),
+        ("dominant_color", "ALTER TABLE look_photos ADD COLUMN dominant_color VARCHAR(7)"),
+    ]:
+        if col not in look_photo_cols and "look_photos" in existing_tables:
+            run_sql(f"look_photos.{col}", sql)
+
     # Colonnes manquantes sur crossings
     crossing_cols = [c["name"] for c in inspector.get_columns("crossings")] if "crossings" in existing_tables else []
     for col, sql in [
@@ -183,10 +249,22 @@ async def run_migration(request: Request, _: bool = Depends(verify_admin_key)):
         ("user2_viewed", "ALTER TABLE crossings ADD COLUMN user2_viewed TIMESTAMP"),
         ("likes_count", "ALTER TABLE crossings ADD COLUMN likes_count INTEGER DEFAULT 0"),
         ("views_count", "ALTER TABLE crossings ADD COLUMN views_count INTEGER DEFAULT 0"),
+        ("cell_id", "ALTER TABLE crossings ADD COLUMN cell_id BIGINT"),
+        ("time_bucket", "ALTER TABLE crossings ADD COLUMN time_bucket INTEGER"),
     ]:
         if col not in crossing_cols:
             run_sql(f"crossings.{col}", sql)
 
+    # Cell id entier sur location_pings (remplace zone_id dans les requetes)
+    ping_cols = [c["name"] for c in inspector.get_columns("location_pings")] if "location_pings" in existing_tables else []
+    if "cell_id" not in ping_cols and "location_pings" in existing_tables:
+        run_sql("location_pings.cell_id", "ALTER TABLE location_pings ADD COLUMN cell_id BIGINT")
+    if "detection_pending" not in ping_cols and "location_pings" in existing_tables:
+        run_sql(
+            "location_pings.detection_pending",
+            "ALTER TABLE location_pings ADD COLUMN detection_pending BOOLEAN NOT NULL DEFAULT FALSE"
+        )
+
     # Colonnes manquantes sur follows
     follow_cols = [c["name"] for c in inspector.get_columns("follows")] if "follows" in existing_tables else []
     if "status" not in follow_cols and "follows" in existing_tables:
@@ -199,6 +277,28 @@ async def run_migration(request: Request, _: bool = Depends(verify_admin_key)):
     except Exception as e:
         results.append(f"ERROR: create_all: {e}")
 
+    # Index de recherche plein texte des looks (reconstruit)
+    from app.core.search import rebuild_search_index
+    try:
+        with engine.begin() as conn:
+            indexed = rebuild_search_index(conn)
+        results.append(f"OK: look search index rebuilt ({indexed} looks)")
+    except Exception as e:
+        results.append(f"ERROR: look search index: {e}")
+
+    # Paires de croisements canoniques + dedup avant la contrainte unique
+    from app.core.crossing_detection import normalize_crossing_pairs
+    try:
+        with engine.begin() as conn:
+            removed = normalize_crossing_pairs(conn)
+        results.append(f"OK: crossings pairs normalized ({removed} duplicates removed)")
+    except Exception as e:
+        results.append(f"ERROR: crossings pairs: {e}")
+    # time_bucket rempli: NOT NULL (les NULL ne sont jamais en conflit dans l'index unique).
+    # SQLite ne modifie pas une colonne existante: seules les nouvelles bases l'ont.
+    if engine.dialect.name == "postgresql":
+        run_sql("crossings.time_bucket NOT NULL", "ALTER TABLE crossings ALTER COLUMN time_bucket SET NOT NULL")
+
     # Contraintes uniques
     for name, table, columns in [
         ("uq_look_like", "look_likes", "look_id, user_id"),
@@ -211,6 +311,12 @@ async def run_migration(request: Request, _: bool = Depends(verify_admin_key)):
     ]:
         run_sql(name, f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE ({columns})")
 
+    # Dedup des croisements (ON CONFLICT): index unique, ADD CONSTRAINT n'existe pas en SQLite
+    run_sql(
+        "uq_crossing_pair_bucket",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_crossing_pair_bucket ON crossings (user1_id, user2_id, time_bucket)"
+    )
+
     # Indexes
     for name, table, columns in [
         ("ix_notifications_user_read_created", "notifications", "user_id, is_read, created_at"),
@@ -218,38 +324,85 @@ async def run_migration(request: Request, _: bool = Depends(verify_admin_key)):
         ("ix_looks_created_at", "looks", "created_at"),
         ("ix_crossings_users", "crossings", "user1_id, user2_id"),
         ("ix_crossings_crossed_at", "crossings", "crossed_at"),
+        ("ix_location_pings_cell_timestamp", "location_pings", "cell_id, timestamp"),
+        ("ix_location_pings_timestamp", "location_pings", "timestamp"),
+        ("ix_crossings_cell_id", "crossings", "cell_id"),
+        ("ix_notifications_user_page", "notifications", "user_id, created_at, id"),
+        ("ix_saved_looks_user_page", "saved_looks", "user_id, created_at, id"),
+        ("ix_saved_crossings_user_page", "saved_crossings", "user_id, created_at, id"),
+        ("ix_looks_fanout_date", "looks", "fanout_on_read, look_date"),
     ]:
         run_sql(f"Index {name}", f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    run_sql(
+        "Index ix_location_pings_pending",
+        "CREATE INDEX IF NOT EXISTS ix_location_pings_pending ON location_pings (timestamp) WHERE detection_pending"
+    )
+
+    # Remplir cell_id des lignes existantes, puis retirer les index sur zone_id
+    from app.core.zones import backfill_cell_ids
+    for table in ("location_pings", "crossings"):
+        try:
+            with engine.begin() as conn:
+                count = backfill_cell_ids(conn, table)
+            results.append(f"OK: {table}.cell_id backfill ({count} rows)")
+        except Exception as e:
+            results.append(f"ERROR: {table}.cell_id backfill: {e}")
+    for name in ("ix_location_pings_zone_timestamp", "ix_location_pings_zone_id", "ix_crossings_zone_id"):
+        run_sql(f"Drop index {name}", f"DROP INDEX IF EXISTS {name}")
+
+    # Construire le fil des croisements des dernieres 24h
+    from app.core.crossing_feed import rebuild_all_feeds
+    db = SessionLocal()
+    try:
+        rebuild_all_feeds(db)
+        db.commit()
+        results.append("OK: crossing_feed rebuilt")
+    except Exception as e:
+        db.rollback()
+        results.append(f"ERROR: crossing_feed: {e}")
+    finally:
+        db.close()
+
+    # Construire les timelines du fil des abonnements (looks du jour)
+    from app.core.timelines import rebuild_timelines
+    db = SessionLocal()
+    try:
+        count = rebuild_timelines(db)
+        db.commit()
+        results.append(f"OK: look_timelines rebuilt ({count} looks)")
+    except Exception as e:
+        db.rollback()
+        results.append(f"ERROR: look_timelines: {e}")
+    finally:
+        db.close()
 
     return {"migration": results}
 
-@app.get("/cleanup-crossings")
-async def cleanup_crossings(request: Request, _: bool = Depends(verify_admin_key)):
-    """Nettoyer les doublons de croisements et reset les look_ids"""
-    from sqlalchemy import text
-    with engine.begin() as conn:
-        # Supprimer les doublons: garder seulement le plus recent par paire d'utilisateurs
-        result_dedup = conn.execute(text("""
-            DELETE FROM crossings WHERE id NOT IN (
-                SELECT MAX(id) FROM crossings
-                GROUP BY LEAST(user1_id, user2_id), GREATEST(user1_id, user2_id)
-            )
-        """))
-        # Reset les look_ids
-        result1 = conn.execute(text("""
-            UPDATE crossings SET user1_look_id = NULL
-            WHERE user1_look_id IS NOT NULL
-        """))
-        result2 = conn.execute(text("""
-            UPDATE crossings SET user2_look_id = NULL
-            WHERE user2_look_id IS NOT NULL
-        """))
+@app.get("/purge-pings")
+async def purge_pings(request: Request, _: bool = Depends(verify_admin_key)):
+    """Lancer tout de suite la compaction / purge des location_pings"""
+    return await asyncio.to_thread(run_ping_retention)
+
+@app.get("/cache-stats")
+async def cache_stats(request: Request, _: bool = Depends(verify_admin_key)):
+    """Compteurs hits/misses des caches en memoire"""
+    from app.core.auth_cache import auth_cache
+    from app.core.relationships import relationship_cache
+    from app.core.photo_cache import photo_cache
+    from app.core.ranking import popularity_ranking
     return {
-        "duplicates_removed": result_dedup.rowcount,
-        "cleaned_user1_looks": result1.rowcount,
-        "cleaned_user2_looks": result2.rowcount
+        "auth": auth_cache.stats(),
+        "relationships": relationship_cache.stats(),
+        "photos": photo_cache.stats(),
+        "discover_ranking": popularity_ranking.stats(),
     }
 
+@app.get("/db-stats")
+async def db_stats(request: Request, _: bool = Depends(verify_admin_key)):
+    """Etat des pools de connexions et de la replica"""
+    from app.core.database import get_pool_stats
+    return get_pool_stats()
+
 @app.get("/debug-crossings")
 async def debug_crossings(request: Request, _: bool = Depends(verify_admin_key)):
     """Debug: voir les croisements recents, pings et looks"""
@@ -1,5 +1,7 @@
 from .user import User, BlockedUser, Follow
-from .look import Look, LookPhoto, LookItem, LookLike, LookView, SavedLook
-from .location import LocationPing, Crossing, CrossingLike, SavedCrossing
+from .look import Look, LookPhoto, LookItem, LookLike, LookView, SavedLook, TimelineEntry
+from .location import LocationPing, Crossing, CrossingFeedEntry, CrossingLike, SavedCrossing
 from .report import Report
 from .notification import Notification
+from .geocode import GeocodeCache
+from .job import JobWatermark
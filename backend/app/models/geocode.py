@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from app.core.database import Base
+
+
+class GeocodeCache(Base):
+    """Cache persistant du reverse geocoding, une entree par zone 50m x 50m"""
+    __tablename__ = "geocode_cache"
+
+    zone_id = Column(String, primary_key=True)
+    location_name = Column(String, nullable=False)
+    resolved_at = Column(DateTime, default=datetime.utcnow, nullable=False)
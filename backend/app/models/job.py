@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, DateTime
+from app.core.database import Base
+
+
+class JobWatermark(Base):
+    """Avancement persistant des jobs periodiques (reprise apres redemarrage)"""
+    __tablename__ = "job_watermarks"
+
+    job = Column(String, primary_key=True)
+    until = Column(DateTime, nullable=False)  # Fin de la derniere plage traitee
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, DateTime, ForeignKey, Float, UniqueConstraint, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -6,23 +6,34 @@ from app.core.database import Base
 class LocationPing(Base):
     """Position GPS d'un utilisateur a un moment donne"""
     __tablename__ = "location_pings"
+    __table_args__ = (
+        Index("ix_location_pings_cell_timestamp", "cell_id", "timestamp"),
+        Index("ix_location_pings_timestamp", "timestamp"),
+        # Pings en attente du worker (reprise au demarrage), index partiel
+        Index("ix_location_pings_pending", "timestamp",
+              postgresql_where=text("detection_pending"), sqlite_where=text("detection_pending")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
-    zone_id = Column(String, index=True, nullable=False)  # Zone 50mx50m
+    zone_id = Column(String, nullable=False)  # Zone 50mx50m "lat:lon" (affichage, geocoding)
+    cell_id = Column(BigInteger, nullable=True)  # Meme zone en code de Morton 64 bits (requetes)
     accuracy = Column(Float, nullable=True)  # Precision en metres
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Insere par l'endpoint, detection pas encore faite par le worker
+    detection_pending = Column(Boolean, default=False, server_default=text("false"), nullable=False)
 
     # Relations
     user = relationship("User", back_populates="location_pings")
 
 
 class Crossing(Base):
-    """Croisement entre deux utilisateurs dans la meme zone"""
+    """Croisement entre deux utilisateurs dans la meme zone (user1_id < user2_id)"""
     __tablename__ = "crossings"
     __table_args__ = (
+        UniqueConstraint("user1_id", "user2_id", "time_bucket", name="uq_crossing_pair_bucket"),
         Index("ix_crossings_users", "user1_id", "user2_id"),
         Index("ix_crossings_crossed_at", "crossed_at"),
     )
@@ -32,7 +43,8 @@ class Crossing(Base):
     user2_id = Column(Integer, ForeignKey("users.id"), nullable=False)
 
     # Zone du croisement
-    zone_id = Column(String, index=True, nullable=False)
+    zone_id = Column(String, nullable=False)
+    cell_id = Column(BigInteger, index=True, nullable=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
     location_name = Column(String, nullable=True)  # Nom du lieu (optionnel)
@@ -42,6 +54,7 @@ class Crossing(Base):
     user2_look_id = Column(Integer, ForeignKey("looks.id"), nullable=True)
 
     crossed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    time_bucket = Column(Integer, nullable=False)  # Heure du croisement (dedup par paire, NULL echapperait a l'index unique)
 
     # Indicateurs de visibilite
     user1_viewed = Column(DateTime, nullable=True)
@@ -56,6 +69,27 @@ class Crossing(Base):
     saves = relationship("SavedCrossing", back_populates="crossing", cascade="all, delete-orphan")
 
 
+class CrossingFeedEntry(Base):
+    """
+    Fil materialise des croisements: un look d'un utilisateur croise dans les
+    dernieres 24h, avec le croisement le plus recent de la paire.
+    """
+    __tablename__ = "crossing_feed"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "look_id", name="uq_crossing_feed_look"),
+        Index("ix_crossing_feed_owner_page", "owner_id", "crossed_at", "look_id"),
+        Index("ix_crossing_feed_pair", "owner_id", "other_user_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Proprietaire du fil
+    other_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    crossing_id = Column(Integer, ForeignKey("crossings.id"), nullable=False)
+    look_id = Column(Integer, ForeignKey("looks.id"), nullable=False)
+    crossed_at = Column(DateTime, nullable=False)
+    look_created_at = Column(DateTime, nullable=False)
+
+
 class CrossingLike(Base):
     """Like sur un croisement"""
     __tablename__ = "crossing_likes"
@@ -77,6 +111,7 @@ class SavedCrossing(Base):
     __tablename__ = "saved_crossings"
     __table_args__ = (
         UniqueConstraint("crossing_id", "user_id", name="uq_saved_crossing"),
+        Index("ix_saved_crossings_user_page", "user_id", "created_at", "id"),  # Pagination par curseur
     )
 
     id = Column(Integer, primary_key=True, index=True)
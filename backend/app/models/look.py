@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Date, UniqueConstraint, Index, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Date, UniqueConstraint, Index, Float, Boolean
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 from app.core.database import Base
@@ -8,6 +8,7 @@ class Look(Base):
     __table_args__ = (
         Index("ix_looks_user_date", "user_id", "look_date"),
         Index("ix_looks_created_at", "created_at"),
+        Index("ix_looks_fanout_date", "fanout_on_read", "look_date"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -28,6 +29,9 @@ class Look(Base):
     likes_count = Column(Integer, default=0)
     views_count = Column(Integer, default=0)
 
+    # Auteur tres suivi a la creation: pas pousse dans les timelines, lu a la lecture du fil
+    fanout_on_read = Column(Boolean, default=False, nullable=False)
+
     # Relations
     user = relationship("User", back_populates="looks")
     items = relationship("LookItem", back_populates="look", cascade="all, delete-orphan")
@@ -45,6 +49,12 @@ class LookPhoto(Base):
     photo_url = Column(String, nullable=False)
     position = Column(Integer, nullable=False, default=0)  # 0-based
 
+    # Placeholder calcule a l'upload (NULL pour les photos anterieures ou non decodables)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    blurhash = Column(String(64), nullable=True)
+    dominant_color = Column(String(7), nullable=True)  # "#rrggbb"
+
     # Relations
     look = relationship("Look", back_populates="photos")
 
@@ -108,6 +118,7 @@ class SavedLook(Base):
     __tablename__ = "saved_looks"
     __table_args__ = (
         UniqueConstraint("look_id", "user_id", name="uq_saved_look"),
+        Index("ix_saved_looks_user_page", "user_id", "created_at", "id"),  # Pagination par curseur
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -118,3 +129,24 @@ class SavedLook(Base):
     # Relations
     look = relationship("Look")
     user = relationship("User")
+
+
+class TimelineEntry(Base):
+    """
+    Timeline du fil des abonnements: un look du jour d'un utilisateur suivi,
+    pousse a la creation du look (fan-out a l'ecriture).
+    """
+    __tablename__ = "look_timelines"
+    __table_args__ = (
+        UniqueConstraint("owner_id", "look_id", name="uq_look_timeline_look"),
+        Index("ix_look_timelines_owner_page", "owner_id", "look_date", "look_created_at", "look_id"),
+        Index("ix_look_timelines_pair", "owner_id", "author_id"),
+        Index("ix_look_timelines_look", "look_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Proprietaire du fil
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    look_id = Column(Integer, ForeignKey("looks.id"), nullable=False)
+    look_date = Column(Date, nullable=False)
+    look_created_at = Column(DateTime, nullable=False)
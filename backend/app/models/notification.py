@@ -8,6 +8,7 @@ class Notification(Base):
     __tablename__ = "notifications"
     __table_args__ = (
         Index("ix_notifications_user_read_created", "user_id", "is_read", "created_at"),
+        Index("ix_notifications_user_page", "user_id", "created_at", "id"),  # Pagination par curseur
     )
 
     id = Column(Integer, primary_key=True, index=True)
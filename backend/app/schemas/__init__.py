@@ -3,10 +3,10 @@ from .user import (
     UserResponse, UserPublic, Token, TokenData
 )
 from .look import (
-    LookItemBase, LookItemCreate, LookItemResponse,
+    LookItemBase, LookItemCreate, LookItemResponse, LookPhotoResponse,
     LookBase, LookCreate, LookUpdate, LookResponse
 )
 from .location import (
-    LocationPingCreate, LocationPingResponse,
+    LocationPingCreate, TimestampedLocationPing, LocationPingBatch, LocationPingResponse,
     CrossingBase, CrossingResponse, CrossingWithDetails
 )
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, field_validator, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 class LocationPingCreate(BaseModel):
@@ -7,6 +7,13 @@ class LocationPingCreate(BaseModel):
     longitude: float = Field(..., ge=-180, le=180)
     accuracy: Optional[float] = Field(None, ge=0, le=10000)
 
+class TimestampedLocationPing(LocationPingCreate):
+    """Position bufferisee par le client, avec son propre horodatage"""
+    timestamp: datetime
+
+class LocationPingBatch(BaseModel):
+    pings: List[TimestampedLocationPing] = Field(..., min_length=1)
+
 class LocationPingResponse(LocationPingCreate):
     id: int
     user_id: int
@@ -49,6 +56,7 @@ class CrossingWithDetails(BaseModel):
     other_look_title: Optional[str] = None
     other_look_photo_url: Optional[str] = None
     other_look_photo_urls: list = []
+    other_look_photos: list = []  # [{photo_url, width, height, blurhash, dominant_color}]
     other_look_items: list = []
 
     # Stats du look
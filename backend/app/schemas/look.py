@@ -23,6 +23,14 @@ class LookItemResponse(LookItemBase):
     class Config:
         from_attributes = True
 
+class LookPhotoResponse(BaseModel):
+    """Photo d'un look et son placeholder (absent pour les anciennes photos)"""
+    photo_url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    blurhash: Optional[str] = None
+    dominant_color: Optional[str] = None
+
 class LookBase(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -44,6 +52,7 @@ class LookResponse(LookBase):
     user_id: int
     photo_url: str
     photo_urls: List[str] = []
+    photos: List[LookPhotoResponse] = []
     look_date: date
     created_at: datetime
     items: List[LookItemResponse] = []
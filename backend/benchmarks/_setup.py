@@ -0,0 +1,58 @@
+"""
+Environnement des benchmarks: base SQLite et dossiers temporaires, definis
+avant tout import de l'application (jamais la base de dev ou de prod).
+A importer en premier: `import _setup` depuis un script de ce dossier.
+"""
+
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+TMP_DIR = tempfile.mkdtemp(prefix="lookup-bench-")
+atexit.register(shutil.rmtree, TMP_DIR, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP_DIR}/bench.db"
+os.environ["DATABASE_REPLICA_URL"] = ""
+os.environ["UPLOAD_DIR"] = os.path.join(TMP_DIR, "uploads")
+os.environ["PHOTO_CACHE_DIR"] = os.path.join(TMP_DIR, "photo_cache")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-" + "x" * 32)
+os.environ["CROSSING_DETECTION_ASYNC"] = "false"
+os.environ["GEOCODING_BACKEND"] = "static"
+os.environ["PING_RETENTION_JOB_MINUTES"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(fn, repeat: int = 20) -> float:
+    """Duree mediane d'un appel a fn(), en millisecondes (un appel de chauffe)"""
+    fn()
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+def init_db():
+    """Creer les tables dans la base temporaire, retourne l'engine"""
+    from app.core.database import Base, engine
+    import app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def create_users(conn, count: int, prefix: str = "bench") -> list:
+    """Inserer count utilisateurs (sans hash de mot de passe reel), retourne leurs ids"""
+    from sqlalchemy import insert, select
+    from app.models import User
+
+    conn.execute(insert(User), [
+        {"email": f"{prefix}{i}@example.com", "username": f"{prefix}{i}", "hashed_password": "x"}
+        for i in range(count)
+    ])
+    return list(conn.execute(select(User.id).where(User.username.like(f"{prefix}%")).order_by(User.id)).scalars())
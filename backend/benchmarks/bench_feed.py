@@ -0,0 +1,108 @@
+"""
+Fil des abonnements (GET /looks/feed): timeline materialisee (look_timelines)
+contre l'ancienne lecture, liste des abonnements puis
+Look.user_id IN (...) AND look_date = aujourd'hui, selon le nombre de
+comptes suivis. Mesure aussi le cout du fan-out a la creation d'un look.
+Usage: python benchmarks/bench_feed.py [--authors 20000] [--history-days 30] [--following 100 1000 5000]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from _setup import create_users, init_db, timed
+
+from sqlalchemy import insert, select
+
+from app.api.pagination import paginate
+from app.core.database import SessionLocal
+from app.core.timelines import fan_out_look, feed_page_query, pull_authors_query
+from app.models import Follow, Look
+
+PAGE = 50
+POST_PROBABILITY = 0.3  # Auteurs ayant poste un look un jour donne
+
+
+def _old_feed(db, reader_id, today):
+    following_ids = db.execute(select(Follow.followed_id).where(
+        Follow.follower_id == reader_id, Follow.status == "accepted"
+    )).scalars().all()
+    return db.execute(select(Look.id, Look.created_at).where(
+        Look.user_id.in_(following_ids), Look.look_date == today
+    ).order_by(Look.created_at.desc(), Look.id.desc()).limit(PAGE)).all()
+
+
+def _timeline_feed(db, reader_id, today):
+    db.execute(pull_authors_query(today)).all()
+    query, columns = feed_page_query(reader_id, today)
+    return db.execute(paginate(query, columns, None, PAGE)).all()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--authors", type=int, default=20_000)
+    parser.add_argument("--history-days", type=int, default=30)
+    parser.add_argument("--following", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    engine = init_db()
+    rng = random.Random(0)
+    today = date.today()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        authors = create_users(conn, args.authors, prefix="author")
+        readers = create_users(conn, len(args.following), prefix="reader")
+        conn.execute(insert(Follow), [
+            {"follower_id": reader, "followed_id": author, "status": "accepted"}
+            for reader, count in zip(readers, args.following)
+            for author in rng.sample(authors, count)
+        ])
+        # Historique: les looks des jours precedents restent dans la table
+        for day in range(args.history_days, 0, -1):
+            conn.execute(insert(Look), [{
+                "user_id": author, "photo_url": "/uploads/x.webp", "look_date": today - timedelta(days=day),
+                "created_at": now - timedelta(days=day, seconds=i),
+            } for i, author in enumerate(authors) if rng.random() < POST_PROBABILITY])
+
+    # Looks du jour, pousses dans les timelines comme a la creation
+    db = SessionLocal()
+    fan_out_ms = []
+    for i, author in enumerate(authors):
+        if rng.random() >= POST_PROBABILITY:
+            continue
+        look = Look(user_id=author, photo_url="/uploads/x.webp", look_date=today, created_at=now - timedelta(seconds=i))
+        db.add(look)
+        db.flush()
+        started = time.perf_counter()
+        fan_out_look(db, look.id)
+        fan_out_ms.append((time.perf_counter() - started) * 1000)
+    db.commit()
+
+    looks = db.execute(select(Look.id).order_by(Look.id.desc()).limit(1)).scalar()
+    print(f"{args.authors} auteurs, {looks} looks sur {args.history_days + 1} jours, pages de {PAGE}")
+    print(f"fan-out a la creation: {sum(fan_out_ms) / len(fan_out_ms):.2f} ms en moyenne "
+          f"(0 a {len(readers)} abonnes par auteur)")
+    print(f"{'comptes suivis':>15} {'IN (...) ms':>12} {'timeline ms':>12}")
+    for reader, count in zip(readers, args.following):
+        assert [r.id for r in _old_feed(db, reader, today)] == [r.id for r in _timeline_feed(db, reader, today)]
+        old_ms = timed(lambda: _old_feed(db, reader, today))
+        new_ms = timed(lambda: _timeline_feed(db, reader, today))
+        print(f"{count:>15} {old_ms:>12.2f} {new_ms:>12.2f}")
+
+    # Auteur tres suivi, juste sous FEED_FANOUT_MAX_FOLLOWERS
+    fans = create_users(db.connection(), 5000, prefix="fan")
+    star = authors[0]
+    db.execute(insert(Follow), [{"follower_id": fan, "followed_id": star, "status": "accepted"} for fan in fans])
+    look = Look(user_id=star, photo_url="/uploads/x.webp", look_date=today, created_at=now)
+    db.add(look)
+    db.flush()
+    started = time.perf_counter()
+    followers = fan_out_look(db, look.id)
+    print(f"fan-out d'un look vers {followers} abonnes: {(time.perf_counter() - started) * 1000:.0f} ms")
+    db.rollback()
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
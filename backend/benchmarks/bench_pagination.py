@@ -0,0 +1,71 @@
+"""
+Pagination des listes: page N par offset (skip) contre curseur (keyset) sur
+les notifications d'un utilisateur, requete de GET /notifications servie par
+l'index ix_notifications_user_page (user_id, created_at, id).
+Usage: python benchmarks/bench_pagination.py [--rows 200000] [--limit 20] [--pages 1 100 1000 5000]
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from _setup import create_users, init_db, timed
+
+from sqlalchemy import insert, select
+
+from app.api.pagination import encode_cursor, paginate
+from app.models import Notification, User
+
+COLUMNS = (Notification.created_at, Notification.id)
+
+
+def _query(user_id):
+    return select(
+        Notification.id, Notification.type, Notification.look_id, Notification.is_read,
+        Notification.created_at, User.id.label("actor_id"), User.username, User.avatar_url,
+        User.full_name
+    ).join(User, User.id == Notification.actor_id).where(Notification.user_id == user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    engine = init_db()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        users = create_users(conn, 100)
+        reader = users[0]
+        # Notifications du lecteur et, entrelacees, celles des autres utilisateurs
+        for offset in range(0, 2 * args.rows, 50_000):
+            conn.execute(insert(Notification), [{
+                "user_id": reader if i % 2 == 0 else users[1 + i % 99],
+                "actor_id": users[1 + i % 99],
+                "type": "like",
+                "is_read": True,
+                "created_at": now - timedelta(seconds=i),
+            } for i in range(offset, min(offset + 50_000, 2 * args.rows))])
+
+    print(f"{args.rows} notifications du lecteur, pages de {args.limit}")
+    print(f"{'page':>6} {'offset ms':>10} {'curseur ms':>11}")
+    with engine.connect() as conn:
+        query = _query(reader)
+        for page in args.pages:
+            skip = (page - 1) * args.limit
+            if skip >= args.rows:
+                continue
+            offset_page = lambda: conn.execute(paginate(query, COLUMNS, None, args.limit, skip)).all()
+            cursor = None
+            if skip:
+                # Curseur de la page precedente (derniere ligne), comme X-Next-Cursor
+                last = conn.execute(paginate(query, COLUMNS, None, 1, skip - 1)).one()
+                cursor = encode_cursor((last.created_at, last.id))
+            keyset_page = lambda: conn.execute(paginate(query, COLUMNS, cursor, args.limit)).all()
+            assert [r.id for r in offset_page()] == [r.id for r in keyset_page()]
+            print(f"{page:>6} {timed(offset_page):>10.2f} {timed(keyset_page):>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
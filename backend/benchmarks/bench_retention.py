@@ -0,0 +1,116 @@
+"""
+Retention des location_pings: latence de la recherche SQL des pings voisins
+(detection sans index memoire) quand l'historique grandit, sans job de
+retention puis apres compaction et purge.
+Usage: python benchmarks/bench_retention.py [--users 100] [--ping-minutes 5] [--days 1 7 30 60]
+"""
+
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from _setup import init_db, timed
+
+from sqlalchemy import func, insert, select, text
+
+from app.core.config import settings
+from app.core.crossing_detection import _find_nearby_pings
+from app.core.database import SessionLocal
+from app.core.ping_index import IndexedPing
+from app.core.retention import run_ping_retention
+from app.core.zones import cell_id_to_zone_id, get_cell_id
+from app.models import LocationPing
+
+CENTER = (48.8566, 2.3522)
+AREA_METERS = 3000
+
+
+def _walk(rng, user_id, start, end, step):
+    """Pings d'un marcheur dans un carre de AREA_METERS autour de CENTER"""
+    lat = CENTER[0] + rng.uniform(-1, 1) * AREA_METERS / 2 / 111_320
+    lon = CENTER[1] + rng.uniform(-1, 1) * AREA_METERS / 2 / (111_320 * math.cos(math.radians(CENTER[0])))
+    t = start
+    while t < end:
+        lat += rng.gauss(0, 0.0003)
+        lon += rng.gauss(0, 0.0003)
+        cell_id = get_cell_id(lat, lon)
+        yield {
+            "user_id": user_id, "latitude": lat, "longitude": lon, "cell_id": cell_id,
+            "zone_id": cell_id_to_zone_id(cell_id), "timestamp": t,
+        }
+        t += step
+
+
+def _fill(engine, users, start, end, step, seed):
+    rng = random.Random(seed)
+    rows = []
+    with engine.begin() as conn:
+        for user_id in users:
+            rows.extend(_walk(rng, user_id, start, end, step))
+            if len(rows) >= 50_000:
+                conn.execute(insert(LocationPing), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(LocationPing), rows)
+
+
+def _table_stats(engine):
+    with engine.connect() as conn:
+        count = conn.execute(select(func.count()).select_from(LocationPing)).scalar()
+        pages = conn.execute(text("PRAGMA page_count")).scalar() * conn.execute(text("PRAGMA page_size")).scalar()
+    return count, pages / 1024 / 1024
+
+
+def _query_latency(probes):
+    db = SessionLocal()
+    try:
+        return timed(lambda: [_find_nearby_pings(db, 0, [p]) for p in probes], repeat=10) / len(probes)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--ping-minutes", type=int, default=5)
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30, 60])
+    args = parser.parse_args()
+
+    # Recherche SQL seulement: l'index memoire masquerait la table
+    settings.PING_INDEX_ENABLED = False
+    engine = init_db()
+    now = datetime.utcnow().replace(microsecond=0)
+    step = timedelta(minutes=args.ping_minutes)
+    users = list(range(1, args.users + 1))
+    rng = random.Random(0)
+    probes = [
+        IndexedPing(0, p["cell_id"], p["latitude"], p["longitude"], now - timedelta(minutes=1))
+        for p in (next(_walk(rng, 0, now, now + step, step)) for _ in range(50))
+    ]
+
+    print(f"{args.users} utilisateurs, 1 ping / {args.ping_minutes} min, "
+          f"hot window {settings.PING_HOT_WINDOW_HOURS}h, compaction {settings.PING_COMPACTION_INTERVAL_MINUTES} min, "
+          f"retention {settings.PING_RETENTION_DAYS} j")
+    print(f"{'historique':>12} {'lignes':>10} {'taille Mo':>10} {'requete ms':>11}")
+    filled_since = now
+    for days in sorted(args.days):
+        start = now - timedelta(days=days)
+        _fill(engine, users, start, filled_since, step, seed=days)
+        filled_since = start
+        count, size = _table_stats(engine)
+        print(f"{days:>10} j {count:>10} {size:>10.1f} {_query_latency(probes):>11.3f}")
+
+    started = time.perf_counter()
+    stats = run_ping_retention(now)
+    elapsed = time.perf_counter() - started
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+    count, size = _table_stats(engine)
+    print(f"{'retention':>12} {count:>10} {size:>10.1f} {_query_latency(probes):>11.3f}")
+    print(f"job: {stats['purged']} purges, {stats['compacted']} compactes en {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Recherche de /looks/discover?q=: index plein texte look_search (FTS5 en
+SQLite) contre l'ancien filtre Look.title ILIKE '%q%', sur N looks
+synthetiques (titre, description, 2 items avec marque, produit, couleur).
+Les mots courants correspondent a 10-30% des looks: le classement par
+pertinence porte alors sur tous ces looks; les mots rares sont servis par
+l'index seul.
+Meme requete que l'endpoint: ids et cles de tri, 20 premiers resultats.
+Usage: python benchmarks/bench_search.py [--looks 1000000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from _setup import create_users, init_db, timed
+
+from sqlalchemy import insert, select
+
+from app.core.search import ensure_search_index, rebuild_search_index, search_matches
+from app.models import Look, LookItem
+
+BRANDS = ["Zara", "Uniqlo", "Arket", "Levis", "Nike", "Adidas", "Sezane", "Cos", "Mango", "Patagonia"]
+PRODUCTS = ["robe", "jean", "veste", "chemise", "pull", "manteau", "baskets", "bottines", "jupe", "short"]
+COLORS = ["noir", "blanc", "bleu", "rouge", "vert", "beige", "camel", "gris", "rose", "jaune"]
+WORDS = ["ete", "hiver", "bureau", "week", "soiree", "plage", "ville", "sport", "vintage", "casual"]
+# Longue traine des descriptions: mot0 (frequent) ... mot4999 (rare)
+RARE_WORDS = [f"mot{i}" for i in range(5000)]
+QUERIES = ["robe", "zara robe", "camel manteau", "vint", "uniqlo pull gris", "mot120", "introuvable"]
+PAGE = 20
+
+
+def _fill(conn, users, count, rng):
+    now = datetime.utcnow()
+    for offset in range(0, count, 20_000):
+        batch = range(offset, min(offset + 20_000, count))
+        looks = [{
+            "id": i + 1,
+            "user_id": rng.choice(users),
+            "title": f"{rng.choice(PRODUCTS)} {rng.choice(COLORS)} {rng.choice(WORDS)}",
+            "description": " ".join(rng.sample(WORDS, 2) + [RARE_WORDS[int(rng.paretovariate(1.2)) % len(RARE_WORDS)]]),
+            "photo_url": "/uploads/x.webp",
+            "look_date": (now - timedelta(days=i % 365)).date(),
+            "created_at": now - timedelta(minutes=i),
+            "likes_count": rng.randint(0, 500),
+        } for i in batch]
+        conn.execute(insert(Look), looks)
+        conn.execute(insert(LookItem), [{
+            "look_id": look["id"], "category": "top", "brand": rng.choice(BRANDS),
+            "product_name": rng.choice(PRODUCTS), "color": rng.choice(COLORS),
+        } for look in looks for _ in range(2)])
+
+
+def _fts_query(q):
+    matches = search_matches("sqlite", q)
+    return select(Look.id, Look.likes_count, Look.created_at, matches.c.rank).join(
+        matches, matches.c.look_id == Look.id
+    ).order_by(matches.c.rank.desc(), Look.likes_count.desc(), Look.created_at.desc(), Look.id.desc()).limit(PAGE)
+
+
+def _ilike_query(q):
+    return select(Look.id, Look.likes_count, Look.created_at).where(
+        Look.title.ilike(f"%{q}%")
+    ).order_by(Look.likes_count.desc(), Look.created_at.desc(), Look.id.desc()).limit(PAGE)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--looks", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    engine = init_db()
+    rng = random.Random(0)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        users = create_users(conn, 1000)
+        _fill(conn, users, args.looks, rng)
+    filled = time.perf_counter() - started
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        ensure_search_index(conn)
+        rebuild_search_index(conn)
+    indexed = time.perf_counter() - started
+    print(f"{args.looks} looks inseres en {filled:.0f} s, indexes en {indexed:.0f} s")
+
+    print(f"{'requete':>18} {'FTS5 ms':>9} {'resultats':>10} {'ILIKE ms':>9} {'resultats':>10}")
+    with engine.connect() as conn:
+        for q in QUERIES:
+            fts = len(conn.execute(_fts_query(q)).all())
+            fts_ms = timed(lambda: conn.execute(_fts_query(q)).all(), repeat=5)
+            ilike = len(conn.execute(_ilike_query(q)).all())
+            ilike_ms = timed(lambda: conn.execute(_ilike_query(q)).all(), repeat=5)
+            print(f"{q!r:>18} {fts_ms:>9.1f} {fts:>10} {ilike_ms:>9.1f} {ilike:>10}")
+
+
+if __name__ == "__main__":
+    main()
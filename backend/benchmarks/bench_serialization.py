@@ -0,0 +1,110 @@
+"""
+Encodage des pages des listes chaudes (50 elements): read models encodes par
+orjson (FastJSONResponse) contre le chemin precedent de FastAPI, reproduit
+avec ses propres fonctions: validation response_model (serialize_response)
+ou jsonable_encoder des dicts construits a la main, puis JSONResponse.
+Mesure l'encodage seul, a partir des memes donnees deja chargees.
+Usage: python benchmarks/bench_serialization.py [--page 50]
+"""
+
+import argparse
+import asyncio
+from dataclasses import asdict
+from datetime import date, datetime, timedelta
+from typing import List
+
+from _setup import timed
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.api.responses import FastJSONResponse
+from app.core.read_models import (
+    CrossingCard, ItemRecord, LookCard, NotificationActorRecord, NotificationCard, PhotoRecord, UserSummary,
+)
+from app.schemas.location import CrossingWithDetails
+from app.schemas.notification import NotificationResponse
+
+
+def _photos(i):
+    return [
+        PhotoRecord(f"/api/photos/{i:08x}-{n}.webp", 1080, 1440, "LEHV6nWB2yk8pyo0adR*.7kCMdnj", "#a1b2c3")
+        for n in range(3)
+    ]
+
+
+def _items(i):
+    return [ItemRecord("top", "Zara", f"Produit {i}-{n}", "noir", f"/api/photos/item-{i}-{n}.webp") for n in range(4)]
+
+
+def _look_cards(size):
+    now = datetime.utcnow()
+    return [LookCard(
+        id=i, title=f"Look {i}", photo_url=f"/api/photos/{i:08x}-0.webp",
+        photo_urls=[p.photo_url for p in _photos(i)], photos=_photos(i),
+        look_date=date.today(), created_at=now - timedelta(minutes=i), likes_count=i, views_count=3 * i,
+        user=UserSummary(i, f"user{i}", f"/api/photos/avatar-{i}.webp"), items=_items(i),
+    ) for i in range(size)]
+
+
+def _crossing_cards(size):
+    now = datetime.utcnow()
+    return [CrossingCard(
+        id=i, crossed_at=now - timedelta(minutes=i), latitude=48.85, longitude=2.35,
+        location_name="Rue de Rivoli, Paris", other_user_id=i, other_username=f"user{i}",
+        other_avatar_url=None, other_look_id=i, other_look_title=f"Look {i}",
+        other_look_photo_url=f"/api/photos/{i:08x}-0.webp",
+        other_look_photo_urls=[p.photo_url for p in _photos(i)],
+        other_look_photos=[asdict(p) for p in _photos(i)],
+        other_look_items=[asdict(item) for item in _items(i)],
+        views_count=i, likes_count=i,
+    ) for i in range(size)]
+
+
+def _notification_cards(size):
+    now = datetime.utcnow()
+    return [NotificationCard(
+        id=i, type="like", actor=NotificationActorRecord(i, f"user{i}", None, f"User {i}"),
+        look_id=i, is_read=False, created_at=now - timedelta(minutes=i),
+    ) for i in range(size)]
+
+
+# Une seule boucle: pas de creation de boucle dans la mesure
+_loop = asyncio.new_event_loop()
+
+
+def _fastapi_path(field, content):
+    """response_model (ou jsonable_encoder si field est None) puis JSONResponse"""
+    return JSONResponse(_loop.run_until_complete(serialize_response(field=field, response_content=content))).body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page", type=int, default=50)
+    args = parser.parse_args()
+
+    looks = _look_cards(args.page)
+    look_dicts = [asdict(card) for card in looks]
+    crossings = _crossing_cards(args.page)
+    crossing_models = [CrossingWithDetails(**asdict(card)) for card in crossings]
+    crossing_field = create_model_field("Response_crossings", List[CrossingWithDetails], mode="serialization")
+    notifications = _notification_cards(args.page)
+    notification_models = [NotificationResponse(**asdict(card)) for card in notifications]
+    notification_field = create_model_field("Response_notifications", List[NotificationResponse], mode="serialization")
+
+    cases = [
+        ("looks (discover, fil)", lambda: _fastapi_path(None, look_dicts), lambda: FastJSONResponse(looks).body),
+        ("croisements", lambda: _fastapi_path(crossing_field, crossing_models), lambda: FastJSONResponse(crossings).body),
+        ("notifications", lambda: _fastapi_path(notification_field, notification_models),
+         lambda: FastJSONResponse(notifications).body),
+    ]
+    print(f"pages de {args.page} elements")
+    print(f"{'liste':>22} {'FastAPI ms':>11} {'orjson ms':>10} {'gain':>6}")
+    for name, before, after in cases:
+        before_ms, after_ms = timed(before, repeat=300), timed(after, repeat=300)
+        print(f"{name:>22} {before_ms:>11.3f} {after_ms:>10.3f} {before_ms / after_ms:>5.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Detection des croisements sur des traces de marche synthetiques: par zones
+adjacentes seulement (CROSSING_TRAJECTORY_ENABLED=False) contre trajectoires
+interpolees, selon l'intervalle entre deux pings.
+Chaque paire marche 20 min en lignes perpendiculaires a 1.3 m/s: les paires
+"croisees" passent au meme point a +/-30 s pres (vrais croisements), les
+paires "ecartees" se depassent en sens inverse sur des lignes paralleles a
+200 m (pas de croisement attendu).
+Les pings sont rejoues dans l'ordre, comme /ping: detection puis ajout a
+l'index memoire, dont la fenetre est elargie pour couvrir le rejeu.
+Usage: python benchmarks/bench_trajectory.py [--pairs 50] [--intervals 1 2 5 10]
+"""
+
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from _setup import create_users, init_db
+
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.core.crossing_detection import detect_crossings
+from app.core.database import SessionLocal
+from app.core.ping_index import IndexedPing, ping_index
+from app.core.zones import get_cell_id
+from app.models import Crossing, CrossingFeedEntry
+
+SPEED = 1.3  # m/s
+WALK_MINUTES = 20
+MISS_OFFSET_METERS = 200
+METERS_PER_DEGREE = 111_320
+
+
+def _walker(user_id, origin, direction, crossing_at, start, interval, phase):
+    """Pings d'un marcheur en ligne droite, au point origin a crossing_at"""
+    lat0, lon0 = origin
+    meters_per_lon = METERS_PER_DEGREE * math.cos(math.radians(lat0))
+    pings = []
+    t = start + phase
+    while t < start + timedelta(minutes=WALK_MINUTES):
+        distance = SPEED * (t - crossing_at).total_seconds()
+        lat = lat0 + direction[1] * distance / METERS_PER_DEGREE
+        lon = lon0 + direction[0] * distance / meters_per_lon
+        pings.append(IndexedPing(user_id, get_cell_id(lat, lon), lat, lon, t))
+        t += interval
+    return pings
+
+
+def _scenarios(rng, users, pairs, interval, start):
+    """(pings de tous les marcheurs, paires croisees, paires ecartees)"""
+    pings, crossed, missed = [], set(), set()
+    crossing_at = start + timedelta(minutes=WALK_MINUTES / 2)
+    for index in range(2 * pairs):
+        a, b = users[2 * index], users[2 * index + 1]
+        # Paires eloignees de plusieurs km: pas d'interference entre elles
+        lat, lon = 45.0 + index // 20 * 0.05, 2.0 + index % 20 * 0.07
+        miss = index >= pairs
+        if miss:
+            b_origin, b_direction = (lat + MISS_OFFSET_METERS / METERS_PER_DEGREE, lon), (-1, 0)
+        else:
+            b_origin, b_direction = (lat, lon), (0, 1)
+        b_crossing_at = crossing_at + timedelta(seconds=rng.uniform(-30, 30))
+        pings += _walker(a, (lat, lon), (1, 0), crossing_at, start, interval, interval * rng.random())
+        pings += _walker(b, b_origin, b_direction, b_crossing_at, start, interval, interval * rng.random())
+        (missed if miss else crossed).add((a, b))
+    return sorted(pings, key=lambda p: p.timestamp), crossed, missed
+
+
+def _run(pings):
+    """Rejouer les pings; retourne (paires detectees, CPU en ms par ping)"""
+    db = SessionLocal()
+    db.execute(delete(CrossingFeedEntry))
+    db.execute(delete(Crossing))
+    db.commit()
+    ping_index.load([])
+    cpu = 0.0
+    try:
+        for ping in pings:
+            started = time.process_time()
+            detect_crossings(db, ping.user_id, [ping])
+            db.commit()
+            cpu += time.process_time() - started
+            ping_index.add(ping)
+        detected = {tuple(row) for row in db.execute(select(Crossing.user1_id, Crossing.user2_id))}
+    finally:
+        db.close()
+    return detected, cpu * 1000 / len(pings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=50)
+    parser.add_argument("--intervals", type=int, nargs="+", default=[1, 2, 5, 10])
+    args = parser.parse_args()
+
+    engine = init_db()
+    with engine.begin() as conn:
+        users = create_users(conn, 4 * args.pairs)
+    ping_index.window = timedelta(hours=2)
+    start = datetime.utcnow() - timedelta(minutes=WALK_MINUTES + 5)
+
+    print(f"{args.pairs} paires croisees, {args.pairs} paires a {MISS_OFFSET_METERS} m, "
+          f"distance max {settings.CROSSING_DISTANCE_METERS:.0f} m, fenetre {settings.CROSSING_TIME_WINDOW_MINUTES} min")
+    print(f"{'ping':>7} {'mode':>11} {'rappel':>7} {'faux +':>7} {'CPU ms/ping':>12}")
+    for minutes in args.intervals:
+        pings, crossed, missed = _scenarios(random.Random(minutes), users, args.pairs, timedelta(minutes=minutes), start)
+        for mode, trajectory in (("zones", False), ("trajectoire", True)):
+            settings.CROSSING_TRAJECTORY_ENABLED = trajectory
+            detected, cpu = _run(pings)
+            recall = len(crossed & detected) / len(crossed)
+            false_positives = len(missed & detected)
+            print(f"{minutes:>5} m {mode:>11} {recall:>7.0%} {false_positives:>7} {cpu:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
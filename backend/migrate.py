@@ -8,8 +8,13 @@ import sys
 sys.path.insert(0, os.path.dirname(__file__))
 
 from sqlalchemy import text, inspect
-from app.core.database import engine, Base
+from app.core.database import engine, Base, SessionLocal
 from app.models import *  # Import all models
+from app.core.zones import backfill_cell_ids
+from app.core.crossing_detection import normalize_crossing_pairs
+from app.core.crossing_feed import rebuild_all_feeds
+from app.core.search import ensure_search_index, rebuild_search_index
+from app.core.timelines import rebuild_timelines
 
 def migrate():
     inspector = inspect(engine)
@@ -44,9 +49,51 @@ def migrate():
             if table_name not in existing_tables:
                 print(f"Creating table {table_name}...")
 
-        # create_all ne touche pas les tables existantes
+        # Cell id entier des zones (code de Morton)
+        for table in ("location_pings", "crossings"):
+            if table in existing_tables and "cell_id" not in [c["name"] for c in inspector.get_columns(table)]:
+                print(f"Adding cell_id to {table}...")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN cell_id BIGINT"))
+
+        # Pings en attente de detection par le worker
+        if "location_pings" in existing_tables and "detection_pending" not in [c["name"] for c in inspector.get_columns("location_pings")]:
+            print("Adding detection_pending to location_pings...")
+            conn.execute(text("ALTER TABLE location_pings ADD COLUMN detection_pending BOOLEAN NOT NULL DEFAULT FALSE"))
+
+        # Intervalle de dedup des croisements (contrainte unique par paire)
+        if "crossings" in existing_tables and "time_bucket" not in [c["name"] for c in inspector.get_columns("crossings")]:
+            print("Adding time_bucket to crossings...")
+            conn.execute(text("ALTER TABLE crossings ADD COLUMN time_bucket INTEGER"))
+
+        # Placeholders des photos (BlurHash, couleur dominante, dimensions)
+        if "look_photos" in existing_tables:
+            look_photo_columns = [c["name"] for c in inspector.get_columns("look_photos")]
+            for col, sql in [
+                ("width", "ALTER TABLE look_photos ADD COLUMN width INTEGER"),
+                ("height", "ALTER TABLE look_photos ADD COLUMN height INTEGER"),
+                ("blurhash", "ALTER TABLE look_photos ADD COLUMN blurhash VARCHAR(64)"),
+                ("dominant_color", "ALTER TABLE look_photos ADD COLUMN dominant_color VARCHAR(7)"),
+            ]:
+                if col not in look_photo_columns:
+                    print(f"Adding {col} to look_photos...")
+                    conn.execute(text(sql))
+
+        # Looks lus a la lecture du fil (auteurs tres suivis)
+        if "looks" in existing_tables and "fanout_on_read" not in [c["name"] for c in inspector.get_columns("looks")]:
+            print("Adding fanout_on_read to looks...")
+            conn.execute(text("ALTER TABLE looks ADD COLUMN fanout_on_read BOOLEAN NOT NULL DEFAULT FALSE"))
+
+        # create_all ne touche pas les tables existantes (cree look_timelines)
         Base.metadata.create_all(bind=engine)
 
+        # Paires canoniques (user1_id < user2_id) et suppression des doublons
+        removed = normalize_crossing_pairs(conn)
+        print(f"Normalized crossing pairs, {removed} duplicates removed")
+        # time_bucket rempli: NOT NULL (SQLite ne modifie pas une colonne existante)
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("ALTER TABLE crossings ALTER COLUMN time_bucket SET NOT NULL"))
+            print("crossings.time_bucket NOT NULL OK")
+
         # 3. Ajouter les contraintes uniques (ignore si existe deja)
         constraints = [
             ("uq_look_like", "look_likes", "look_id, user_id"),
@@ -68,12 +115,25 @@ def migrate():
                     else:
                         print(f"Warning adding {name}: {e}")
 
+        # Dedup des croisements (ON CONFLICT): index unique, ADD CONSTRAINT n'existe pas en SQLite
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_crossing_pair_bucket ON crossings (user1_id, user2_id, time_bucket)"
+        ))
+        print("Index uq_crossing_pair_bucket OK")
+
         # 4. Ajouter les indexes manquants
         indexes = [
             ("ix_looks_user_date", "looks", "user_id, look_date"),
             ("ix_looks_created_at", "looks", "created_at"),
             ("ix_crossings_users", "crossings", "user1_id, user2_id"),
             ("ix_crossings_crossed_at", "crossings", "crossed_at"),
+            ("ix_location_pings_cell_timestamp", "location_pings", "cell_id, timestamp"),
+            ("ix_location_pings_timestamp", "location_pings", "timestamp"),
+            ("ix_crossings_cell_id", "crossings", "cell_id"),
+            ("ix_notifications_user_page", "notifications", "user_id, created_at, id"),
+            ("ix_saved_looks_user_page", "saved_looks", "user_id, created_at, id"),
+            ("ix_saved_crossings_user_page", "saved_crossings", "user_id, created_at, id"),
+            ("ix_looks_fanout_date", "looks", "fanout_on_read, look_date"),
         ]
         for name, table, columns in indexes:
             try:
@@ -81,6 +141,42 @@ def migrate():
                 print(f"Index {name} OK")
             except Exception as e:
                 print(f"Warning index {name}: {e}")
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_location_pings_pending ON location_pings (timestamp) WHERE detection_pending"
+        ))
+        print("Index ix_location_pings_pending OK")
+
+        # Index de recherche plein texte des looks (FTS5 en SQLite, GIN en PostgreSQL)
+        if ensure_search_index(conn):
+            print("Created look_search")
+        count = rebuild_search_index(conn)
+        print(f"Indexed {count} looks for search")
+
+        # 5. Remplir cell_id a partir de zone_id, puis retirer les index sur zone_id
+        for table in ("location_pings", "crossings"):
+            count = backfill_cell_ids(conn, table)
+            print(f"Backfilled cell_id on {count} {table} rows")
+        for name in ("ix_location_pings_zone_timestamp", "ix_location_pings_zone_id", "ix_crossings_zone_id"):
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            print(f"Dropped index {name}")
+
+    # 6. Construire le fil des croisements des dernieres 24h
+    db = SessionLocal()
+    try:
+        rebuild_all_feeds(db)
+        db.commit()
+        print("Crossing feed rebuilt")
+    finally:
+        db.close()
+
+    # 7. Construire les timelines du fil des abonnements (looks du jour)
+    db = SessionLocal()
+    try:
+        count = rebuild_timelines(db)
+        db.commit()
+        print(f"Look timelines rebuilt ({count} looks)")
+    finally:
+        db.close()
 
     print("Migration done!")
 
@@ -0,0 +1,49 @@
+"""
+Configuration des tests: base SQLite et dossier d'uploads temporaires,
+definis avant tout import de l'application.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="lookup-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp, "uploads")
+os.environ["PHOTO_CACHE_DIR"] = os.path.join(_tmp, "photo_cache")
+os.environ.setdefault("SECRET_KEY", "test-secret-key-" + "x" * 32)
+# Detection dans la requete et geocodage hors ligne: tests deterministes
+os.environ["CROSSING_DETECTION_ASYNC"] = "false"
+os.environ["GEOCODING_BACKEND"] = "static"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Client de l'app (lifespan lance), sans limites de debit"""
+    from fastapi.testclient import TestClient
+    from app.api.endpoints import auth, crossings
+    from app.main import app
+
+    crossings.limiter.enabled = False
+    auth.limiter.enabled = False
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def login(client):
+    """login(username) -> headers d'un nouvel utilisateur inscrit et connecte"""
+    def _login(username):
+        email = f"{username}@example.com"
+        response = client.post("/api/auth/register", json={
+            "email": email, "username": username, "password": "Password123!"
+        })
+        assert response.status_code == 201, response.text
+        response = client.post("/api/auth/login", json={"email": email, "password": "Password123!"})
+        client.cookies.clear()
+        return {"Authorization": "Bearer " + response.json()["access_token"]}
+    return _login
@@ -0,0 +1,54 @@
+"""Dedup des croisements: une paire au plus par intervalle (uq_crossing_pair_bucket)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.crossing_detection import CROSSING_DEDUP_SECONDS, crossing_time_bucket, insert_crossings
+from app.core.database import Base, SessionLocal, engine
+from app.models import Crossing
+
+USER1_ID, USER2_ID = 9101, 9102
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.execute(delete(Crossing).where(Crossing.user1_id == USER1_ID))
+    session.commit()
+    session.close()
+
+
+def _row(crossed_at, time_bucket="auto"):
+    return {
+        "user1_id": USER1_ID, "user2_id": USER2_ID, "zone_id": "0:0", "cell_id": 0,
+        "latitude": 0.0, "longitude": 0.0, "crossed_at": crossed_at,
+        "time_bucket": crossing_time_bucket(crossed_at) if time_bucket == "auto" else time_bucket,
+    }
+
+
+def _count(db):
+    return db.scalar(select(func.count()).where(Crossing.user1_id == USER1_ID, Crossing.user2_id == USER2_ID))
+
+
+def test_repeated_pair_in_the_same_interval_is_inserted_once(db):
+    start = datetime(2026, 1, 1, 10, 0)
+    assert insert_crossings(db, [_row(start)]) == {(USER1_ID, USER2_ID)}
+    assert insert_crossings(db, [_row(start + timedelta(minutes=20))]) == set()
+    db.commit()
+    assert _count(db) == 1
+
+    later = start + timedelta(seconds=CROSSING_DEDUP_SECONDS)
+    assert insert_crossings(db, [_row(later)]) == {(USER1_ID, USER2_ID)}
+    db.commit()
+    assert _count(db) == 2
+
+
+def test_crossing_without_time_bucket_is_rejected(db):
+    with pytest.raises(IntegrityError):
+        insert_crossings(db, [_row(datetime(2026, 1, 1, 10, 0), time_bucket=None)])
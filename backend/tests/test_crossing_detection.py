@@ -0,0 +1,36 @@
+"""Nombre de requetes SQL par ping constant quel que soit le nombre d'utilisateurs proches"""
+
+from sqlalchemy import event
+
+from app.core.database import engine
+
+
+def _ping_with_nearby_users(client, login, nearby: int, prefix: str, latitude: float) -> tuple:
+    """(requetes SQL, nouveaux croisements) du ping d'un utilisateur entoure de `nearby` autres"""
+    position = {"latitude": latitude, "longitude": 3.0}
+    for i in range(nearby):
+        response = client.post("/api/crossings/ping", json=position, headers=login(f"{prefix}{i:03d}"))
+        assert response.status_code == 200, response.text
+    headers = login(f"{prefix}me")
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.post("/api/crossings/ping", json=position, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert response.status_code == 200, response.text
+    return len(statements), response.json()["new_crossings"]
+
+
+def test_ping_query_count_is_constant(client, login):
+    # Positions eloignees: chaque groupe a ses propres zones
+    few_queries, few_crossings = _ping_with_nearby_users(client, login, 3, "few", 40.0)
+    many_queries, many_crossings = _ping_with_nearby_users(client, login, 40, "many", 41.0)
+
+    assert (few_crossings, many_crossings) == (3, 40)
+    assert few_queries == many_queries
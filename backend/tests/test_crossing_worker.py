@@ -0,0 +1,104 @@
+"""Detection des croisements dans le worker de fond: batchs de pings et reprise au demarrage"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, or_, select
+
+from app.core.config import settings
+from app.core.crossing_worker import crossing_worker
+from app.core.database import SessionLocal
+from app.core.ping_index import ping_index
+from app.core.zones import encode_cell, get_zone_id, get_zone_indexes
+from app.models import Crossing, LocationPing
+
+
+@pytest.fixture
+def async_detection(client, monkeypatch):
+    monkeypatch.setattr(settings, "CROSSING_DETECTION_ASYNC", True)
+
+
+def _user_id(client, headers):
+    return client.get("/api/auth/me", headers=headers).json()["id"]
+
+
+def _wait_for_worker(timeout=10.0):
+    """Attendre que plus aucun ping ne soit en attente de detection"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with SessionLocal() as db:
+            pending = db.scalar(select(func.count()).where(LocationPing.detection_pending.is_(True)))
+        if not pending:
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"{pending} pings toujours en attente")
+
+
+def _crossed(first_id, second_id):
+    user1_id, user2_id = sorted((first_id, second_id))
+    with SessionLocal() as db:
+        return db.scalar(select(func.count()).where(
+            Crossing.user1_id == user1_id, Crossing.user2_id == user2_id
+        )) > 0
+
+
+def test_batch_pings_are_detected_by_the_worker(client, login, async_detection):
+    walker, other = login("batchwalker"), login("batchother")
+    position = {"latitude": 42.0, "longitude": 3.0}
+    assert client.post("/api/crossings/ping", json=position, headers=other).json()["queued"]
+
+    now = datetime.utcnow()
+    response = client.post("/api/crossings/ping/batch", headers=walker, json={"pings": [
+        {**position, "timestamp": (now - timedelta(minutes=minutes)).isoformat()}
+        for minutes in (4, 2, 0)
+    ]})
+    assert response.status_code == 200, response.text
+    assert response.json()["queued"] and response.json()["pings_saved"] == 3
+
+    _wait_for_worker()
+    assert _crossed(_user_id(client, walker), _user_id(client, other))
+
+
+def test_pending_pings_are_caught_up_after_restart(client, login):
+    first, second = (_user_id(client, login(name)) for name in ("restartfirst", "restartsecond"))
+    latitude, longitude = 43.0, 3.0
+    now = datetime.utcnow()
+    # Pings inseres par l'endpoint, file perdue avant leur traitement
+    with SessionLocal() as db:
+        db.add_all([
+            LocationPing(
+                user_id=user_id, latitude=latitude, longitude=longitude,
+                zone_id=get_zone_id(latitude, longitude),
+                cell_id=encode_cell(*get_zone_indexes(latitude, longitude)),
+                timestamp=now - timedelta(seconds=seconds), detection_pending=True
+            )
+            for user_id, seconds in ((first, 30), (second, 10))
+        ])
+        db.commit()
+    ping_index.clear()
+
+    assert crossing_worker.catch_up() == 2
+    _wait_for_worker()
+    assert _crossed(first, second)
+
+
+def test_pending_pings_past_the_hot_window_are_dropped(client, login):
+    user_id = _user_id(client, login("restartstale"))
+    with SessionLocal() as db:
+        ping = LocationPing(
+            user_id=user_id, latitude=44.0, longitude=3.0, zone_id=get_zone_id(44.0, 3.0),
+            cell_id=encode_cell(*get_zone_indexes(44.0, 3.0)),
+            timestamp=datetime.utcnow() - timedelta(hours=settings.PING_HOT_WINDOW_HOURS + 1),
+            detection_pending=True
+        )
+        db.add(ping)
+        db.commit()
+        ping_id = ping.id
+
+    assert crossing_worker.catch_up() == 0
+    with SessionLocal() as db:
+        assert db.get(LocationPing, ping_id).detection_pending is False
+        assert not db.scalar(select(func.count()).where(
+            or_(Crossing.user1_id == user_id, Crossing.user2_id == user_id)
+        ))
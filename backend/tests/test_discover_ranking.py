@@ -0,0 +1,61 @@
+"""Pages de /looks/discover lues dans le classement precalcule"""
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.endpoints import looks
+from app.core import ranking
+from app.core.ranking import PERIODS, PopularityRanking
+
+LOOK_IDS = list(range(100, 350))
+
+
+@pytest.fixture
+def ranked(monkeypatch):
+    """Classement de LOOK_IDS pour toutes les periodes; ranked.rebuild() cree une nouvelle version"""
+    popularity = PopularityRanking()
+    monkeypatch.setattr(ranking, "compute_rankings", lambda db: {period: LOOK_IDS for period in PERIODS})
+    monkeypatch.setattr(looks, "popularity_ranking", popularity)
+    popularity.rebuild(None)
+    return popularity
+
+
+def test_pages_chain_through_the_cursor(ranked):
+    seen, cursor = [], None
+    while True:
+        page, cursor = looks._discover_ranked_page("all", cursor, 0, 100)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert seen == LOOK_IDS
+
+
+def test_limit_and_position_are_clamped(ranked):
+    page, cursor = looks._discover_ranked_page("all", None, 0, 1000)
+    assert page == LOOK_IDS[:100] and cursor == "1_100"
+    page, _ = looks._discover_ranked_page("all", None, 0, 0)
+    assert page == LOOK_IDS[:1]
+    # Position negative (skip ou curseur forge): debut du classement
+    assert looks._discover_ranked_page("all", None, -5, 3)[0] == LOOK_IDS[:3]
+    assert looks._discover_ranked_page("all", "1_-50", 0, 3)[0] == LOOK_IDS[:3]
+    # Au-dela de la fin: page vide, pas de curseur
+    assert looks._discover_ranked_page("all", "1_5000", 0, 20) == ([], None)
+
+
+def test_cursor_keeps_its_version_after_a_rebuild(ranked):
+    _, cursor = looks._discover_ranked_page("week", None, 0, 10)
+    ranked.rebuild(None)
+    page, next_cursor = looks._discover_ranked_page("week", cursor, 0, 10)
+    assert page == LOOK_IDS[10:20] and next_cursor == "1_20"
+
+    # Version plus gardee: meme position dans le classement courant
+    ranked.rebuild(None)
+    page, next_cursor = looks._discover_ranked_page("week", cursor, 0, 10)
+    assert page == LOOK_IDS[10:20] and next_cursor == "3_20"
+
+
+@pytest.mark.parametrize("cursor", ["abc", "1", "1_x", "_"])
+def test_invalid_cursor_is_rejected(ranked, cursor):
+    with pytest.raises(HTTPException) as exc:
+        looks._discover_ranked_page("all", cursor, 0, 20)
+    assert exc.value.status_code == 400
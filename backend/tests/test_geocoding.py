@@ -0,0 +1,71 @@
+"""Re-resolution periodique des croisements restes sans nom de lieu"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core import geocoding
+from app.core.database import Base, SessionLocal, engine
+from app.core.geocoding import GeocodingBackend, StaticGeocodingBackend, retry_unnamed_crossings, set_geocoding_backend
+from app.core.zones import get_zone_id, zone_id_to_cell_id
+from app.models import Crossing, GeocodeCache
+
+
+class FailingBackend(GeocodingBackend):
+    def __init__(self):
+        self.calls = 0
+
+    def reverse(self, latitude, longitude):
+        self.calls += 1
+        return None
+
+
+@pytest.fixture
+def unnamed_crossing():
+    Base.metadata.create_all(bind=engine)
+    zone_id = get_zone_id(45.0, 5.0)
+    db = SessionLocal()
+    crossing = Crossing(
+        user1_id=1, user2_id=2, zone_id=zone_id, cell_id=zone_id_to_cell_id(zone_id),
+        latitude=45.0, longitude=5.0, crossed_at=datetime.utcnow() - timedelta(hours=1), time_bucket=1
+    )
+    db.add(crossing)
+    db.commit()
+    yield crossing.id
+    db.query(Crossing).filter(Crossing.id == crossing.id).delete()
+    db.query(GeocodeCache).filter(GeocodeCache.zone_id == zone_id).delete()
+    db.commit()
+    db.close()
+    geocoding._retry_backoff.clear()
+    set_geocoding_backend(None)
+
+
+def _location_name(crossing_id):
+    db = SessionLocal()
+    try:
+        return db.get(Crossing, crossing_id).location_name
+    finally:
+        db.close()
+
+
+def test_failed_zone_is_retried_after_backoff(unnamed_crossing):
+    failing = FailingBackend()
+    set_geocoding_backend(failing)
+    now = datetime.utcnow()
+    assert retry_unnamed_crossings(now) == {"resolved": 0, "failed": 1}
+    # Dans le delai: la zone n'est pas redemandee au backend
+    assert retry_unnamed_crossings(now + timedelta(minutes=1)) == {"resolved": 0, "failed": 0}
+    assert failing.calls == 1
+
+    set_geocoding_backend(StaticGeocodingBackend("Centre"))
+    later = now + timedelta(minutes=2 * geocoding.settings.GEOCODING_RETRY_MINUTES)
+    assert retry_unnamed_crossings(later) == {"resolved": 1, "failed": 0}
+    assert _location_name(unnamed_crossing) == "Centre"
+
+
+def test_recent_crossing_is_left_to_its_background_task(unnamed_crossing):
+    backend = StaticGeocodingBackend("Centre")
+    set_geocoding_backend(backend)
+    assert retry_unnamed_crossings(datetime.utcnow() - timedelta(hours=2)) == {"resolved": 0, "failed": 0}
+    assert backend.calls == 0
+    assert _location_name(unnamed_crossing) is None
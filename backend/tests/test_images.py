@@ -0,0 +1,113 @@
+"""Pipeline des photos uploadees: variantes re-encodees sans metadonnees"""
+
+from io import BytesIO
+
+from PIL import Image
+
+from app.core.images import (
+    BASE83_CHARS, VARIANT_MAX_SIDES, blurhash_encode, dominant_color, process_image, variant_filename,
+)
+
+ORIENTATION, MAKE, GPS_IFD, GPS_LATITUDE = 0x0112, 0x010F, 0x8825, 2
+
+
+def _jpeg_with_exif(width=3000, height=1500, orientation=6) -> bytes:
+    image = Image.new("RGB", (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    exif[ORIENTATION] = orientation
+    exif[MAKE] = "TestCamera"
+    exif.get_ifd(GPS_IFD)[GPS_LATITUDE] = (48.0, 51.0, 24.0)
+    buffer = BytesIO()
+    image.save(buffer, "JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+def test_source_fixture_carries_exif():
+    with Image.open(BytesIO(_jpeg_with_exif())) as image:
+        exif = image.getexif()
+        assert exif[MAKE] == "TestCamera"
+        assert exif.get_ifd(GPS_IFD)
+
+
+def test_variants_are_resized_rotated_and_stripped():
+    processed = process_image(_jpeg_with_exif(), "webp", 80)
+
+    assert set(processed.variants) == set(VARIANT_MAX_SIDES)
+    for variant, content in processed.variants.items():
+        with Image.open(BytesIO(content)) as image:
+            assert image.format == "WEBP"
+            # Orientation 6: l'image paysage devient portrait
+            assert image.height > image.width
+            assert max(image.size) == VARIANT_MAX_SIDES[variant]
+            assert not image.getexif()
+            assert "exif" not in image.info and "icc_profile" not in image.info
+            if variant == "full":
+                assert (processed.width, processed.height) == image.size
+
+
+def test_small_image_is_not_upscaled_and_jpeg_output_is_supported():
+    processed = process_image(_jpeg_with_exif(200, 100, orientation=1), "jpeg", 85)
+    for content in processed.variants.values():
+        with Image.open(BytesIO(content)) as image:
+            assert image.format == "JPEG"
+            assert image.size == (200, 100)
+            assert not image.getexif()
+
+
+def test_undecodable_content_is_kept_as_is():
+    assert process_image(b"not an image", "webp", 80) is None
+
+
+def test_variant_filename():
+    assert variant_filename("abc.webp", "thumb") == "abc-thumb.webp"
+    assert variant_filename("abc.webp", "full") == "abc.webp"
+    assert variant_filename("abc", "medium") == "abc-medium"
+
+
+def _base83_decode(chars: str) -> int:
+    value = 0
+    for char in chars:
+        value = value * 83 + BASE83_CHARS.index(char)
+    return value
+
+
+def _ac_components(blurhash: str) -> list:
+    """Composantes AC quantifiees (r, g, b) dans 0..18, 9 = nulle"""
+    return [
+        (v // 361, v // 19 % 19, v % 19)
+        for v in (_base83_decode(blurhash[i:i + 2]) for i in range(6, len(blurhash), 2))
+    ]
+
+
+def test_blurhash_of_a_solid_color():
+    blurhash = blurhash_encode(Image.new("RGB", (32, 32), (200, 30, 30)))
+
+    # 4x3 composantes: 1 + 1 + 4 + 2 * 11 caracteres
+    assert len(blurhash) == 28
+    assert _base83_decode(blurhash[0]) == 3 + 2 * 9
+    # DC: la couleur moyenne, exacte pour une image unie
+    assert _base83_decode(blurhash[2:6]) == (200 << 16) + (30 << 8) + 30
+    # Valeur de non-regression
+    assert blurhash == "L5M^z||wfQ|w|wo1fQo1fQfQfQfQ"
+
+
+def test_blurhash_of_a_horizontal_gradient():
+    image = Image.new("RGB", (32, 8))
+    image.putdata([(x * 8, 0, 255 - x * 8) for _ in range(8) for x in range(32)])
+    blurhash = blurhash_encode(image, 4, 3)
+
+    ac = _ac_components(blurhash)
+    assert len(ac) == 11
+    # Vert nul partout: aucune composante AC sur ce canal
+    assert {green for _, green, _ in ac} == {9}
+    # Premiere composante horizontale (cos decroissant): rouge croissant en dessous de 0, bleu au-dessus
+    red, _, blue = ac[0]
+    assert red < 9 < blue
+    # 1x1: DC seul
+    assert len(blurhash_encode(image, 1, 1)) == 6
+
+
+def test_dominant_color():
+    image = Image.new("RGB", (10, 10), (20, 120, 220))
+    image.paste((250, 250, 250), (0, 0, 10, 3))
+    assert dominant_color(image) == "#1478dc"
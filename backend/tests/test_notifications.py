@@ -0,0 +1,46 @@
+"""Compteur de notifications non lues lu sur la base principale (pas de retard de replica)"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base, SessionLocal, get_read_db
+from app.main import app
+from app.models import Notification
+
+
+@pytest.fixture
+def lagging_replica(tmp_path):
+    """get_read_db sur une copie en retard; add_unread(user_id, actor_id) l'ecrit aux deux endroits"""
+    url = f"sqlite:///{tmp_path}/replica.db"
+    sync_engine = create_engine(url)
+    Base.metadata.create_all(bind=sync_engine)
+    replica = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+
+    async def read_db():
+        async with AsyncSession(replica) as db:
+            yield db
+
+    def add_unread(user_id, actor_id):
+        for session in (SessionLocal(), Session(sync_engine)):
+            with session as db:
+                db.add(Notification(user_id=user_id, actor_id=actor_id, type="follow", is_read=False))
+                db.commit()
+
+    app.dependency_overrides[get_read_db] = read_db
+    yield add_unread
+    app.dependency_overrides.pop(get_read_db, None)
+    sync_engine.dispose()
+
+
+def test_unread_count_reflects_mark_all_read(client, login, lagging_replica):
+    reader, actor = login("badgereader"), login("badgeactor")
+    reader_id = client.get("/api/auth/me", headers=reader).json()["id"]
+    actor_id = client.get("/api/auth/me", headers=actor).json()["id"]
+    lagging_replica(reader_id, actor_id)
+
+    assert client.get("/api/notifications/unread-count", headers=reader).json() == {"count": 1}
+    assert client.put("/api/notifications/read-all", headers=reader).status_code == 200
+    # La replica a toujours la notification non lue: le badge doit venir de la principale
+    assert client.get("/api/notifications/unread-count", headers=reader).json() == {"count": 0}
@@ -0,0 +1,137 @@
+"""Pagination par curseur: codec, bornes, colonnes nullables et chainage X-Next-Cursor"""
+
+import base64
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, String, Table, create_engine, func, select, update
+
+from app.api.pagination import CURSOR_HEADER, MAX_PAGE_SIZE, clamp_limit, decode_cursor, encode_cursor, paginate
+from app.core.database import SessionLocal
+from app.models import Notification
+
+metadata = MetaData()
+items = Table(
+    "items", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("created_at", DateTime, nullable=True),
+    Column("day", Date),
+    Column("name", String),
+)
+COLUMNS = (items.c.created_at, items.c.id)
+
+
+def _raw(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 5, 1, 12, 30, 15, 123456), date(2024, 5, 1), "robe", 42]
+    columns = (items.c.created_at, items.c.day, items.c.name, items.c.id)
+    assert decode_cursor(encode_cursor(values), columns) == values
+    assert decode_cursor(encode_cursor([None, 7]), COLUMNS) == [None, 7]
+    # Expression calculee (rang de recherche): pas de type a verifier
+    assert decode_cursor(encode_cursor([1.5, 7]), (func.abs(items.c.id), items.c.id)) == [1.5, 7]
+
+
+@pytest.mark.parametrize("cursor", [
+    "%%%",
+    _raw({"dt": "2024-05-01"}),
+    _raw([{"dt": "2024-05-01T00:00:00"}]),
+    _raw([{"dt": 5}, 1]),
+    _raw([{"d": ["2024"]}, 1]),
+    _raw([{"dt": "hier"}, 1]),
+    _raw([{"dt": "2024-05-01T00:00:00", "d": "2024-05-01"}, 1]),
+    _raw([{"x": "2024-05-01"}, 1]),
+    _raw([[1], 1]),
+    _raw([True, 1]),
+    _raw(["2024-05-01", 1]),
+    _raw([{"dt": "2024-05-01T00:00:00"}, "1"]),
+    _raw([{"dt": "2024-05-01T00:00:00"}, 1.5]),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, COLUMNS)
+    assert exc.value.status_code == 400
+
+
+def test_date_column_rejects_a_datetime():
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor([datetime(2024, 5, 1), 1]), (items.c.day, items.c.id))
+
+
+def test_clamp_limit_and_skip():
+    assert [clamp_limit(n) for n in (-5, 0, 1, 20, MAX_PAGE_SIZE, 10_000)] == [1, 1, 1, 20, MAX_PAGE_SIZE, MAX_PAGE_SIZE]
+    query = paginate(select(items.c.id), COLUMNS, None, 10_000, skip=30)
+    assert (query._limit, query._offset) == (MAX_PAGE_SIZE, 30)
+    # Avec un curseur, skip est ignore
+    query = paginate(select(items.c.id), COLUMNS, encode_cursor([datetime(2024, 5, 1), 3]), 5, skip=30)
+    assert (query._limit, query._offset) == (5, None)
+
+
+@pytest.fixture
+def table_rows():
+    """Lignes de items avec des created_at egaux et NULL"""
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    base = datetime(2024, 5, 1)
+    created = [base, base, None, base + timedelta(hours=1), None, base - timedelta(days=1), base, None]
+    with engine.begin() as conn:
+        conn.execute(items.insert(), [{"id": i + 1, "created_at": c} for i, c in enumerate(created)])
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_pages_cover_nullable_columns_without_gaps(table_rows, limit):
+    with table_rows.connect() as conn:
+        expected = [row.id for row in conn.execute(paginate(select(items.c.id), COLUMNS, None, 100))]
+        # NULL en tete, puis du plus recent au plus ancien, id decroissant a egalite
+        assert expected == [8, 5, 3, 4, 7, 2, 1, 6]
+
+        seen, cursor = [], None
+        while True:
+            rows = conn.execute(paginate(select(items.c.id, items.c.created_at), COLUMNS, cursor, limit)).all()
+            seen.extend(row.id for row in rows)
+            if len(rows) < limit:
+                break
+            cursor = encode_cursor((rows[-1].created_at, rows[-1].id))
+        assert seen == expected
+
+
+def test_next_cursor_header_chains_pages(client, login):
+    reader, actor = login("pagereader"), login("pageactor")
+    reader_id = client.get("/api/auth/me", headers=reader).json()["id"]
+    actor_id = client.get("/api/auth/me", headers=actor).json()["id"]
+    base = datetime.utcnow()
+    with SessionLocal() as db:
+        notifications = [
+            Notification(user_id=reader_id, actor_id=actor_id, type="follow", created_at=created_at)
+            for created_at in (base, base, base - timedelta(minutes=5), base, base)
+        ]
+        db.add_all(notifications)
+        db.flush()
+        # Lignes sans created_at (anterieures a son default)
+        db.execute(update(Notification).where(
+            Notification.id.in_([notifications[2].id, notifications[4].id])
+        ).values(created_at=None))
+        db.commit()
+
+    all_ids = [n["id"] for n in client.get("/api/notifications/", params={"limit": 100}, headers=reader).json()]
+    assert len(all_ids) == 5
+
+    seen, params = [], {"limit": 2}
+    while True:
+        response = client.get("/api/notifications/", params=params, headers=reader)
+        assert response.status_code == 200, response.text
+        seen.extend(n["id"] for n in response.json())
+        if CURSOR_HEADER not in response.headers:
+            break
+        params = {"limit": 2, "cursor": response.headers[CURSOR_HEADER]}
+    assert seen == all_ids
+
+    response = client.get("/api/notifications/", params={"cursor": _raw([{"dt": 5}, 1])}, headers=reader)
+    assert response.status_code == 400
@@ -0,0 +1,101 @@
+"""Cache des photos: regroupement des misses simultanes et budgets en octets"""
+
+import asyncio
+import os
+
+from app.core.photo_cache import PhotoCache
+
+
+def _cache(tmp_path, memory_bytes=0, memory_max_item_bytes=0, disk_bytes=100):
+    return PhotoCache(memory_bytes, memory_max_item_bytes, str(tmp_path / "cache"), disk_bytes)
+
+
+def _content(located):
+    path, data = located
+    if path is not None:
+        with open(path, "rb") as f:
+            return f.read()
+    return data
+
+
+def _fetcher(data: bytes, calls: list, delay: float = 0.0):
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return data
+    return fetch
+
+
+def test_concurrent_misses_share_one_download(tmp_path):
+    cache = _cache(tmp_path)
+    calls = []
+
+    async def run():
+        fetch = _fetcher(b"photo", calls, delay=0.05)
+        return await asyncio.gather(*(cache.locate("a.webp", fetch) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == [1]
+    assert [_content(r) for r in results] == [b"photo"] * 5
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"]) == (1, 4)
+
+    # Requete suivante: servie par le cache disque, sans telechargement
+    path, _ = asyncio.run(cache.locate("a.webp", _fetcher(b"photo", calls)))
+    assert path == os.path.join(cache.disk_dir, "a.webp")
+    assert calls == [1]
+
+
+def test_disk_tier_evicts_oldest_objects_over_the_byte_budget(tmp_path):
+    cache = _cache(tmp_path, disk_bytes=100)
+    calls = []
+
+    async def run():
+        for name in ("a", "b", "c"):
+            await cache.locate(name, _fetcher(b"x" * 40, calls))
+        # 120 octets > 100: "a", le plus ancien, est supprime
+        assert sorted(os.listdir(cache.disk_dir)) == ["b", "c"]
+        # "b" est relu depuis le disque: "c" devient le plus ancien
+        path, _ = await cache.locate("b", _fetcher(b"x" * 40, calls))
+        assert path is not None
+        await cache.locate("d", _fetcher(b"x" * 40, calls))
+
+    asyncio.run(run())
+    assert sorted(os.listdir(cache.disk_dir)) == ["b", "d"]
+    stats = cache.stats()
+    assert (stats["disk_bytes"], stats["evictions"]) == (80, 2)
+    assert len(calls) == 4
+
+    # Redemarrage: l'index disque est repris depuis les fichiers
+    restarted = _cache(tmp_path, disk_bytes=100)
+    path, _ = asyncio.run(restarted.locate("d", _fetcher(b"", calls)))
+    assert path is not None and len(calls) == 4
+
+
+def test_memory_tier_keeps_only_small_objects_within_budget(tmp_path):
+    cache = _cache(tmp_path, memory_bytes=50, memory_max_item_bytes=30, disk_bytes=0)
+    calls = []
+
+    async def run():
+        await cache.locate("big", _fetcher(b"x" * 40, calls))
+        for name in ("a", "b", "c"):
+            await cache.locate(name, _fetcher(b"x" * 20, calls))
+        await cache.locate("c", _fetcher(b"x" * 20, calls))
+        await cache.locate("big", _fetcher(b"x" * 40, calls))
+
+    asyncio.run(run())
+    stats = cache.stats()
+    assert (stats["memory_items"], stats["memory_bytes"]) == (2, 40)
+    assert stats["memory_hits"] == 1
+    # "big" depasse la taille max par objet: telecharge a chaque fois
+    assert len(calls) == 5
+
+
+def test_invalidate_drops_both_tiers(tmp_path):
+    cache = _cache(tmp_path, memory_bytes=100, memory_max_item_bytes=100, disk_bytes=100)
+    calls = []
+    asyncio.run(cache.locate("a", _fetcher(b"photo", calls)))
+    asyncio.run(cache.invalidate(["a"]))
+    assert os.listdir(cache.disk_dir) == []
+    asyncio.run(cache.locate("a", _fetcher(b"photo", calls)))
+    assert len(calls) == 2
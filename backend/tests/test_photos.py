@@ -0,0 +1,118 @@
+"""Service des photos: ETag, requetes Range et cache des objets du storage"""
+
+import os
+import uuid
+
+import pytest
+from starlette.requests import Request
+
+from app.api.endpoints.photos import _bytes_response, _parse_range
+from app.core import storage
+from app.core.config import settings
+from app.core.photo_cache import PhotoCache
+
+CONTENT = bytes(range(256)) * 4
+
+
+def _request(headers: dict) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+    })
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=-24", (1000, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=1024-", None),
+    ("bytes=10-5", None),
+    ("bytes=-0", None),
+])
+def test_parse_range(header, expected):
+    assert _parse_range(header, len(CONTENT)) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=-", "bytes=0-1,5-9", "items=0-9"])
+def test_parse_range_rejects_unsupported_ranges(header):
+    with pytest.raises(ValueError):
+        _parse_range(header, len(CONTENT))
+
+
+def test_bytes_response_ranges():
+    headers = {"ETag": '"a.webp"'}
+
+    response = _bytes_response(_request({"Range": "bytes=10-19"}), CONTENT, "image/webp", headers)
+    assert response.status_code == 206
+    assert response.body == CONTENT[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+
+    response = _bytes_response(_request({"Range": "bytes=2000-"}), CONTENT, "image/webp", headers)
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+    # Plage non geree ou If-Range perime: contenu complet
+    for request_headers in ({"Range": "bytes=0-1,5-9"}, {"Range": "bytes=10-19", "If-Range": '"b.webp"'}):
+        response = _bytes_response(_request(request_headers), CONTENT, "image/webp", headers)
+        assert (response.status_code, response.body) == (200, CONTENT)
+
+
+def _local_photo() -> str:
+    filename = f"{uuid.uuid4()}.webp"
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    with open(os.path.join(settings.UPLOAD_DIR, filename), "wb") as f:
+        f.write(CONTENT)
+    return filename
+
+
+def test_photo_etag_and_ranges(client):
+    filename = _local_photo()
+    url = f"/api/photos/{filename}"
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    etag = response.headers["etag"]
+    assert "immutable" in response.headers["cache-control"]
+
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = client.get(url, headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
+
+    response = client.get(url, headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+
+    assert client.get("/api/photos/..%2Fsecret.webp").status_code in (400, 404)
+    assert client.get(f"/api/photos/{uuid.uuid4()}.webp").status_code == 404
+
+
+def test_remote_miss_is_served_from_the_disk_cache(client, tmp_path, monkeypatch):
+    downloads = []
+
+    def download(name):
+        downloads.append(name)
+        return CONTENT
+
+    cache = PhotoCache(0, 0, str(tmp_path / "cache"), 10 * len(CONTENT))
+    monkeypatch.setattr(storage, "photo_cache", cache)
+    monkeypatch.setattr(storage, "get_supabase_client", lambda: object())
+    monkeypatch.setattr(storage, "_download_object_sync", download)
+
+    filename = f"{uuid.uuid4()}.webp"
+    response = client.get(f"/api/photos/{filename}", headers={"Range": "bytes=1000-"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[1000:]
+    assert os.path.isfile(os.path.join(cache.disk_dir, filename))
+
+    response = client.get(f"/api/photos/{filename}")
+    assert response.content == CONTENT
+    assert downloads == [filename]
+    assert cache.stats()["disk_hits"] == 1
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from app.core.ping_index import IndexedPing, PingIndex
+
+
+def _ping(user_id, minutes_ago, cell_id=1, now=None):
+    now = now or datetime.utcnow()
+    return IndexedPing(user_id, cell_id, 48.85, 2.35, now - timedelta(minutes=minutes_ago))
+
+
+def test_out_of_order_pings_are_kept_sorted():
+    index = PingIndex(window_minutes=30)
+    now = datetime.utcnow()
+    for minutes_ago in (5, 20, 1, 12):
+        index.add(_ping(1, minutes_ago, now=now))
+
+    bucket = index.query([1], now - timedelta(hours=1))
+    assert [p.timestamp for p in bucket] == sorted(p.timestamp for p in bucket)
+    assert len(bucket) == 4
+
+
+def test_stale_ping_is_not_indexed():
+    index = PingIndex(window_minutes=30)
+    index.add(_ping(1, 2))
+    # Ping bufferise plus vieux que la fenetre: ignore
+    index.add(_ping(2, 60))
+
+    assert {p.user_id for p in index.query([1], datetime.utcnow() - timedelta(days=1))} == {1}
+    assert index.query_users([2], datetime.utcnow() - timedelta(days=1)) == {}
+
+
+def test_stale_pings_behind_newer_ones_are_evicted():
+    index = PingIndex(window_minutes=30)
+    now = datetime.utcnow()
+    # Recu en premier: ping recent; puis un lot bufferise plus ancien, encore dans la fenetre
+    index.add(_ping(1, 1, now=now))
+    index.add(_ping(2, 25, now=now))
+
+    # 10 minutes plus tard le ping de 25 min est sorti de la fenetre, le recent non
+    index.evict(now + timedelta(minutes=10))
+
+    remaining = index.query([1], now - timedelta(days=1))
+    assert [p.user_id for p in remaining] == [1]
+    assert index.query_users([2], now - timedelta(days=1)) == {}
@@ -0,0 +1,78 @@
+"""Compaction des location_pings par cell et reprise depuis le watermark persiste"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, engine
+from app.core.retention import COMPACTION_JOB, run_ping_retention
+from app.core.zones import cell_id_to_zone_id
+from app.models import JobWatermark, LocationPing
+
+USER_ID = 9001
+EPOCH = datetime(1970, 1, 1)
+
+
+@pytest.fixture
+def pings():
+    """add(cell_id, timestamp) -> id; pings et watermark nettoyes apres le test"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.execute(delete(JobWatermark).where(JobWatermark.job == COMPACTION_JOB))
+    db.commit()
+
+    def add(cell_id, timestamp):
+        ping = LocationPing(
+            user_id=USER_ID, latitude=0.0, longitude=0.0, zone_id=cell_id_to_zone_id(cell_id),
+            cell_id=cell_id, timestamp=timestamp
+        )
+        db.add(ping)
+        db.commit()
+        return ping.id
+
+    yield add
+    db.execute(delete(LocationPing).where(LocationPing.user_id == USER_ID))
+    db.execute(delete(JobWatermark).where(JobWatermark.job == COMPACTION_JOB))
+    db.commit()
+    db.close()
+
+
+def _remaining(ids):
+    with SessionLocal() as db:
+        return set(db.scalars(select(LocationPing.id).where(LocationPing.id.in_(ids))))
+
+
+def _bucket_start(moment):
+    interval = settings.PING_COMPACTION_INTERVAL_MINUTES * 60
+    return EPOCH + timedelta(seconds=int((moment - EPOCH).total_seconds()) // interval * interval)
+
+
+def test_compaction_keeps_one_ping_per_cell_and_interval(pings):
+    now = datetime.utcnow()
+    start = _bucket_start(now - timedelta(hours=settings.PING_HOT_WINDOW_HOURS + 3))
+    first = pings(100, start)
+    duplicate = pings(100, start + timedelta(seconds=30))
+    other_cell = pings(101, start + timedelta(seconds=30))
+    hot = [pings(100, now - timedelta(minutes=minutes)) for minutes in (2, 1)]
+
+    run_ping_retention(now)
+    assert _remaining([first, duplicate, other_cell, *hot]) == {first, other_cell, *hot}
+
+
+def test_watermark_survives_a_restart(pings):
+    now = datetime.utcnow()
+    run_ping_retention(now)
+    with SessionLocal() as db:
+        watermark = db.scalar(select(JobWatermark.until).where(JobWatermark.job == COMPACTION_JOB))
+    assert watermark == now - timedelta(hours=settings.PING_HOT_WINDOW_HOURS)
+
+    # Doublons deja derriere le watermark: la passe suivante ne compacte que la nouvelle tranche
+    old = _bucket_start(watermark - timedelta(hours=2))
+    behind = [pings(200, old), pings(200, old + timedelta(seconds=30))]
+    new_slice = _bucket_start(watermark + timedelta(minutes=30))
+    sliced = [pings(200, new_slice), pings(200, new_slice + timedelta(seconds=30))]
+
+    run_ping_retention(now + timedelta(hours=1))
+    assert _remaining(behind + sliced) == {*behind, sliced[0]}
@@ -0,0 +1,92 @@
+"""Recherche plein texte des looks (/looks/discover?q=) sur l'index look_search"""
+
+import pytest
+from sqlalchemy import delete
+
+from app.core.database import SessionLocal, engine
+from app.core.search import index_look, rebuild_search_index, search_terms, unindex_looks
+from app.models import Look, LookItem
+
+
+@pytest.fixture(scope="module")
+def searcher(client, login):
+    headers = login("searcher")
+    return headers, client.get("/api/auth/me", headers=headers).json()["id"]
+
+
+@pytest.fixture
+def add_look(searcher):
+    """add_look(title, description, items) -> id du look, indexe; looks supprimes apres le test"""
+    _, user_id = searcher
+    db = SessionLocal()
+    look_ids = []
+
+    def add(title, description=None, items=()):
+        look = Look(user_id=user_id, title=title, description=description, photo_url="/uploads/x.webp")
+        db.add(look)
+        db.flush()
+        for brand, product_name, color in items:
+            db.add(LookItem(look_id=look.id, category="top", brand=brand, product_name=product_name, color=color))
+        index_look(db, look.id)
+        db.commit()
+        look_ids.append(look.id)
+        return look.id
+
+    yield add
+    unindex_looks(db, look_ids)
+    db.execute(delete(LookItem).where(LookItem.look_id.in_(look_ids)))
+    db.execute(delete(Look).where(Look.id.in_(look_ids)))
+    db.commit()
+    db.close()
+
+
+def _search(client, headers, q):
+    response = client.get("/api/looks/discover", params={"q": q, "period": "all"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [look["id"] for look in response.json()]
+
+
+def test_search_terms_drop_operators():
+    assert search_terms('Robe" OR NEAR(*) -zara') == ["robe", "or", "near", "zara"]
+    assert len(search_terms(" ".join(f"mot{i}" for i in range(20)))) == 8
+
+
+def test_search_matches_title_items_and_prefixes(client, searcher, add_look):
+    headers, _ = searcher
+    dress = add_look("Robe rouge", "Tenue d'été", [("Zara", "Robe midi", "rouge")])
+    jeans = add_look("Jean du dimanche", None, [("Levis", "501", "bleu")])
+
+    assert _search(client, headers, "zar") == [dress]
+    assert _search(client, headers, "levis bleu") == [jeans]
+    # Chaque mot doit apparaitre
+    assert _search(client, headers, "rouge levis") == []
+    # Accents ignores
+    assert _search(client, headers, "ete") == [dress]
+
+
+def test_search_ranks_by_relevance(client, searcher, add_look):
+    headers, _ = searcher
+    once = add_look("Veste en lin", None, [("Uniqlo", "Chemise", "blanc")])
+    twice = add_look("Lin et lin", "Ensemble lin", [("Arket", "Pantalon lin", "beige")])
+    assert _search(client, headers, "lin") == [twice, once]
+
+
+def test_index_follows_updates_and_deletes(client, searcher, add_look):
+    headers, _ = searcher
+    look_id = add_look("Manteau camel")
+    with SessionLocal() as db:
+        db.get(Look, look_id).title = "Doudoune noire"
+        index_look(db, look_id)
+        db.commit()
+    assert _search(client, headers, "camel") == []
+    assert _search(client, headers, "doudoune") == [look_id]
+
+    with SessionLocal() as db:
+        unindex_looks(db, [look_id])
+        db.commit()
+    assert _search(client, headers, "doudoune") == []
+
+    # Reconstruction (migration): le look est de nouveau trouve
+    with engine.begin() as conn:
+        assert rebuild_search_index(conn) >= 1
+    assert _search(client, headers, "doudoune") == [look_id]
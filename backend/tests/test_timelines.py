@@ -0,0 +1,99 @@
+"""Fil des abonnements: looks pousses dans les timelines et looks des auteurs tres suivis lus a la lecture"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.api.pagination import CURSOR_HEADER
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.timelines import fan_out_look
+from app.models import Look, TimelineEntry
+
+
+@pytest.fixture(scope="module")
+def users(client, login):
+    """Auteur normal, auteur tres suivi (2 abonnes), abonne et non abonne: {nom: (headers, id)}"""
+    result = {}
+    for name in ("tlauthor", "tlstar", "tlreader", "tlfan", "tlstranger"):
+        headers = login(name)
+        result[name] = (headers, client.get("/api/auth/me", headers=headers).json()["id"])
+    for follower, author in (("tlreader", "tlauthor"), ("tlreader", "tlstar"), ("tlfan", "tlstar")):
+        response = client.post(f"/api/users/{result[author][1]}/follow", headers=result[follower][0])
+        assert response.json()["following"] is True
+    return result
+
+
+def _post_look(user_id, created_at, look_date=None):
+    """Look insere puis pousse comme a la creation; retourne son id"""
+    with SessionLocal() as db:
+        look = Look(
+            user_id=user_id, title="Look", photo_url="/uploads/x.webp",
+            look_date=look_date or date.today(), created_at=created_at
+        )
+        db.add(look)
+        db.flush()
+        fan_out_look(db, look.id)
+        db.commit()
+        return look.id
+
+
+def _feed(client, headers, **params):
+    response = client.get("/api/looks/feed", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return [look["id"] for look in response.json()], response.headers.get(CURSOR_HEADER)
+
+
+def _timeline_owners(look_id):
+    with SessionLocal() as db:
+        return set(db.scalars(select(TimelineEntry.owner_id).where(TimelineEntry.look_id == look_id)))
+
+
+def test_feed_merges_pushed_and_pulled_looks(client, users, monkeypatch):
+    monkeypatch.setattr(settings, "FEED_FANOUT_MAX_FOLLOWERS", 1)
+    reader, fan, stranger = users["tlreader"], users["tlfan"], users["tlstranger"]
+    now = datetime.utcnow()
+
+    pushed = _post_look(users["tlauthor"][1], now - timedelta(minutes=3))
+    pulled = _post_look(users["tlstar"][1], now - timedelta(minutes=2))
+    newest = _post_look(users["tlauthor"][1], now - timedelta(minutes=1))
+    yesterday = _post_look(users["tlauthor"][1], now - timedelta(days=1), date.today() - timedelta(days=1))
+
+    # Auteur normal: une ligne par abonne; auteur tres suivi: rien de pousse
+    assert _timeline_owners(pushed) == {reader[1]}
+    assert _timeline_owners(pulled) == set()
+    assert _timeline_owners(yesterday) == set()
+    with SessionLocal() as db:
+        assert db.get(Look, pulled).fanout_on_read is True
+        assert db.get(Look, pushed).fanout_on_read is False
+
+    assert _feed(client, reader[0]) == ([newest, pulled, pushed], None)
+    assert _feed(client, fan[0]) == ([pulled], None)
+    assert _feed(client, stranger[0]) == ([], None)
+
+    # Pagination par cle a travers l'union des deux sources
+    seen, cursor = [], None
+    while True:
+        page, cursor = _feed(client, reader[0], limit=1, **({"cursor": cursor} if cursor else {}))
+        seen.extend(page)
+        if not cursor:
+            break
+    assert seen == [newest, pulled, pushed]
+
+
+def test_unfollow_removes_both_kinds_of_looks(client, users, monkeypatch):
+    monkeypatch.setattr(settings, "FEED_FANOUT_MAX_FOLLOWERS", 1)
+    reader = users["tlreader"]
+    now = datetime.utcnow()
+    pushed = _post_look(users["tlauthor"][1], now)
+    pulled = _post_look(users["tlstar"][1], now)
+    ids, _ = _feed(client, reader[0])
+    assert {pushed, pulled} <= set(ids)
+
+    for author in ("tlauthor", "tlstar"):
+        response = client.post(f"/api/users/{users[author][1]}/follow", headers=reader[0])
+        assert response.json()["following"] is False
+    assert _feed(client, reader[0]) == ([], None)
+    assert _timeline_owners(pushed) == set()
+    assert pulled in _feed(client, users["tlfan"][0])[0]